@@ -1,4 +1,5 @@
 const { server } = require('./src/app');
+const heatmapStore = require('./src/services/heatmapStore');
 
 const PORT = process.env.PORT || 5000;
 
@@ -18,3 +19,14 @@ process.on('uncaughtException', (err) => {
   console.error('Uncaught Exception:', err);
   process.exit(1);
 });
+
+// Write queued heatmap records before exiting
+const shutdown = async () => {
+  try {
+    await heatmapStore.stop();
+  } finally {
+    process.exit(0);
+  }
+};
+process.on('SIGINT', shutdown);
+process.on('SIGTERM', shutdown);
@@ -53,12 +53,16 @@ const { initializeQueueSocket } = require('./socket/queueSocket');
 const { initializeEmergencySocket } = require('./socket/emergencySocket');
 const { initializeCrowdSocket } = require('./socket/crowdSocket');
 const { expirePastBookings } = require('./services/queueService');
+const heatmapStore = require('./services/heatmapStore');
 
 // Initialize sockets
 initializeQueueSocket(io);
 initializeEmergencySocket(io);
 initializeCrowdSocket(io);
 
+// Batched persistence of crowd heatmap records
+heatmapStore.start();
+
 // Auto-expire past bookings every 5 minutes
 setInterval(async () => {
   try {
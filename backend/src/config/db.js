@@ -1,8 +1,20 @@
 const mongoose = require('mongoose');
 
+// MONGO_URI=memory starts a throwaway in-memory MongoDB (for local load tests);
+// needs `npm install --no-save mongodb-memory-server`
+const resolveUri = async () => {
+  if (process.env.MONGO_URI !== 'memory') {
+    return process.env.MONGO_URI;
+  }
+  const { MongoMemoryServer } = require('mongodb-memory-server');
+  const memoryServer = await MongoMemoryServer.create();
+  console.log('Using in-memory MongoDB (data is lost on exit)');
+  return memoryServer.getUri();
+};
+
 const connectDB = async () => {
   try {
-    const conn = await mongoose.connect(process.env.MONGO_URI);
+    const conn = await mongoose.connect(await resolveUri());
 
     console.log(`MongoDB Connected: ${conn.connection.host}`);
   } catch (error) {
@@ -1,6 +1,9 @@
 const CrowdHeatmap = require('../models/CrowdHeatmap');
 const EmergencyRequest = require('../models/EmergencyRequest');
 const User = require('../models/User');
+const heatmapStore = require('../services/heatmapStore');
+const crowdRollups = require('../services/crowdRollups');
+const crowdBroadcaster = require('../socket/crowdBroadcaster');
 
 // Thresholds configuration
 const THRESHOLDS = {
@@ -17,15 +20,17 @@ const THRESHOLDS = {
     critical: 0.8,
   },
   cooldownMinutes: 10, // Don't send multiple alerts within this time
+  crushCooldownMinutes: 2, // Crush-risk clusters are re-announced sooner
+  motionCooldownMinutes: 2, // Counter-flow and surges, likewise
 };
 
-// Store last alert time per zone
-const lastAlertTime = {};
-
 // Receive heatmap data from Python CV system
+// The latest state is kept in memory and records are written in batches (heatmapStore),
+// so no database round trip is on the request path
 exports.receiveHeatmapData = async (req, res) => {
+  const started = process.hrtime.bigint();
   try {
-    const { timestamp, zones, frameWidth, frameHeight, overallPeopleCount } = req.body;
+    const { zones, cameraId = 'default' } = req.body;
 
     if (!zones || !Array.isArray(zones)) {
       return res.status(400).json({ message: 'Invalid heatmap data format' });
@@ -35,77 +40,106 @@ exports.receiveHeatmapData = async (req, res) => {
     const overallRushStatus = calculateOverallRushStatus(zones);
 
     // Create heatmap record
-    const heatmapData = new CrowdHeatmap({
-      timestamp: timestamp || new Date(),
-      overallPeopleCount: overallPeopleCount || zones.reduce((sum, z) => sum + z.peopleCount, 0),
-      overallRushStatus,
-      zones,
-      frameWidth,
-      frameHeight,
-      alertTriggered: false,
-    });
+    const heatmapData = heatmapStore.createRecord(cameraId, req.body, overallRushStatus);
 
-    await heatmapData.save();
+    // The record is only written later in a batch, so the schema is checked here
+    const validationError = new CrowdHeatmap(heatmapData).validateSync();
+    if (validationError) {
+      return res.status(400).json({ message: 'Invalid heatmap data', error: validationError.message });
+    }
 
-    // Check if alert should be triggered
-    const alertsTriggered = [];
-    for (const zone of zones) {
-      const shouldAlert = await checkAlertThreshold(zone);
-      if (shouldAlert) {
-        const emergencyRequest = await createRushAlert(zone, heatmapData._id);
-        alertsTriggered.push({
+    // Check if alert should be triggered, against the in-memory cooldown state
+    const cooldownMs = THRESHOLDS.cooldownMinutes * 60 * 1000;
+    const alertZones = zones.filter(zone => heatmapStore.shouldAlert(cameraId, zone, cooldownMs));
+    heatmapData.alertTriggered = alertZones.length > 0;
+
+    heatmapStore.ingest(heatmapData);
+
+    // Zones forecast to reach high/critical while still below it get an early warning
+    // (no emergency request), with its own cooldown
+    const forecastZones = zones.filter(zone => isForecastRush(zone)
+      && heatmapStore.shouldAlert(cameraId, { zoneId: `${zone.zoneId}:forecast`, alertLevel: zone.predictedAlertLevel }, cooldownMs));
+
+    // Zones with a tight cluster above the crush-risk density (crush_risk.py on the CV node)
+    const crushCooldownMs = THRESHOLDS.crushCooldownMinutes * 60 * 1000;
+    const crushZones = zones.filter(zone => zone.crushRisk
+      && heatmapStore.shouldAlert(cameraId, { zoneId: `${zone.zoneId}:crush`, alertLevel: 'critical' }, crushCooldownMs));
+
+    // Zones where people move against the usual direction or suddenly much faster (crowd_motion.py)
+    const motionCooldownMs = THRESHOLDS.motionCooldownMinutes * 60 * 1000;
+    const motionZones = zones.filter(zone => (zone.counterFlow || zone.surge)
+      && heatmapStore.shouldAlert(cameraId, { zoneId: `${zone.zoneId}:motion`, alertLevel: 'critical' }, motionCooldownMs));
+
+    const io = req.app.get('io');
+    if (alertZones.length > 0) {
+      raiseRushAlerts(io, heatmapData, alertZones);
+    }
+    if (forecastZones.length > 0) {
+      io.emit('crowd:rush-forecast', {
+        heatmapId: heatmapData._id,
+        cameraId,
+        alerts: forecastZones.map(zone => ({
           zone: zone.zoneName,
           alertLevel: zone.alertLevel,
-          emergencyRequestId: emergencyRequest._id,
-        });
-        heatmapData.alertTriggered = true;
-        heatmapData.emergencyRequestId = emergencyRequest._id;
-      }
+          predictedAlertLevel: zone.predictedAlertLevel,
+          forecast: zone.forecast,
+        })),
+        timestamp: new Date(),
+      });
     }
-
-    if (alertsTriggered.length > 0) {
-      await heatmapData.save();
-      
-      // Emit real-time alert via Socket.IO
-      const io = req.app.get('io');
-      io.emit('crowd:rush-alert', {
+    if (crushZones.length > 0) {
+      io.emit('crowd:crush-risk', {
+        heatmapId: heatmapData._id,
+        cameraId,
+        alerts: crushZones.map(zone => ({
+          zone: zone.zoneName,
+          peakLocalDensity: zone.peakLocalDensity,
+          clusters: zone.crushClusters,
+        })),
+        timestamp: new Date(),
+      });
+    }
+    if (motionZones.length > 0) {
+      io.emit('crowd:motion-alert', {
         heatmapId: heatmapData._id,
-        alerts: alertsTriggered,
+        cameraId,
+        alerts: motionZones.map(zone => ({
+          zone: zone.zoneName,
+          counterFlow: Boolean(zone.counterFlow),
+          surge: Boolean(zone.surge),
+          meanSpeed: zone.meanSpeed,
+        })),
         timestamp: new Date(),
       });
     }
 
-    // Emit real-time heatmap update to all connected clients
-    const io = req.app.get('io');
-    io.emit('crowd:heatmap-update', {
-      id: heatmapData._id,
-      timestamp: heatmapData.timestamp,
-      overallPeopleCount: heatmapData.overallPeopleCount,
-      overallRushStatus: heatmapData.overallRushStatus,
-      zones: heatmapData.zones,
-      frameWidth: heatmapData.frameWidth,
-      frameHeight: heatmapData.frameHeight,
-    });
+    // Subscribed clients get it as a throttled delta (socket/crowdBroadcaster)
+    crowdBroadcaster.publish(heatmapData);
 
     res.status(201).json({
       success: true,
       message: 'Heatmap data received',
       heatmapId: heatmapData._id,
-      alertsTriggered: alertsTriggered.length,
+      alertsTriggered: alertZones.length,
     });
 
   } catch (error) {
     console.error('Error receiving heatmap data:', error);
     res.status(500).json({ message: 'Failed to process heatmap data', error: error.message });
+  } finally {
+    heatmapStore.recordLatency(Number(process.hrtime.bigint() - started) / 1e6);
   }
 };
 
-// Get current heatmap status
+// Get current heatmap status (from memory; ?cameraId= for a single camera)
 exports.getCurrentHeatmap = async (req, res) => {
   try {
-    const latestHeatmap = await CrowdHeatmap.findOne()
-      .sort({ timestamp: -1 })
-      .limit(1);
+    const { cameraId } = req.query;
+
+    // Seed from the database once after a restart
+    await heatmapStore.warm();
+
+    const latestHeatmap = cameraId ? heatmapStore.getLatest(cameraId) : heatmapStore.getCombined();
 
     if (!latestHeatmap) {
       return res.status(404).json({ message: 'No heatmap data available' });
@@ -122,34 +156,70 @@ exports.getCurrentHeatmap = async (req, res) => {
   }
 };
 
+// Socket.IO heatmap fan-out: subscribers per room and messages/bytes per second per client
+exports.getBroadcastStats = async (req, res) => {
+  res.json({
+    success: true,
+    stats: crowdBroadcaster.getStats(),
+  });
+};
+
+// Ingestion latency percentiles and batch persistence counters
+exports.getIngestStats = async (req, res) => {
+  res.json({
+    success: true,
+    stats: heatmapStore.getStats(),
+  });
+};
+
 // Get heatmap history for a specific zone
+// Read from the minute/hour/day rollups, so the cost does not grow with raw record volume
 exports.getHeatmapHistory = async (req, res) => {
   try {
     const { zoneId } = req.params;
-    const { hours = 1 } = req.query;
-
-    const startTime = new Date(Date.now() - hours * 60 * 60 * 1000);
-
-    const heatmaps = await CrowdHeatmap.find({
-      timestamp: { $gte: startTime },
-      'zones.zoneId': zoneId,
-    })
-      .sort({ timestamp: -1 })
-      .select('timestamp zones overallPeopleCount overallRushStatus');
-
-    const zoneHistory = heatmaps.map(h => {
-      const zone = h.zones.find(z => z.zoneId === zoneId);
-      return {
-        timestamp: h.timestamp,
-        peopleCount: zone ? zone.peopleCount : 0,
-        density: zone ? zone.density : 0,
-        alertLevel: zone ? zone.alertLevel : 'normal',
-      };
+    const { hours = 1, cameraId } = req.query;
+
+    const spanMs = hours * 60 * 60 * 1000;
+    const startTime = new Date(Date.now() - spanMs);
+    const granularity = crowdRollups.granularityFor(spanMs);
+
+    const rollups = await crowdRollups.find(granularity, {
+      zoneId,
+      cameraId: cameraId || { $ne: crowdRollups.ALL_CAMERAS },
+    }, startTime);
+
+    // The same zone id on several cameras is summed per bucket
+    const byBucket = new Map();
+    rollups.forEach(r => {
+      const key = r.bucket.getTime();
+      const entry = byBucket.get(key) || { timestamp: r.bucket, mean: 0, min: 0, max: 0, density: 0, dwell: {} };
+      entry.mean += crowdRollups.meanCount(r);
+      entry.min += r.countMin || 0;
+      entry.max += r.countMax || 0;
+      entry.density = Math.max(entry.density, crowdRollups.meanDensity(r));
+      Object.entries(r.alertDwell || {}).forEach(([level, seconds]) => {
+        entry.dwell[level] = (entry.dwell[level] || 0) + (seconds || 0);
+      });
+      entry.worstLevel = worstLevel(entry.worstLevel, r.alertDwell);
+      byBucket.set(key, entry);
     });
 
+    const zoneHistory = [...byBucket.values()]
+      .sort((a, b) => b.timestamp - a.timestamp)
+      .map(entry => ({
+        timestamp: entry.timestamp,
+        peopleCount: Math.round(entry.mean),
+        minPeopleCount: entry.min,
+        maxPeopleCount: entry.max,
+        density: Math.round(entry.density * 100) / 100,
+        alertLevel: entry.worstLevel || 'normal',
+        alertDwellSeconds: entry.dwell,
+      }));
+
     res.json({
       success: true,
       zoneId,
+      granularity,
       history: zoneHistory,
     });
 
@@ -160,6 +230,7 @@ exports.getHeatmapHistory = async (req, res) => {
 };
 
 // Get analytics/statistics
+// Hourly rollups of all cameras combined give the averages; the peak is refined with minute rollups
 exports.getAnalytics = async (req, res) => {
   try {
     const { period = 'today' } = req.query;
@@ -171,40 +242,69 @@ exports.getAnalytics = async (req, res) => {
     } else if (period === 'week') {
       startTime = new Date(Date.now() - 7 * 24 * 60 * 60 * 1000);
     }
+    const granularity = startTime ? 'hour' : 'day';
 
-    const heatmaps = await CrowdHeatmap.find({
-      timestamp: { $gte: startTime },
-    }).sort({ timestamp: 1 });
-
-    // Calculate peak times
-    const peakPeopleCount = Math.max(...heatmaps.map(h => h.overallPeopleCount));
-    const peakTime = heatmaps.find(h => h.overallPeopleCount === peakPeopleCount);
+    const rollups = await crowdRollups.find(granularity, {
+      cameraId: crowdRollups.ALL_CAMERAS,
+      zoneId: crowdRollups.OVERALL_ZONE,
+    }, startTime);
 
-    // Calculate average by hour
+    let totalRecords = 0;
+    let peak = null;
     const hourlyAverages = {};
-    heatmaps.forEach(h => {
-      const hour = new Date(h.timestamp).getHours();
-      if (!hourlyAverages[hour]) {
-        hourlyAverages[hour] = { total: 0, count: 0 };
+    const alertDwellSeconds = {};
+    rollups.forEach(r => {
+      totalRecords += r.samples || 0;
+      if (!peak || r.countMax > peak.countMax) {
+        peak = r;
+      }
+      Object.entries(r.alertDwell || {}).forEach(([level, seconds]) => {
+        alertDwellSeconds[level] = (alertDwellSeconds[level] || 0) + (seconds || 0);
+      });
+
+      // Calculate average by hour
+      if (granularity === 'hour') {
+        const hour = new Date(r.bucket).getHours();
+        // Weighted by the time each bucket covers, so busy periods with more reports don't dominate
+        if (!hourlyAverages[hour]) {
+          hourlyAverages[hour] = { total: 0, count: 0 };
+        }
+        const weight = r.seconds || r.samples || 0;
+        hourlyAverages[hour].total += crowdRollups.meanCount(r) * weight;
+        hourlyAverages[hour].count += weight;
       }
-      hourlyAverages[hour].total += h.overallPeopleCount;
-      hourlyAverages[hour].count += 1;
     });
 
+    // Minute precision for the peak time
+    let peakTime = peak ? peak.bucket : null;
+    if (peak && granularity === 'hour') {
+      const minutes = await crowdRollups.find('minute', {
+        cameraId: crowdRollups.ALL_CAMERAS,
+        zoneId: crowdRollups.OVERALL_ZONE,
+        countMax: peak.countMax,
+      }, peak.bucket, new Date(peak.bucket.getTime() + 60 * 60 * 1000));
+      if (minutes.length > 0) {
+        peakTime = minutes[0].bucket;
+      }
+    }
+
     const avgByHour = Object.keys(hourlyAverages).map(hour => ({
       hour: parseInt(hour),
-      average: Math.round(hourlyAverages[hour].total / hourlyAverages[hour].count),
+      average: hourlyAverages[hour].count ? Math.round(hourlyAverages[hour].total / hourlyAverages[hour].count) : 0,
     }));
 
+    const current = heatmapStore.getCombined();
+
     res.json({
       success: true,
       analytics: {
         period,
-        totalRecords: heatmaps.length,
-        peakPeopleCount,
-        peakTime: peakTime ? peakTime.timestamp : null,
+        totalRecords,
+        peakPeopleCount: peak ? peak.countMax : 0,
+        peakTime,
         averageByHour: avgByHour,
-        currentStatus: heatmaps.length > 0 ? heatmaps[heatmaps.length - 1].overallRushStatus : 'normal',
+        alertDwellSeconds,
+        currentStatus: current ? current.overallRushStatus : 'normal',
       },
     });
 
@@ -238,6 +338,25 @@ exports.configureThresholds = async (req, res) => {
   }
 };
 
+// Helper function to pick the most severe alert level with any dwell time
+const ALERT_ORDER = ['normal', 'warning', 'moderate', 'high', 'critical'];
+function worstLevel(current, dwell) {
+  let worst = current;
+  ALERT_ORDER.forEach(level => {
+    if (dwell && dwell[level] > 0 && ALERT_ORDER.indexOf(level) > ALERT_ORDER.indexOf(worst || 'normal')) {
+      worst = level;
+    }
+  });
+  return worst;
+}
+
+// Predicted level (from the CV forecaster) is high/critical and worse than the current one
+function isForecastRush(zone) {
+  const predicted = zone.predictedAlertLevel;
+  return (predicted === 'high' || predicted === 'critical')
+    && ALERT_ORDER.indexOf(predicted) > ALERT_ORDER.indexOf(zone.alertLevel || 'normal');
+}
+
 // Helper function to calculate overall rush status
 function calculateOverallRushStatus(zones) {
   const criticalZones = zones.filter(z => z.alertLevel === 'critical').length;
@@ -250,27 +369,30 @@ function calculateOverallRushStatus(zones) {
   return 'normal';
 }
 
-// Helper function to check if alert should be triggered
-async function checkAlertThreshold(zone) {
-  const { zoneId, alertLevel, peopleCount } = zone;
-
-  // Only trigger for high or critical levels
-  if (alertLevel !== 'high' && alertLevel !== 'critical') {
-    return false;
-  }
-
-  // Check cooldown period
-  const now = Date.now();
-  const lastAlert = lastAlertTime[zoneId];
-  const cooldownMs = THRESHOLDS.cooldownMinutes * 60 * 1000;
+// Create emergency requests for alerting zones and notify clients, off the request path
+async function raiseRushAlerts(io, heatmapData, alertZones) {
+  try {
+    const alertsTriggered = [];
+    for (const zone of alertZones) {
+      const emergencyRequest = await createRushAlert(zone, heatmapData._id);
+      alertsTriggered.push({
+        zone: zone.zoneName,
+        alertLevel: zone.alertLevel,
+        emergencyRequestId: emergencyRequest._id,
+      });
+      await heatmapStore.markAlert(heatmapData, emergencyRequest._id);
+    }
 
-  if (lastAlert && (now - lastAlert) < cooldownMs) {
-    return false; // Still in cooldown period
+    // Emit real-time alert via Socket.IO
+    io.emit('crowd:rush-alert', {
+      heatmapId: heatmapData._id,
+      cameraId: heatmapData.cameraId,
+      alerts: alertsTriggered,
+      timestamp: new Date(),
+    });
+  } catch (error) {
+    console.error('Error raising rush alerts:', error);
   }
-
-  // Update last alert time
-  lastAlertTime[zoneId] = now;
-  return true;
 }
 
 // Helper function to create rush alert as emergency request
@@ -7,7 +7,7 @@ const { emitNewEmergencyAlert, emitEmergencyUpdate } = require('../socket/emerge
 // @access  Public
 const createGuestEmergency = async (req, res) => {
   try {
-    const { type, description, location, name, phone } = req.body;
+    const { type, description, location, name, phone, priority } = req.body;
 
     // Create a guest user or find existing guest user
     let guestUser = await User.findOne({ email: 'guest@temple.com' });
@@ -28,6 +28,7 @@ const createGuestEmergency = async (req, res) => {
       description: `${name ? `Name: ${name}\n` : ''}Phone: ${phone}\n${description}`,
       location,
       status: 'pending',
+      ...(priority && { priority }),
     });
 
     // Populate user info for real-time notification
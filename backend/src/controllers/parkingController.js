@@ -78,20 +78,38 @@ const createParkingSlot = async (req, res) => {
 // @access  Private/System
 const bulkUpdateParkingSlots = async (req, res) => {
   try {
-    const { slots } = req.body; // Array of { slotNumber, isOccupied }
-
-    const updates = slots.map(async (slotData) => {
-      const slot = await ParkingSlot.findOne({ slotNumber: slotData.slotNumber });
-      if (slot) {
-        slot.isOccupied = slotData.isOccupied;
-        slot.lastUpdated = Date.now();
-        return slot.save();
-      }
-    });
+    // slots: Array of { slotNumber, isOccupied }; zone: lot id (optional)
+    // The CV monitor sends only changed slots, plus a periodic full snapshot
+    const { slots, zone, snapshot } = req.body;
 
-    await Promise.all(updates);
+    if (!Array.isArray(slots)) {
+      return res.status(400).json({ message: 'slots must be an array' });
+    }
 
-    res.json({ message: 'Parking slots updated successfully' });
+    const now = Date.now();
+
+    // One round trip; slots already in the reported state are not rewritten
+    const operations = slots.map((slotData) => ({
+      updateOne: {
+        filter: {
+          slotNumber: slotData.slotNumber,
+          ...(zone ? { zone } : {}),
+          isOccupied: { $ne: slotData.isOccupied },
+        },
+        update: { $set: { isOccupied: slotData.isOccupied, lastUpdated: now } },
+      },
+    }));
+
+    const result = operations.length > 0
+      ? await ParkingSlot.bulkWrite(operations, { ordered: false })
+      : null;
+
+    res.json({
+      message: 'Parking slots updated successfully',
+      received: slots.length,
+      modified: result ? result.modifiedCount : 0,
+      snapshot: Boolean(snapshot),
+    });
   } catch (error) {
     res.status(500).json({ message: error.message });
   }
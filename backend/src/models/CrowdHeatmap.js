@@ -28,6 +28,44 @@ const zoneDataSchema = new mongoose.Schema({
     enum: ['normal', 'warning', 'high', 'critical'],
     default: 'normal',
   },
+  // Short-horizon forecast from the CV node (crowd_forecast.py)
+  predictedAlertLevel: {
+    type: String,
+    enum: ['normal', 'warning', 'high', 'critical'],
+  },
+  forecast: [{
+    _id: false,
+    horizonMinutes: Number,
+    peopleCount: Number,
+    alertLevel: {
+      type: String,
+      enum: ['normal', 'warning', 'high', 'critical'],
+    },
+  }],
+  // Local density per person (crush_risk.py): peak people/m2 and tight clusters above the threshold
+  peakLocalDensity: {
+    type: Number,
+  },
+  crushRisk: {
+    type: Boolean,
+  },
+  crushClusters: [{
+    _id: false,
+    x: Number,
+    y: Number,
+    people: Number,
+    density: Number,
+  }],
+  // Optical-flow motion (crowd_motion.py): mean speed in pixels/s, counter-flow and surges
+  meanSpeed: {
+    type: Number,
+  },
+  counterFlow: {
+    type: Boolean,
+  },
+  surge: {
+    type: Boolean,
+  },
   boundingBoxes: [{
     x1: Number,
     y1: Number,
@@ -38,6 +76,10 @@ const zoneDataSchema = new mongoose.Schema({
 });
 
 const crowdHeatmapSchema = new mongoose.Schema({
+  cameraId: {
+    type: String,
+    default: 'default',
+  },
   timestamp: {
     type: Date,
     default: Date.now,
@@ -77,6 +119,7 @@ const crowdHeatmapSchema = new mongoose.Schema({
 // Index for faster queries
 crowdHeatmapSchema.index({ timestamp: -1 });
 crowdHeatmapSchema.index({ overallRushStatus: 1, timestamp: -1 });
+crowdHeatmapSchema.index({ cameraId: 1, timestamp: -1 });
 
 // Auto-delete old records after 7 days
 crowdHeatmapSchema.index({ createdAt: 1 }, { expireAfterSeconds: 604800 });
@@ -0,0 +1,84 @@
+const mongoose = require('mongoose');
+
+// Pre-aggregated crowd statistics per time bucket, maintained on heatmap ingest
+// zoneId '_overall' holds the whole-camera count; cameraId '_all' sums every camera
+const crowdRollupSchema = new mongoose.Schema({
+  granularity: {
+    type: String,
+    enum: ['minute', 'hour', 'day'],
+    required: true,
+  },
+  bucket: {
+    type: Date,
+    required: true,
+  },
+  cameraId: {
+    type: String,
+    required: true,
+  },
+  zoneId: {
+    type: String,
+    required: true,
+  },
+  zoneName: {
+    type: String,
+  },
+  // Incremented fields have no defaults so upserts never set and $inc the same path
+  samples: {
+    type: Number,
+  },
+  countSum: {
+    type: Number,
+  },
+  countMin: {
+    type: Number,
+  },
+  countMax: {
+    type: Number,
+  },
+  densitySum: {
+    type: Number,
+  },
+  densityMax: {
+    type: Number,
+  },
+  // Time-weighted sums: seconds covered, and count/density times the seconds they held
+  seconds: {
+    type: Number,
+  },
+  countSeconds: {
+    type: Number,
+  },
+  densitySeconds: {
+    type: Number,
+  },
+  // Seconds spent at each alert level (zones use warning, the overall status uses moderate)
+  alertDwell: {
+    normal: Number,
+    warning: Number,
+    moderate: Number,
+    high: Number,
+    critical: Number,
+  },
+  // Zone heatmap grid summed over the bucket, row-major
+  gridSum: {
+    type: [Number],
+  },
+  gridRows: {
+    type: Number,
+  },
+  gridCols: {
+    type: Number,
+  },
+  expireAt: {
+    type: Date,
+  },
+});
+
+crowdRollupSchema.index({ granularity: 1, cameraId: 1, zoneId: 1, bucket: 1 }, { unique: true });
+crowdRollupSchema.index({ granularity: 1, zoneId: 1, bucket: 1 });
+
+// Fine-grained buckets are dropped once coarser ones cover them
+crowdRollupSchema.index({ expireAt: 1 }, { expireAfterSeconds: 0 });
+
+module.exports = mongoose.model('CrowdRollup', crowdRollupSchema);
@@ -10,6 +10,8 @@ router.post('/heatmap', crowdController.receiveHeatmapData);
 router.get('/current', crowdController.getCurrentHeatmap);
 router.get('/history/:zoneId', crowdController.getHeatmapHistory);
 router.get('/analytics', crowdController.getAnalytics);
+router.get('/ingest-stats', crowdController.getIngestStats);
+router.get('/broadcast-stats', crowdController.getBroadcastStats);
 
 // Admin only
 router.post('/configure-thresholds', protect, crowdController.configureThresholds);
@@ -0,0 +1,302 @@
+// Incremental minute/hour/day rollups of crowd heatmap data
+const CrowdRollup = require('../models/CrowdRollup');
+
+const DAY_MS = 24 * 60 * 60 * 1000;
+
+// Retention per granularity (null = keep)
+const GRANULARITIES = {
+  minute: { retentionMs: 7 * DAY_MS },
+  hour: { retentionMs: 180 * DAY_MS },
+  day: { retentionMs: null },
+};
+
+const OVERALL_ZONE = '_overall';
+const ALL_CAMERAS = '_all';
+
+// Longest gap between two samples still counted as dwell time; cameras report on change
+// with a heartbeat of up to a minute (REPORT_POLICY in heatmap_core.py), so allow twice that
+const MAX_DWELL_GAP_S = 120;
+
+// Bucket start in server local time, so hours and days line up with the temple's clock
+const bucketStart = (date, granularity) => {
+  const d = new Date(date);
+  if (granularity === 'minute') d.setSeconds(0, 0);
+  else if (granularity === 'hour') d.setMinutes(0, 0, 0);
+  else d.setHours(0, 0, 0, 0);
+  return d;
+};
+
+// Deltas accumulated since the last flush, keyed by granularity|camera|zone|bucket
+let deltas = new Map();
+
+const emptyDelta = (base) => ({
+  ...base,
+  samples: 0,
+  countSum: 0,
+  countMin: Infinity,
+  countMax: -Infinity,
+  densitySum: 0,
+  densityMax: -Infinity,
+  seconds: 0,
+  countSeconds: 0,
+  densitySeconds: 0,
+  dwell: {},
+  grid: null,
+  gridRows: 0,
+  gridCols: 0,
+});
+
+const mergeSample = (key, base, sample) => {
+  let delta = deltas.get(key);
+  if (!delta) {
+    delta = emptyDelta(base);
+    deltas.set(key, delta);
+  }
+
+  delta.samples += 1;
+  delta.countSum += sample.count;
+  delta.countMin = Math.min(delta.countMin, sample.count);
+  delta.countMax = Math.max(delta.countMax, sample.count);
+  delta.densitySum += sample.density;
+  delta.densityMax = Math.max(delta.densityMax, sample.density);
+  if (sample.dwellSeconds > 0 && sample.dwellLevel) {
+    delta.dwell[sample.dwellLevel] = (delta.dwell[sample.dwellLevel] || 0) + sample.dwellSeconds;
+    // Reports come more often while a zone changes, so means are weighted by time, not per report
+    delta.seconds += sample.dwellSeconds;
+    delta.countSeconds += sample.dwellCount * sample.dwellSeconds;
+    delta.densitySeconds += sample.dwellDensity * sample.dwellSeconds;
+  }
+
+  if (sample.grid && sample.grid.length > 0) {
+    const rows = sample.grid.length;
+    const cols = sample.grid[0].length;
+    if (!delta.grid) {
+      delta.grid = new Array(rows * cols).fill(0);
+      delta.gridRows = rows;
+      delta.gridCols = cols;
+    }
+    if (rows === delta.gridRows && cols === delta.gridCols) {
+      for (let r = 0; r < rows; r++) {
+        for (let c = 0; c < cols; c++) {
+          delta.grid[r * cols + c] += sample.grid[r][c] || 0;
+        }
+      }
+    }
+  }
+};
+
+const addSample = (cameraId, zoneId, zoneName, timestamp, sample) => {
+  for (const granularity of Object.keys(GRANULARITIES)) {
+    const bucket = bucketStart(timestamp, granularity);
+    const key = `${granularity}|${cameraId}|${zoneId}|${bucket.getTime()}`;
+    mergeSample(key, { granularity, cameraId, zoneId, zoneName, bucket }, sample);
+  }
+};
+
+const gapSeconds = (from, to) => (from
+  ? Math.min(Math.max((new Date(to).getTime() - new Date(from).getTime()) / 1000, 0), MAX_DWELL_GAP_S)
+  : 0);
+
+// Record one heatmap record. The time since the camera's previous record was spent in that
+// record's state, so dwell (and the time-weighted count) is credited to the previous state.
+// combined and previousCombined are the all-camera states after and before this record.
+const record = (heatmap, previous, combined, previousCombined) => {
+  const { cameraId, timestamp, zones } = heatmap;
+  const dwell = gapSeconds(previous && previous.timestamp, timestamp);
+  const previousZones = new Map(((previous && previous.zones) || []).map(zone => [zone.zoneId, zone]));
+
+  zones.forEach(zone => {
+    const before = previousZones.get(zone.zoneId);
+    addSample(cameraId, zone.zoneId, zone.zoneName, timestamp, {
+      count: zone.peopleCount || 0,
+      density: zone.density || 0,
+      dwellLevel: before ? before.alertLevel || 'normal' : null,
+      dwellCount: before ? before.peopleCount || 0 : 0,
+      dwellDensity: before ? before.density || 0 : 0,
+      dwellSeconds: before ? dwell : 0,
+      grid: zone.heatmapGrid,
+    });
+  });
+
+  addSample(cameraId, OVERALL_ZONE, 'Overall', timestamp, {
+    count: heatmap.overallPeopleCount || 0,
+    density: 0,
+    dwellLevel: previous ? previous.overallRushStatus || 'normal' : null,
+    dwellCount: previous ? previous.overallPeopleCount || 0 : 0,
+    dwellDensity: 0,
+    dwellSeconds: dwell,
+  });
+
+  // All cameras together, from the latest state of each
+  if (combined) {
+    addSample(ALL_CAMERAS, OVERALL_ZONE, 'Overall', timestamp, {
+      count: combined.overallPeopleCount || 0,
+      density: 0,
+      dwellLevel: previousCombined ? previousCombined.overallRushStatus || 'normal' : null,
+      dwellCount: previousCombined ? previousCombined.overallPeopleCount || 0 : 0,
+      dwellDensity: 0,
+      dwellSeconds: gapSeconds(previousCombined && previousCombined.timestamp, timestamp),
+    });
+  }
+};
+
+const toOperations = (delta) => {
+  const filter = {
+    granularity: delta.granularity,
+    cameraId: delta.cameraId,
+    zoneId: delta.zoneId,
+    bucket: delta.bucket,
+  };
+  const retention = GRANULARITIES[delta.granularity].retentionMs;
+
+  const inc = {
+    samples: delta.samples,
+    countSum: delta.countSum,
+    densitySum: delta.densitySum,
+    seconds: delta.seconds,
+    countSeconds: delta.countSeconds,
+    densitySeconds: delta.densitySeconds,
+  };
+  Object.entries(delta.dwell).forEach(([level, seconds]) => {
+    inc[`alertDwell.${level}`] = seconds;
+  });
+
+  const setOnInsert = { zoneName: delta.zoneName };
+  if (retention) {
+    setOnInsert.expireAt = new Date(delta.bucket.getTime() + retention);
+  }
+  if (delta.grid) {
+    // The grid array has to exist before its elements can be incremented
+    setOnInsert.gridSum = new Array(delta.grid.length).fill(0);
+    setOnInsert.gridRows = delta.gridRows;
+    setOnInsert.gridCols = delta.gridCols;
+  }
+
+  // A delta left with only its grid increment (see flush) updates an existing document
+  const operations = delta.samples === 0 ? [] : [{
+    updateOne: {
+      filter,
+      update: {
+        $setOnInsert: setOnInsert,
+        $inc: inc,
+        $min: { countMin: delta.countMin },
+        $max: { countMax: delta.countMax, densityMax: delta.densityMax },
+      },
+      upsert: true,
+    },
+  }];
+
+  if (delta.grid) {
+    const gridInc = {};
+    delta.grid.forEach((value, i) => {
+      if (value) gridInc[`gridSum.${i}`] = value;
+    });
+    if (Object.keys(gridInc).length > 0) {
+      operations.push({ updateOne: { filter, update: { $inc: gridInc } } });
+    }
+  }
+  return operations;
+};
+
+// Put a delta that was not written back in front of the deltas gathered since
+const requeue = (key, delta) => {
+  const newer = deltas.get(key);
+  if (!newer) {
+    deltas.set(key, delta);
+    return;
+  }
+  newer.samples += delta.samples;
+  newer.countSum += delta.countSum;
+  newer.countMin = Math.min(newer.countMin, delta.countMin);
+  newer.countMax = Math.max(newer.countMax, delta.countMax);
+  newer.densitySum += delta.densitySum;
+  newer.densityMax = Math.max(newer.densityMax, delta.densityMax);
+  newer.seconds += delta.seconds;
+  newer.countSeconds += delta.countSeconds;
+  newer.densitySeconds += delta.densitySeconds;
+  Object.entries(delta.dwell).forEach(([level, seconds]) => {
+    newer.dwell[level] = (newer.dwell[level] || 0) + seconds;
+  });
+  if (delta.grid && !newer.grid) {
+    newer.grid = delta.grid;
+    newer.gridRows = delta.gridRows;
+    newer.gridCols = delta.gridCols;
+  } else if (delta.grid && delta.grid.length === newer.grid.length) {
+    delta.grid.forEach((value, i) => { newer.grid[i] += value; });
+  }
+};
+
+// Write accumulated deltas with one bulkWrite; what was not applied is retried on the next flush
+const flush = async () => {
+  if (deltas.size === 0) {
+    return 0;
+  }
+  const batch = deltas;
+  deltas = new Map();
+
+  // owners[i] is the key of the delta operation i belongs to, and whether it is the grid increment
+  const operations = [];
+  const owners = [];
+  batch.forEach((delta, key) => {
+    toOperations(delta).forEach((operation, i) => {
+      operations.push(operation);
+      owners.push({ key, grid: i > 0 || delta.samples === 0 });
+    });
+  });
+
+  try {
+    // Ordered, so each grid increment runs after the upsert that creates its array
+    await CrowdRollup.bulkWrite(operations, { ordered: true });
+  } catch (error) {
+    console.error('Error writing crowd rollups:', error.message);
+    // An ordered bulkWrite applies everything before the failing operation, and those
+    // $incs must not run twice; without a failing index nothing is known to be applied
+    const writeErrors = error.writeErrors || [];
+    const failedAt = writeErrors.length > 0 ? writeErrors[0].index : 0;
+    const unapplied = new Map();
+    owners.slice(failedAt).forEach(({ key, grid }) => {
+      const delta = batch.get(key);
+      if (!grid) {
+        unapplied.set(key, delta);
+      } else if (!unapplied.has(key)) {
+        // The counters went through, only the grid increment is left
+        unapplied.set(key, { ...emptyDelta(delta), grid: delta.grid, gridRows: delta.gridRows, gridCols: delta.gridCols });
+      }
+    });
+    unapplied.forEach((delta, key) => requeue(key, delta));
+    throw error;
+  }
+  return operations.length;
+};
+
+// Time-weighted mean count and density of a rollup; per report for buckets without timed samples
+const meanCount = (r) => (r.seconds ? r.countSeconds / r.seconds : (r.samples ? r.countSum / r.samples : 0));
+const meanDensity = (r) => (r.seconds ? r.densitySeconds / r.seconds : (r.samples ? r.densitySum / r.samples : 0));
+
+// Finest granularity whose bucket count stays small for the requested span
+const granularityFor = (spanMs) => {
+  if (spanMs <= 6 * 60 * 60 * 1000) return 'minute';
+  if (spanMs <= 14 * DAY_MS) return 'hour';
+  return 'day';
+};
+
+const find = (granularity, query, start, end) => {
+  const bucket = {};
+  if (start) bucket.$gte = bucketStart(start, granularity);
+  if (end) bucket.$lte = end;
+  return CrowdRollup.find({ granularity, ...query, ...(start || end ? { bucket } : {}) })
+    .sort({ bucket: 1 })
+    .lean();
+};
+
+module.exports = {
+  OVERALL_ZONE,
+  ALL_CAMERAS,
+  bucketStart,
+  record,
+  flush,
+  meanCount,
+  meanDensity,
+  granularityFor,
+  find,
+};
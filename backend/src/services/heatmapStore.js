@@ -0,0 +1,275 @@
+// In-memory latest heatmap state and batched persistence for crowd heatmap ingestion
+const mongoose = require('mongoose');
+const CrowdHeatmap = require('../models/CrowdHeatmap');
+const crowdRollups = require('./crowdRollups');
+
+const FLUSH_INTERVAL_MS = 1000;
+const BATCH_SIZE = 200;
+const MAX_PENDING = 10000;      // Cap while MongoDB is unreachable; oldest records are dropped first
+const LATENCY_SAMPLES = 2000;
+
+// cameraId -> latest heatmap record from that camera
+const latestByCamera = new Map();
+
+// `${cameraId}:${zoneId}` -> time of the last rush alert for that zone
+const lastAlertTime = new Map();
+
+let pending = [];
+let inFlight = null;    // promise of the batch write in progress
+let flushTimer = null;
+let warming = null;        // seed query shared by every caller; cleared on failure so the next call retries
+let lastCombined = null;    // all-camera state after the previous ingest, for the rollups
+
+const stats = {
+  received: 0,
+  persisted: 0,
+  invalid: 0,
+  dropped: 0,
+  flushes: 0,
+  flushErrors: 0,
+  rollupErrors: 0,
+  lastFlushMs: 0,
+};
+const ingestLatencies = [];
+
+// Build a heatmap record; the _id is assigned up front so alerts can reference it before it is written
+const createRecord = (cameraId, { timestamp, zones, frameWidth, frameHeight, overallPeopleCount }, overallRushStatus) => ({
+  _id: new mongoose.Types.ObjectId(),
+  cameraId,
+  timestamp: timestamp && !isNaN(new Date(timestamp)) ? new Date(timestamp) : new Date(),
+  overallPeopleCount: overallPeopleCount || zones.reduce((sum, z) => sum + z.peopleCount, 0),
+  overallRushStatus,
+  zones,
+  frameWidth,
+  frameHeight,
+  alertTriggered: false,
+});
+
+// Store the latest state, fold it into the rollups and queue the record for the next batch write
+const ingest = (record) => {
+  const previous = latestByCamera.get(record.cameraId);
+  latestByCamera.set(record.cameraId, record);
+  stats.received += 1;
+
+  const combined = getCombined();
+  const current = {
+    timestamp: lastCombined && lastCombined.timestamp > record.timestamp ? lastCombined.timestamp : record.timestamp,
+    overallPeopleCount: combined.overallPeopleCount,
+    overallRushStatus: combined.overallRushStatus,
+  };
+  crowdRollups.record(record, previous, current, lastCombined);
+  lastCombined = current;
+
+  pending.push(record);
+  if (pending.length > MAX_PENDING) {
+    stats.dropped += pending.length - MAX_PENDING;
+    pending = pending.slice(pending.length - MAX_PENDING);
+  }
+  if (pending.length >= BATCH_SIZE) {
+    flush();
+  }
+};
+
+// Write queued records with one insertMany; failed batches are retried on the next flush
+const writeBatch = async (batch) => {
+  const started = Date.now();
+  try {
+    // Unordered insertMany skips documents that fail validation instead of throwing;
+    // the raw result says how many were actually inserted
+    const result = await CrowdHeatmap.insertMany(batch, { ordered: false, rawResult: true });
+    stats.persisted += result.insertedCount;
+    if (result.insertedCount < batch.length) {
+      stats.invalid += batch.length - result.insertedCount;
+      console.error(`Skipped ${batch.length - result.insertedCount} invalid heatmap records`);
+    }
+  } catch (error) {
+    // Records already written by an earlier attempt come back as duplicate keys
+    const writeErrors = error.writeErrors || [];
+    const onlyDuplicates = writeErrors.length > 0 && writeErrors.every(e => (e.code || (e.err && e.err.code)) === 11000);
+    if (onlyDuplicates) {
+      // insertedDocs leaves out the duplicates and any document that failed validation
+      stats.persisted += error.insertedDocs ? error.insertedDocs.length : batch.length - writeErrors.length;
+    } else {
+      stats.flushErrors += 1;
+      console.error('Error persisting heatmap batch:', error.message);
+      pending = batch.concat(pending);
+    }
+  } finally {
+    stats.flushes += 1;
+    stats.lastFlushMs = Date.now() - started;
+  }
+  return batch.length;
+};
+
+// Rollup deltas are kept and retried by crowdRollups itself
+const writeRollups = () => crowdRollups.flush().catch(() => {
+  stats.rollupErrors += 1;
+  return 0;
+});
+
+const flush = () => {
+  if (inFlight) {
+    return inFlight;
+  }
+  const batch = pending;
+  pending = [];
+  inFlight = Promise.all([batch.length > 0 ? writeBatch(batch) : 0, writeRollups()])
+    .then(([written]) => written)
+    .finally(() => {
+      inFlight = null;
+    });
+  return inFlight;
+};
+
+const start = () => {
+  if (!flushTimer) {
+    flushTimer = setInterval(flush, FLUSH_INTERVAL_MS);
+    flushTimer.unref();
+  }
+};
+
+const stop = async () => {
+  if (flushTimer) {
+    clearInterval(flushTimer);
+    flushTimer = null;
+  }
+  if (inFlight) {
+    await inFlight;
+  }
+  await flush();
+};
+
+// After a restart, seed the cache from the newest stored record of each camera
+const seed = async () => {
+  const latest = await CrowdHeatmap.aggregate([
+    { $sort: { timestamp: -1 } },
+    { $group: { _id: { $ifNull: ['$cameraId', 'default'] }, doc: { $first: '$$ROOT' } } },
+  ]);
+  latest.forEach(({ _id, doc }) => {
+    if (!latestByCamera.has(_id)) {
+      latestByCamera.set(_id, { ...doc, cameraId: _id });
+    }
+  });
+};
+
+const warm = () => {
+  if (!warming) {
+    warming = seed().catch((error) => {
+      warming = null;
+      throw error;
+    });
+  }
+  return warming;
+};
+
+const getLatest = (cameraId) => latestByCamera.get(cameraId) || null;
+
+const getCameras = () => [...latestByCamera.values()];
+
+const RUSH_ORDER = ['normal', 'moderate', 'high', 'critical'];
+
+// Latest state of every camera combined into one heatmap-shaped object
+const getCombined = () => {
+  const cameras = [...latestByCamera.values()];
+  if (cameras.length === 0) {
+    return null;
+  }
+  if (cameras.length === 1) {
+    return cameras[0];
+  }
+
+  const newest = cameras.reduce((a, b) => (a.timestamp >= b.timestamp ? a : b));
+  return {
+    _id: newest._id,
+    timestamp: newest.timestamp,
+    overallPeopleCount: cameras.reduce((sum, c) => sum + c.overallPeopleCount, 0),
+    overallRushStatus: cameras.reduce(
+      (worst, c) => (RUSH_ORDER.indexOf(c.overallRushStatus) > RUSH_ORDER.indexOf(worst) ? c.overallRushStatus : worst),
+      'normal'
+    ),
+    zones: cameras.flatMap(c => c.zones.map(z => ({ ...z, cameraId: c.cameraId }))),
+    frameWidth: newest.frameWidth,
+    frameHeight: newest.frameHeight,
+    cameras: cameras.map(c => ({
+      cameraId: c.cameraId,
+      timestamp: c.timestamp,
+      overallPeopleCount: c.overallPeopleCount,
+      overallRushStatus: c.overallRushStatus,
+    })),
+  };
+};
+
+// Alert cooldown per camera and zone, checked against in-memory state only
+const shouldAlert = (cameraId, zone, cooldownMs) => {
+  const { zoneId, alertLevel } = zone;
+  if (alertLevel !== 'high' && alertLevel !== 'critical') {
+    return false;
+  }
+
+  const key = `${cameraId}:${zoneId}`;
+  const now = Date.now();
+  const lastAlert = lastAlertTime.get(key);
+  if (lastAlert && (now - lastAlert) < cooldownMs) {
+    return false;
+  }
+  lastAlertTime.set(key, now);
+  return true;
+};
+
+// Link an alert to its heatmap record, whether or not the record has been written yet
+const markAlert = async (record, emergencyRequestId) => {
+  record.alertTriggered = true;
+  record.emergencyRequestId = emergencyRequestId;
+  if (!pending.includes(record)) {
+    // The record may be part of the batch being written right now
+    if (inFlight) {
+      await inFlight;
+    }
+    await CrowdHeatmap.updateOne({ _id: record._id }, { alertTriggered: true, emergencyRequestId });
+  }
+};
+
+const recordLatency = (ms) => {
+  ingestLatencies.push(ms);
+  if (ingestLatencies.length > LATENCY_SAMPLES) {
+    ingestLatencies.shift();
+  }
+};
+
+const percentile = (sorted, p) => {
+  if (sorted.length === 0) return 0;
+  const index = Math.min(sorted.length - 1, Math.ceil((p / 100) * sorted.length) - 1);
+  return Math.round(sorted[Math.max(0, index)] * 1000) / 1000;
+};
+
+const getStats = () => {
+  const sorted = [...ingestLatencies].sort((a, b) => a - b);
+  return {
+    ...stats,
+    pending: pending.length,
+    cameras: latestByCamera.size,
+    ingestMs: {
+      samples: sorted.length,
+      p50: percentile(sorted, 50),
+      p95: percentile(sorted, 95),
+      p99: percentile(sorted, 99),
+      max: sorted.length ? Math.round(sorted[sorted.length - 1] * 1000) / 1000 : 0,
+    },
+  };
+};
+
+module.exports = {
+  createRecord,
+  ingest,
+  flush,
+  start,
+  stop,
+  warm,
+  getLatest,
+  getCameras,
+  getCombined,
+  shouldAlert,
+  markAlert,
+  recordLatency,
+  getStats,
+};
@@ -0,0 +1,256 @@
+// Throttled, delta-encoded crowd heatmap broadcasts to subscribed rooms
+// Rooms: crowd:all (every camera), crowd:cam:<cameraId>, crowd:zone:<cameraId>:<zoneId>
+// Subscribers first get a snapshot, then crowd:heatmap-delta messages carrying only
+// the fields that changed. A delta applies when the client's version for that camera
+// is >= baseVersion; otherwise the client asks for crowd:resync.
+
+const BROADCAST_INTERVAL_MS = parseInt(process.env.CROWD_BROADCAST_INTERVAL_MS, 10) || 1000;
+
+const ALL_ROOM = 'crowd:all';
+const cameraRoom = (cameraId) => `crowd:cam:${cameraId}`;
+const zoneRoom = (cameraId, zoneId) => `crowd:zone:${cameraId}:${zoneId}`;
+
+const ZONE_FIELDS = ['zoneName', 'peopleCount', 'density', 'alertLevel', 'predictedAlertLevel', 'forecast', 'peakLocalDensity', 'crushRisk', 'crushClusters', 'meanSpeed', 'counterFlow', 'surge', 'heatmapGrid', 'boundingBoxes'];
+const CAMERA_FIELDS = ['timestamp', 'overallPeopleCount', 'overallRushStatus', 'frameWidth', 'frameHeight'];
+
+let io = null;
+let timer = null;
+
+// cameraId -> newest record not yet broadcast
+const dirty = new Map();
+
+// cameraId -> { version, state } as last broadcast; snapshots are taken from here
+const sent = new Map();
+
+// room -> version last sent to that room (zone rooms skip versions where their zone did not change)
+const roomVersion = new Map();
+
+// socket id -> message counters
+const clients = new Map();
+const totals = { messages: 0, bytes: 0, deltas: 0, snapshots: 0, startedAt: Date.now() };
+
+const toState = (record) => {
+  const state = { zones: {} };
+  CAMERA_FIELDS.forEach(field => { state[field] = record[field]; });
+  record.zones.forEach(zone => {
+    state.zones[zone.zoneId] = {};
+    ZONE_FIELDS.forEach(field => { state.zones[zone.zoneId][field] = zone[field]; });
+  });
+  return state;
+};
+
+const sameValue = (a, b) => {
+  if (a === b) return true;
+  if (a instanceof Date || b instanceof Date) return new Date(a).getTime() === new Date(b).getTime();
+  if (typeof a === 'object' && a !== null && b !== null) return JSON.stringify(a) === JSON.stringify(b);
+  return false;
+};
+
+const diffZone = (previous, current) => {
+  const changed = {};
+  ZONE_FIELDS.forEach(field => {
+    if (!previous || !sameValue(previous[field], current[field])) {
+      changed[field] = current[field];
+    }
+  });
+  return changed;
+};
+
+const zoneList = (state, zoneIds) => Object.entries(state.zones)
+  .filter(([zoneId]) => !zoneIds || zoneIds.includes(zoneId))
+  .map(([zoneId, zone]) => ({ zoneId, ...zone }));
+
+// Emit to a room, counting messages and bytes for every recipient
+const emitToRoom = (room, event, payload) => {
+  const members = io.sockets.adapter.rooms.get(room);
+  if (!members || members.size === 0) {
+    return;
+  }
+  const bytes = Buffer.byteLength(JSON.stringify(payload));
+  io.to(room).emit(event, payload);
+  members.forEach(socketId => {
+    const client = clients.get(socketId);
+    if (client) {
+      client.messages += 1;
+      client.bytes += bytes;
+    }
+  });
+  totals.messages += members.size;
+  totals.bytes += bytes * members.size;
+};
+
+const emitToSocket = (socket, event, payload) => {
+  const bytes = Buffer.byteLength(JSON.stringify(payload));
+  socket.emit(event, payload);
+  const client = clients.get(socket.id);
+  if (client) {
+    client.messages += 1;
+    client.bytes += bytes;
+  }
+  totals.messages += 1;
+  totals.bytes += bytes;
+};
+
+const broadcastCamera = (cameraId, record) => {
+  const previous = sent.get(cameraId);
+  const state = toState(record);
+  const version = previous ? previous.version + 1 : 1;
+  const baseVersion = previous ? previous.version : 0;
+
+  const cameraDelta = {};
+  CAMERA_FIELDS.forEach(field => {
+    if (!previous || !sameValue(previous.state[field], state[field])) {
+      cameraDelta[field] = state[field];
+    }
+  });
+
+  const zones = {};
+  Object.entries(state.zones).forEach(([zoneId, zone]) => {
+    const changed = diffZone(previous && previous.state.zones[zoneId], zone);
+    if (Object.keys(changed).length > 0) {
+      zones[zoneId] = changed;
+    }
+  });
+  const removedZones = previous
+    ? Object.keys(previous.state.zones).filter(zoneId => !state.zones[zoneId])
+    : [];
+
+  sent.set(cameraId, { version, state });
+
+  const delta = { cameraId, version, baseVersion, ...cameraDelta, zones };
+  if (removedZones.length > 0) {
+    delta.removedZones = removedZones;
+  }
+  emitToRoom(ALL_ROOM, 'crowd:heatmap-delta', delta);
+  emitToRoom(cameraRoom(cameraId), 'crowd:heatmap-delta', delta);
+  totals.deltas += 1;
+
+  // Zone rooms only hear about their own zone
+  Object.entries(zones).forEach(([zoneId, changed]) => {
+    const room = zoneRoom(cameraId, zoneId);
+    emitToRoom(room, 'crowd:heatmap-delta', {
+      cameraId,
+      version,
+      baseVersion: roomVersion.get(room) || 0,
+      zones: { [zoneId]: changed },
+    });
+    roomVersion.set(room, version);
+  });
+};
+
+const tick = () => {
+  if (dirty.size === 0) {
+    return;
+  }
+  const batch = [...dirty.entries()];
+  dirty.clear();
+  batch.forEach(([cameraId, record]) => broadcastCamera(cameraId, record));
+};
+
+// Record a new heatmap; it goes out with the next tick, coalesced with any newer one
+const publish = (record) => {
+  dirty.set(record.cameraId, record);
+};
+
+// Start from records already known (e.g. loaded from the database) for cameras not broadcast yet
+const seed = (records) => {
+  records.forEach(record => {
+    if (!sent.has(record.cameraId) && !dirty.has(record.cameraId)) {
+      sent.set(record.cameraId, { version: 1, state: toState(record) });
+    }
+  });
+};
+
+const snapshot = (cameraId, zoneId) => {
+  const cameraIds = cameraId ? [cameraId] : [...sent.keys()];
+  const cameras = cameraIds
+    .filter(id => sent.has(id))
+    .map(id => {
+      const { version, state } = sent.get(id);
+      const camera = { cameraId: id, version, zones: zoneList(state, zoneId ? [zoneId] : null) };
+      CAMERA_FIELDS.forEach(field => { camera[field] = state[field]; });
+      return camera;
+    });
+  return { cameras };
+};
+
+const roomFor = ({ cameraId, zoneId } = {}) => {
+  if (cameraId && zoneId) return zoneRoom(cameraId, zoneId);
+  if (cameraId) return cameraRoom(cameraId);
+  return ALL_ROOM;
+};
+
+// Join the room for a scope and send its snapshot
+const subscribe = (socket, scope = {}) => {
+  const room = roomFor(scope);
+  socket.join(room);
+  emitToSocket(socket, 'crowd:heatmap-snapshot', { ...snapshot(scope.cameraId, scope.zoneId), scope });
+  totals.snapshots += 1;
+  return room;
+};
+
+const unsubscribe = (socket, scope = {}) => {
+  socket.leave(roomFor(scope));
+};
+
+const resync = (socket, scope = {}) => {
+  emitToSocket(socket, 'crowd:heatmap-snapshot', { ...snapshot(scope.cameraId, scope.zoneId), scope });
+  totals.snapshots += 1;
+};
+
+const trackClient = (socket) => {
+  clients.set(socket.id, { connectedAt: Date.now(), messages: 0, bytes: 0 });
+};
+
+const untrackClient = (socket) => {
+  clients.delete(socket.id);
+};
+
+const getStats = () => {
+  const now = Date.now();
+  const rates = [...clients.values()].map(client => {
+    const seconds = Math.max((now - client.connectedAt) / 1000, 1);
+    return { messagesPerSec: client.messages / seconds, bytesPerSec: client.bytes / seconds };
+  });
+  const round = (value) => Math.round(value * 100) / 100;
+  const average = (key) => (rates.length ? round(rates.reduce((sum, r) => sum + r[key], 0) / rates.length) : 0);
+  const maximum = (key) => (rates.length ? round(Math.max(...rates.map(r => r[key]))) : 0);
+
+  const rooms = {};
+  if (io) {
+    io.sockets.adapter.rooms.forEach((members, room) => {
+      if (room.startsWith('crowd:')) rooms[room] = members.size;
+    });
+  }
+
+  return {
+    intervalMs: BROADCAST_INTERVAL_MS,
+    clients: clients.size,
+    rooms,
+    perClient: {
+      messagesPerSec: { avg: average('messagesPerSec'), max: maximum('messagesPerSec') },
+      bytesPerSec: { avg: average('bytesPerSec'), max: maximum('bytesPerSec') },
+    },
+    totals: { ...totals, uptimeSec: Math.round((now - totals.startedAt) / 1000) },
+  };
+};
+
+const init = (socketServer) => {
+  io = socketServer;
+  if (!timer) {
+    timer = setInterval(tick, BROADCAST_INTERVAL_MS);
+    timer.unref();
+  }
+};
+
+module.exports = {
+  init,
+  publish,
+  seed,
+  subscribe,
+  unsubscribe,
+  resync,
+  trackClient,
+  untrackClient,
+  getStats,
+};
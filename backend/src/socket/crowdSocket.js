@@ -1,31 +1,60 @@
-const CrowdHeatmap = require('../models/CrowdHeatmap');
+const heatmapStore = require('../services/heatmapStore');
+const crowdBroadcaster = require('./crowdBroadcaster');
 
 const initializeCrowdSocket = (io) => {
+  crowdBroadcaster.init(io);
+
   io.on('connection', (socket) => {
     console.log('Client connected to crowd heatmap socket:', socket.id);
+    crowdBroadcaster.trackClient(socket);
+
+    // Subscribe to heatmap updates: {} for all cameras, { cameraId } or { cameraId, zoneId }
+    // Replies with crowd:heatmap-snapshot, then crowd:heatmap-delta at most once per interval
+    socket.on('crowd:subscribe', async (scope = {}) => {
+      try {
+        await heatmapStore.warm();
+        crowdBroadcaster.seed(heatmapStore.getCameras());
+        const room = crowdBroadcaster.subscribe(socket, scope || {});
+        console.log(`Socket ${socket.id} subscribed to ${room}`);
+      } catch (error) {
+        console.error('Error subscribing to heatmap:', error);
+        socket.emit('crowd:error', { message: 'Failed to subscribe to heatmap data' });
+      }
+    });
+
+    socket.on('crowd:unsubscribe', (scope = {}) => {
+      crowdBroadcaster.unsubscribe(socket, scope || {});
+    });
+
+    // Client missed a delta (version gap): send a fresh snapshot
+    socket.on('crowd:resync', (scope = {}) => {
+      crowdBroadcaster.resync(socket, scope || {});
+    });
 
-    // Join crowd monitoring room
-    socket.on('crowd:join', () => {
-      socket.join('crowd-monitoring');
+    // Join crowd monitoring room (all cameras)
+    socket.on('crowd:join', async () => {
+      await heatmapStore.warm().catch(() => {});
+      crowdBroadcaster.seed(heatmapStore.getCameras());
+      crowdBroadcaster.subscribe(socket, {});
       console.log(`Socket ${socket.id} joined crowd monitoring room`);
     });
 
     // Leave crowd monitoring room
     socket.on('crowd:leave', () => {
-      socket.leave('crowd-monitoring');
+      crowdBroadcaster.unsubscribe(socket, {});
       console.log(`Socket ${socket.id} left crowd monitoring room`);
     });
 
     // Request latest heatmap data
     socket.on('crowd:request-latest', async () => {
       try {
-        const latestHeatmap = await CrowdHeatmap.findOne()
-          .sort({ timestamp: -1 })
-          .limit(1);
+        await heatmapStore.warm();
+        const latestHeatmap = heatmapStore.getCombined();
 
         if (latestHeatmap) {
           socket.emit('crowd:heatmap-update', {
             id: latestHeatmap._id,
+            cameraId: latestHeatmap.cameraId,
             timestamp: latestHeatmap.timestamp,
             overallPeopleCount: latestHeatmap.overallPeopleCount,
             overallRushStatus: latestHeatmap.overallRushStatus,
@@ -41,6 +70,7 @@ const initializeCrowdSocket = (io) => {
     });
 
     socket.on('disconnect', () => {
+      crowdBroadcaster.untrackClient(socket);
       console.log('Client disconnected from crowd socket:', socket.id);
     });
   });
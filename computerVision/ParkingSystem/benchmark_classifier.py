@@ -0,0 +1,80 @@
+"""
+Compare per-spot empty_or_not with the batched empty_or_not_batch
+
+Runs both classifiers over sampled frames of the parking video, checks that the
+batched output matches the per-spot output and reports the time per full-lot pass.
+
+Usage:
+    python benchmark_classifier.py [video_path] [mask_path] [--frames 20] [--step 30]
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from util import get_parking_spots_bboxes, empty_or_not, empty_or_not_batch
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('video', nargs='?', default=os.path.join(script_dir, 'parking_1920_1080.mp4'))
+    parser.add_argument('mask', nargs='?', default=os.path.join(script_dir, 'mask_1920_1080.png'))
+    parser.add_argument('--frames', type=int, default=20, help='number of sampled frames')
+    parser.add_argument('--step', type=int, default=30, help='frames between samples')
+    args = parser.parse_args()
+
+    mask = cv2.imread(args.mask, 0)
+    spots = get_parking_spots_bboxes(cv2.connectedComponentsWithStats(mask, 4, cv2.CV_32S))
+
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        print(f"Error: Could not open video file: {args.video}")
+        return
+
+    single_times = []
+    batch_times = []
+    agree = 0
+    total = 0
+    frame_nmr = 0
+
+    while len(batch_times) < args.frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_nmr += 1
+        if (frame_nmr - 1) % args.step != 0:
+            continue
+
+        start = time.perf_counter()
+        single = [empty_or_not(frame[y1:y1 + h, x1:x1 + w, :]) for x1, y1, w, h in spots]
+        single_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        batch = empty_or_not_batch(frame, spots)
+        batch_times.append(time.perf_counter() - start)
+
+        agree += sum(1 for a, b in zip(single, batch) if a == b)
+        total += len(spots)
+
+    cap.release()
+
+    if not batch_times:
+        print("No frames read")
+        return
+
+    single_ms = np.median(single_times) * 1000
+    batch_ms = np.median(batch_times) * 1000
+    print(f"Spots: {len(spots)} | sampled frames: {len(batch_times)}")
+    print(f"Per-spot empty_or_not : {single_ms:8.2f} ms per lot pass (median)")
+    print(f"Batched               : {batch_ms:8.2f} ms per lot pass (median)")
+    print(f"Speedup               : {single_ms / batch_ms:8.1f}x")
+    print(f"Agreement             : {agree}/{total} ({100.0 * agree / total:.2f}%)")
+
+
+if __name__ == "__main__":
+    main()
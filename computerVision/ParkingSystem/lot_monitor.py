@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+
+from util import get_parking_spots_bboxes, empty_or_not_batch
+from spot_stats import SpotMeans
+from spot_state import SpotStateMachine
+from occupancy_publisher import OccupancyPublisher
+
+
+def load_mask(mask_path, frame_size):
+    """
+    Read a lot mask and rescale it to the stream resolution (width, height)
+    Nearest-neighbour keeps the mask binary so spot components stay separate
+    """
+    mask = cv2.imread(mask_path, 0)
+    if mask is None:
+        raise FileNotFoundError(f"Could not read mask: {mask_path}")
+
+    if (mask.shape[1], mask.shape[0]) != tuple(frame_size):
+        mask = cv2.resize(mask, tuple(frame_size), interpolation=cv2.INTER_NEAREST)
+    return mask
+
+
+class LotMonitor:
+    """
+    Occupancy monitoring for one parking lot
+    Holds the spot layout, per-spot statistics, state machine and publisher;
+    process() is called on each sampled frame.
+    """
+
+    def __init__(self, lot_id, mask_path, frame_size, publish=True, **publisher_kwargs):
+        self.lot_id = lot_id
+
+        mask = load_mask(mask_path, frame_size)
+        connected_components = cv2.connectedComponentsWithStats(mask, 4, cv2.CV_32S)
+
+        self.spots = get_parking_spots_bboxes(connected_components)
+        self.spot_means = SpotMeans(connected_components)
+        self.state_machine = SpotStateMachine(len(self.spots))
+
+        self.publisher = None
+        if publish:
+            self.publisher = OccupancyPublisher(lot_id, len(self.spots), **publisher_kwargs)
+            self.publisher.start()
+
+    @property
+    def spots_status(self):
+        return self.state_machine.status
+
+    def process(self, frame):
+        """Update spot states from one sampled frame"""
+        means = self.spot_means.compute(frame)
+
+        # Only spots whose state is uncertain are re-classified, in one predict call
+        arr_ = self.state_machine.spots_to_classify(means)
+        statuses = empty_or_not_batch(frame, [self.spots[j] for j in arr_])
+        self.state_machine.update(arr_, statuses)
+
+        if self.publisher is not None:
+            self.publisher.update(self.state_machine.status, self.state_machine.changed)
+
+    def draw(self, frame):
+        for spot_indx, spot in enumerate(self.spots):
+            spot_status = self.spots_status[spot_indx]
+            x1, y1, w, h = spot
+
+            if spot_status:
+                frame = cv2.rectangle(frame, (x1, y1), (x1 + w, y1 + h), (0, 255, 0), 2)
+            else:
+                frame = cv2.rectangle(frame, (x1, y1), (x1 + w, y1 + h), (0, 0, 255), 2)
+
+        cv2.rectangle(frame, (80, 20), (550, 80), (0, 0, 0), -1)
+        cv2.putText(frame, 'Available spots: {} / {}'.format(str(int(np.sum(self.spots_status))), str(len(self.spots))),
+                    (100, 60), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        return frame
+
+    def stats(self):
+        stats = dict(self.state_machine.stats())
+        if self.publisher is not None:
+            stats.update({'published_' + k: v for k, v in self.publisher.stats().items()})
+        return stats
+
+    def close(self):
+        if self.publisher is not None:
+            self.publisher.stop()
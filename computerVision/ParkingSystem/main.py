@@ -1,91 +1,43 @@
 import cv2
 import matplotlib.pyplot as plt
-import numpy as np
 import os
-
-from util import get_parking_spots_bboxes, empty_or_not
-
-
-def calc_diff(im1, im2):
-    return np.abs(np.mean(im1) - np.mean(im2))
-
+import sys
 
 # Get the directory where the script is located
 script_dir = os.path.dirname(os.path.abspath(__file__))
-mask = os.path.join(script_dir, 'mask_1920_1080.png')
-video_path = os.path.join(script_dir, 'parking_1920_1080.mp4')
+sys.path.insert(0, os.path.join(script_dir, '..', 'common'))
 
+from frame_source import FrameSource
+from lot_monitor import LotMonitor
 
-mask = cv2.imread(mask, 0)
 
-cap = cv2.VideoCapture(video_path)
-
-connected_components = cv2.connectedComponentsWithStats(mask, 4, cv2.CV_32S)
-
-spots = get_parking_spots_bboxes(connected_components)
-
-spots_status = [None for j in spots]
-diffs = [None for j in spots]
-
-previous_frame = None
+mask = os.path.join(script_dir, 'mask_1920_1080.png')
+video_path = os.path.join(script_dir, 'parking_1920_1080.mp4')
+lot_id = 'main'
 
-frame_nmr = 0
-ret = True
+# Only every step-th frame is decoded; replay is paced to real time
 step = 30
-while ret:
-    ret, frame = cap.read()
-    
-    # Check if frame was read successfully
-    if not ret or frame is None:
-        break
-
-    if frame_nmr % step == 0 and previous_frame is not None:
-        for spot_indx, spot in enumerate(spots):
-            x1, y1, w, h = spot
-
-            spot_crop = frame[y1:y1 + h, x1:x1 + w, :]
-
-            diffs[spot_indx] = calc_diff(spot_crop, previous_frame[y1:y1 + h, x1:x1 + w, :])
-
-        print([diffs[j] for j in np.argsort(diffs)][::-1])
-
-    if frame_nmr % step == 0:
-        if previous_frame is None:
-            arr_ = range(len(spots))
-        else:
-            arr_ = [j for j in np.argsort(diffs) if diffs[j] / np.amax(diffs) > 0.4]
-        for spot_indx in arr_:
-            spot = spots[spot_indx]
-            x1, y1, w, h = spot
-
-            spot_crop = frame[y1:y1 + h, x1:x1 + w, :]
-
-            spot_status = empty_or_not(spot_crop)
-
-            spots_status[spot_indx] = spot_status
+source = FrameSource(video_path, stride=step, realtime=True)
 
-    if frame_nmr % step == 0:
-        previous_frame = frame.copy()
+# Spot layout, per-spot statistics, state machine and backend publisher;
+# the mask is rescaled if the video resolution differs
+lot = LotMonitor(lot_id, mask, source.frame_size)
 
-    for spot_indx, spot in enumerate(spots):
-        spot_status = spots_status[spot_indx]
-        x1, y1, w, h = spots[spot_indx]
+for frame_nmr, frame in source:
+    lot.process(frame)
 
-        if spot_status:
-            frame = cv2.rectangle(frame, (x1, y1), (x1 + w, y1 + h), (0, 255, 0), 2)
-        else:
-            frame = cv2.rectangle(frame, (x1, y1), (x1 + w, y1 + h), (0, 0, 255), 2)
+    if lot.state_machine.samples % 60 == 0:
+        print(lot.stats(), source.stats())
 
-    cv2.rectangle(frame, (80, 20), (550, 80), (0, 0, 0), -1)
-    cv2.putText(frame, 'Available spots: {} / {}'.format(str(sum(spots_status)), str(len(spots_status))), (100, 60),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    frame = lot.draw(frame)
 
     cv2.namedWindow('frame', cv2.WINDOW_NORMAL)
     cv2.imshow('frame', frame)
-    if cv2.waitKey(25) & 0xFF == ord('q'):
+    if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
-    frame_nmr += 1
+print(source.stats())
 
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+lot.close()
+source.release()
+cv2.destroyAllWindows()
@@ -0,0 +1,159 @@
+"""
+Monitor several parking lots from one machine
+
+Each lot runs headless in its own worker process; the spot classifier is loaded
+once per worker (pool initializer). Workers report frames per second and CPU use,
+and the parent prints a per-lot table.
+
+Usage:
+    python multi_lot.py [lots.json] [--report-every 10]
+
+lots.json is a list of lot configurations:
+    [{"lot_id": "north", "source": "parking_1920_1080.mp4", "mask": "mask_1920_1080.png", "step": 30}]
+Relative paths are resolved against the config file's directory; "source" may
+also be a camera index or a stream URL (reconnected with backoff). Optional keys:
+"realtime" (pace file replay), "loop" (restart files at the end), "publish".
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+import cv2
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..', 'common'))
+
+import util
+from frame_source import FrameSource
+from lot_monitor import LotMonitor
+
+
+def init_worker():
+    # Keep OpenCV from spawning a thread pool per worker; parallelism is across lots
+    cv2.setNumThreads(1)
+    util.load_model()
+
+
+def resolve_source(source, base_dir):
+    if isinstance(source, int) or str(source).isdigit():
+        return int(source)
+    if '://' in str(source):
+        return source
+    return os.path.join(base_dir, source)
+
+
+def run_lot(config, base_dir, stats_queue, report_every):
+    """Worker: run one lot until its source ends"""
+    lot_id = config['lot_id']
+    step = config.get('step', 30)
+
+    # Frames between samples are skipped without decoding
+    source = FrameSource(resolve_source(config['source'], base_dir), stride=step,
+                         realtime=config.get('realtime', False), loop=config.get('loop', False))
+    if not source.is_opened():
+        stats_queue.put({'lot_id': lot_id, 'error': f"could not open {config['source']}"})
+        return lot_id
+
+    lot = None
+    samples = 0
+    last_report = time.time()
+    last_cpu = time.process_time()
+    last_position = 0
+
+    for frame_nmr, frame in source:
+        if lot is None:
+            # Layout built from the actual stream resolution
+            frame_size = (frame.shape[1], frame.shape[0])
+            lot = LotMonitor(lot_id, os.path.join(base_dir, config['mask']), frame_size,
+                             publish=config.get('publish', True))
+
+        lot.process(frame)
+        samples += 1
+
+        now = time.time()
+        if now - last_report >= report_every:
+            cpu = time.process_time()
+            src = source.stats()
+            position = src['decoded'] + src['skipped']
+            stats_queue.put({
+                'lot_id': lot_id,
+                'fps': (position - last_position) / (now - last_report),
+                'samples_per_s': samples / (now - last_report),
+                'cpu_percent': 100.0 * (cpu - last_cpu) / (now - last_report),
+                'spots': len(lot.spots),
+                'available': int(lot.spots_status.sum()),
+                **src,
+                **lot.stats(),
+            })
+            samples = 0
+            last_report, last_cpu, last_position = now, cpu, position
+
+    if lot is not None:
+        lot.close()
+    source.release()
+    stats_queue.put({'lot_id': lot_id, 'finished': True})
+    return lot_id
+
+
+def print_table(latest):
+    print(f"{'lot':12s} {'fps':>8s} {'cpu%':>7s} {'decoded':>8s} {'skipped':>8s} {'spots':>6s} {'free':>6s}"
+          f" {'classified':>11s} {'flips':>6s}")
+    for lot_id in sorted(latest):
+        s = latest[lot_id]
+        if 'error' in s:
+            print(f"{lot_id:12s} ERROR: {s['error']}")
+            continue
+        if 'fps' not in s:
+            continue
+        print(f"{lot_id:12s} {s['fps']:8.1f} {s['cpu_percent']:7.1f} {s['decoded']:8d} {s['skipped']:8d}"
+              f" {s['spots']:6d} {s['available']:6d}"
+              f" {s['classifications']:11d} {s['flips']:6d}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config', nargs='?', default=os.path.join(script_dir, 'lots.json'))
+    parser.add_argument('--report-every', type=float, default=10.0)
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        lots = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(args.config))
+
+    manager = multiprocessing.Manager()
+    stats_queue = manager.Queue()
+
+    # One long-running worker per lot
+    with multiprocessing.Pool(processes=len(lots), initializer=init_worker) as pool:
+        result = pool.starmap_async(run_lot, [(cfg, base_dir, stats_queue, args.report_every) for cfg in lots])
+
+        latest = {}
+        finished = set()
+        last_print = time.time()
+        while not result.ready() or not stats_queue.empty():
+            try:
+                s = stats_queue.get(timeout=1)
+                if s.get('finished') or 'error' in s:
+                    finished.add(s['lot_id'])
+                if not s.get('finished'):
+                    latest[s['lot_id']] = s
+            except queue.Empty:
+                pass
+
+            if time.time() - last_print >= args.report_every and latest:
+                print_table(latest)
+                last_print = time.time()
+
+        result.get()
+
+    print_table(latest)
+    print(f"All lots finished: {', '.join(sorted(finished))}")
+
+
+if __name__ == "__main__":
+    main()
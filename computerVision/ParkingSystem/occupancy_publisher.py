@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+
+import requests
+
+
+BACKEND_URL = "http://localhost:5000/api/parking/bulk-update"
+
+
+class OccupancyPublisher:
+    """
+    Publishes confirmed spot occupancy to the backend from a background thread
+    Only slots whose confirmed status changed are sent, coalesced per interval
+    (a slot that flips twice within an interval is sent once, with its latest
+    value). A full snapshot is sent every snapshot_interval seconds to resync.
+    Deltas that could not be delivered are kept in a local spool file and merged
+    into the next attempt, also across restarts.
+    Slots are numbered 1..n in get_parking_spots_bboxes order; the lot id is the zone.
+    """
+
+    def __init__(self, lot_id, n_spots, url=BACKEND_URL, interval=2.0, snapshot_interval=300,
+                 spool_path=None, timeout=2):
+        self.lot_id = lot_id
+        self.n_spots = n_spots
+        self.url = url
+        self.interval = interval
+        self.snapshot_interval = snapshot_interval
+        self.timeout = timeout
+        self.spool_path = spool_path or f"./occupancy_spool_{lot_id}.json"
+
+        self._lock = threading.Lock()
+        self._pending = self._load_spool()   # slotNumber -> isOccupied
+        self._latest = {}                    # last known occupancy of every classified slot
+        self._last_snapshot = 0.0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.sent_requests = 0
+        self.sent_slots = 0
+        self.failed_requests = 0
+
+    def _load_spool(self):
+        if not os.path.exists(self.spool_path):
+            return {}
+        try:
+            with open(self.spool_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_spool(self, pending):
+        tmp_path = self.spool_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(pending, f)
+        os.replace(tmp_path, self.spool_path)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop after one last attempt to deliver pending changes"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+        self._thread = None
+        self.publish()
+
+    def update(self, status, changed):
+        """
+        Record the latest confirmed status (EMPTY = True per spot) and which spots changed
+        Cheap enough to call on every sample; nothing is sent from the caller's thread
+        """
+        changed_idx = [i for i, c in enumerate(changed) if c]
+        if not changed_idx:
+            return
+        with self._lock:
+            for i in changed_idx:
+                slot_number = str(i + 1)
+                is_occupied = not bool(status[i])
+                self._pending[slot_number] = is_occupied
+                self._latest[slot_number] = is_occupied
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.publish()
+
+    def publish(self):
+        """Send pending deltas, or a full snapshot when one is due; spool on failure"""
+        now = time.time()
+        with self._lock:
+            snapshot = bool(self._latest) and now - self._last_snapshot >= self.snapshot_interval
+            batch = dict(self._latest) if snapshot else dict(self._pending)
+            # Spooled slots not classified yet in this run still have to go out
+            if snapshot:
+                for slot_number, is_occupied in self._pending.items():
+                    batch.setdefault(slot_number, is_occupied)
+            self._pending = {}
+
+        if not batch:
+            return True
+
+        payload = {
+            'zone': self.lot_id,
+            'snapshot': snapshot,
+            'slots': [{'slotNumber': k, 'isOccupied': v} for k, v in batch.items()],
+        }
+
+        try:
+            response = requests.post(self.url, json=payload, timeout=self.timeout)
+            ok = response.status_code == 200
+        except requests.exceptions.RequestException:
+            ok = False
+
+        if ok:
+            self.sent_requests += 1
+            self.sent_slots += len(batch)
+            if snapshot:
+                self._last_snapshot = now
+            if os.path.exists(self.spool_path):
+                os.remove(self.spool_path)
+            return True
+
+        # Newer changes recorded meanwhile win over the failed batch
+        self.failed_requests += 1
+        with self._lock:
+            for slot_number, is_occupied in batch.items():
+                self._pending.setdefault(slot_number, is_occupied)
+            pending = dict(self._pending)
+        self._write_spool(pending)
+        return False
+
+    def stats(self):
+        return {
+            'requests': self.sent_requests,
+            'slots': self.sent_slots,
+            'failed': self.failed_requests,
+        }
@@ -0,0 +1,108 @@
+import numpy as np
+
+
+UNKNOWN = 0
+STABLE = 1
+UNCERTAIN = 2
+
+
+class SpotStateMachine:
+    """
+    Occupancy state per spot, driven by per-spot mean intensity samples
+    - STABLE spots are not classified. A spot becomes UNCERTAIN when its mean
+      drifts more than enter_threshold (absolute, gray levels) away from the
+      value it had when its status was last confirmed.
+    - UNCERTAIN spots are classified on every sample. A status flip needs
+      confirm_samples consecutive classifications that disagree with the
+      current status. The spot returns to STABLE (hysteresis) once the
+      sample-to-sample change drops below exit_threshold and the classifier
+      agrees with its status.
+    All bookkeeping is vectorized over spots.
+    """
+
+    def __init__(self, n_spots, enter_threshold=8.0, exit_threshold=3.0, confirm_samples=2):
+        self.n_spots = n_spots
+        self.enter_threshold = enter_threshold
+        self.exit_threshold = exit_threshold
+        self.confirm_samples = confirm_samples
+
+        self.state = np.full(n_spots, UNKNOWN, dtype=np.int8)
+        self.status = np.zeros(n_spots, dtype=bool)      # EMPTY (True) / NOT_EMPTY (False)
+        self.changed = np.zeros(n_spots, dtype=bool)     # confirmed status changed on the last update
+        self.ref_means = np.zeros(n_spots)
+        self.prev_means = None
+        self.motion = np.zeros(n_spots)
+
+        self._candidate = np.zeros(n_spots, dtype=bool)
+        self._votes = np.zeros(n_spots, dtype=np.int32)
+
+        # Counters for tuning / reporting
+        self.samples = 0
+        self.classifications = 0
+        self.flips = 0
+
+    def spots_to_classify(self, means):
+        """Feed a new sample of per-spot means; returns the spot indices the classifier must run on"""
+        means = np.asarray(means, dtype=np.float64)
+        self.samples += 1
+
+        if self.prev_means is None:
+            self.motion = np.zeros(self.n_spots)
+        else:
+            self.motion = np.abs(means - self.prev_means)
+        self.prev_means = means
+
+        drift = np.abs(means - self.ref_means)
+        entering = (self.state == STABLE) & (drift > self.enter_threshold)
+        self.state[entering] = UNCERTAIN
+
+        return np.flatnonzero(self.state != STABLE)
+
+    def update(self, spot_indices, statuses):
+        """Apply classifier results for the spots returned by spots_to_classify"""
+        idx = np.asarray(spot_indices, dtype=np.intp)
+        result = np.asarray(statuses, dtype=bool)
+        self.changed[:] = False
+        if len(idx) == 0:
+            return
+        self.classifications += len(idx)
+
+        means = self.prev_means[idx]
+        settled = self.motion[idx] < self.exit_threshold
+
+        # First classification of a spot is accepted as is
+        unknown = self.state[idx] == UNKNOWN
+        first = idx[unknown]
+        self.status[first] = result[unknown]
+        self.state[first] = STABLE
+        self.ref_means[first] = means[unknown]
+        self.changed[first] = True
+
+        known = ~unknown
+        idx, result, means, settled = idx[known], result[known], means[known], settled[known]
+
+        agree = result == self.status[idx]
+        same_candidate = self._candidate[idx] == result
+        votes = np.where(agree, 0, np.where(same_candidate, self._votes[idx] + 1, 1))
+        self._candidate[idx] = result
+        self._votes[idx] = votes
+
+        flip = votes >= self.confirm_samples
+        flipped = idx[flip]
+        self.status[flipped] = result[flip]
+        self._votes[flipped] = 0
+        self.changed[flipped] = True
+        self.flips += len(flipped)
+
+        # Back to STABLE once the spot has settled and its status is confirmed
+        done = settled & (agree | flip)
+        self.state[idx[done]] = STABLE
+        self.ref_means[idx[done]] = means[done]
+
+    def stats(self):
+        return {
+            'samples': self.samples,
+            'classifications': self.classifications,
+            'flips': self.flips,
+            'uncertain': int(np.sum(self.state == UNCERTAIN)),
+        }
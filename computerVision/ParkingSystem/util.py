@@ -13,7 +13,24 @@ NOT_EMPTY = False
 script_dir = os.path.dirname(os.path.abspath(__file__))
 model_path = os.path.join(script_dir, "model.p")
 
-MODEL = pickle.load(open(model_path, "rb"))
+# Loaded on first use (or by load_model in a worker initializer), not at import
+MODEL = None
+
+# Classifier input: 15x15 BGR crop, flattened
+SPOT_SIZE = (15, 15)
+N_FEATURES = SPOT_SIZE[0] * SPOT_SIZE[1] * 3
+
+# Feature matrix reused across calls, grown when more spots are requested
+_batch_buffer = np.empty((0, N_FEATURES), dtype=np.float64)
+
+
+def load_model(path=model_path):
+    """Unpickle the spot classifier once per process"""
+    global MODEL
+    if MODEL is None:
+        with open(path, "rb") as f:
+            MODEL = pickle.load(f)
+    return MODEL
 
 
 def empty_or_not(spot_bgr):
@@ -24,7 +41,7 @@ def empty_or_not(spot_bgr):
     flat_data.append(img_resized.flatten())
     flat_data = np.array(flat_data)
 
-    y_output = MODEL.predict(flat_data)
+    y_output = load_model().predict(flat_data)
 
     if y_output == 0:
         return EMPTY
@@ -32,6 +49,33 @@ def empty_or_not(spot_bgr):
         return NOT_EMPTY
 
 
+def empty_or_not_batch(frame, spots):
+    """
+    Classify many spots of one frame with a single MODEL.predict call
+    spots is a list of [x1, y1, w, h]; returns a list of EMPTY / NOT_EMPTY
+    Crops are resized with cv2.INTER_AREA (box filter) into one preallocated
+    (n_spots, 675) matrix, scaled to [0, 1] like skimage's resize output
+    """
+    global _batch_buffer
+
+    n = len(spots)
+    if n == 0:
+        return []
+
+    if _batch_buffer.shape[0] < n:
+        _batch_buffer = np.empty((n, N_FEATURES), dtype=np.float64)
+    flat_data = _batch_buffer[:n]
+
+    for i, (x1, y1, w, h) in enumerate(spots):
+        spot_crop = frame[y1:y1 + h, x1:x1 + w]
+        flat_data[i] = cv2.resize(spot_crop, SPOT_SIZE, interpolation=cv2.INTER_AREA).reshape(-1)
+    flat_data *= 1.0 / 255.0
+
+    y_output = load_model().predict(flat_data)
+
+    return [EMPTY if y == 0 else NOT_EMPTY for y in y_output]
+
+
 def get_parking_spots_bboxes(connected_components):
     (totalLabels, label_ids, values, centroid) = connected_components
 
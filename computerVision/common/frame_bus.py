@@ -0,0 +1,505 @@
+"""
+Shared-memory frame bus
+
+One capture process decodes a source and writes each frame once into a ring of
+preallocated slots in shared memory; any number of consumer processes (heatmap
+monitor, fall detection, video writer) read NumPy views of those slots instead
+of receiving pickled copies through pipes.
+
+- The writer never waits for readers. A slot is overwritten after `slots` more
+  frames, so a consumer that falls behind skips ahead to the newest frames.
+- Every slot carries a sequence number guarded like a seqlock (odd while being
+  written), so a reader can tell a complete frame from a torn one.
+- Each reader keeps its cursor in the shared header, so the writer can report
+  how far behind every consumer is.
+
+A view returned by read() stays valid until the writer comes round to its slot
+again; call still_valid(seq) after processing, or pass copy=True.
+
+Usage:
+    python frame_bus.py publish people.mp4 --name gate-1 --loop --realtime
+    FRAME_BUS=gate-1 python heatmap_monitor.py
+    python frame_bus.py bench --width 1920 --height 1080 --frames 300
+"""
+import argparse
+import os
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+MAGIC = 0x46524D42555331    # "FRMBUS1"
+HEADER_FIELDS = 16
+MAX_READERS = 16
+SLOT_FIELDS = 3             # seqlock state, frame index, timestamp (ns)
+READER_FIELDS = 4           # pid, last sequence read, frames read, frames skipped
+
+# Header layout (int64)
+H_MAGIC, H_HEAD, H_CLOSED, H_HEIGHT, H_WIDTH, H_CHANNELS, H_SLOTS, H_FPS_MILLI, H_WRITER_PID = range(9)
+
+ALIGN = 64
+
+
+def _aligned(size):
+    return (size + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _layout(slots, frame_shape):
+    header = HEADER_FIELDS * 8
+    slot_table = _aligned(slots * SLOT_FIELDS * 8)
+    reader_table = _aligned(MAX_READERS * READER_FIELDS * 8)
+    frame_bytes = int(np.prod(frame_shape))
+    data_offset = _aligned(header) + slot_table + reader_table
+    return data_offset, frame_bytes, data_offset + slots * _aligned(frame_bytes)
+
+
+def _attach(name):
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix':
+        # Only the writer owns the segment; stop the resource tracker from
+        # unlinking it when a reader exits (Python < 3.13 registers every attach)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+    return shm
+
+
+class _Ring:
+    """Numpy views over the shared segment"""
+
+    def __init__(self, shm, slots, frame_shape, writable=True):
+        self.shm = shm
+        self.slots = slots
+        self.frame_shape = tuple(frame_shape)
+        data_offset, frame_bytes, _ = _layout(slots, frame_shape)
+        buf = shm.buf
+
+        self.header = np.ndarray((HEADER_FIELDS,), np.int64, buf, 0)
+        offset = _aligned(HEADER_FIELDS * 8)
+        self.slot_table = np.ndarray((slots, SLOT_FIELDS), np.int64, buf, offset)
+        offset += _aligned(slots * SLOT_FIELDS * 8)
+        self.readers = np.ndarray((MAX_READERS, READER_FIELDS), np.int64, buf, offset)
+
+        stride = _aligned(frame_bytes)
+        self.frames = [np.ndarray(self.frame_shape, np.uint8, buf, data_offset + i * stride)
+                       for i in range(slots)]
+        for frame in self.frames:
+            frame.flags.writeable = writable
+
+    def release(self):
+        # Views must go before the buffer can be closed
+        self.header = self.slot_table = self.readers = None
+        self.frames = []
+        self.shm.close()
+
+
+class FrameBusWriter:
+    """
+    Owns the shared segment; write() copies a frame into the next slot
+    frame_shape is (height, width, channels); frames of another size are resized.
+    """
+
+    def __init__(self, name, frame_shape, slots=8, fps=30.0):
+        if slots < 2:
+            raise ValueError('A frame bus needs at least 2 slots')
+        self.name = name
+        _, _, size = _layout(slots, frame_shape)
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a writer that crashed
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.ring = _Ring(shm, slots, frame_shape)
+        header = self.ring.header
+        header[:] = 0
+        self.ring.slot_table[:] = 0
+        self.ring.readers[:] = 0
+        header[H_HEIGHT], header[H_WIDTH], header[H_CHANNELS] = frame_shape
+        header[H_SLOTS] = slots
+        header[H_FPS_MILLI] = int(fps * 1000)
+        header[H_WRITER_PID] = os.getpid()
+        header[H_MAGIC] = MAGIC
+        self.written = 0
+
+    def write(self, frame, frame_index=None):
+        """Publish one frame; returns its sequence number (1, 2, ...)"""
+        ring = self.ring
+        seq = int(ring.header[H_HEAD]) + 1
+        slot = seq % ring.slots
+        state = ring.slot_table[slot]
+
+        state[0] = 2 * seq + 1          # odd: being written
+        target = ring.frames[slot]
+        if frame.shape != target.shape:
+            import cv2
+            cv2.resize(frame, (target.shape[1], target.shape[0]), dst=target)
+        else:
+            np.copyto(target, frame)
+        state[1] = seq - 1 if frame_index is None else frame_index
+        state[2] = time.time_ns()
+        state[0] = 2 * seq              # even: complete
+        ring.header[H_HEAD] = seq
+        self.written += 1
+        return seq
+
+    def lag(self):
+        """Frames each attached reader is behind the writer, keyed by reader pid"""
+        head = int(self.ring.header[H_HEAD])
+        return {int(pid): head - int(seq) for pid, seq, _, _ in self.ring.readers if pid}
+
+    def close(self):
+        """Mark the stream finished, then remove the segment"""
+        if self.ring.header is None:
+            return
+        self.ring.header[H_CLOSED] = 1
+        shm = self.ring.shm
+        self.ring.release()
+        if os.name == 'posix':
+            # Forked readers share our resource tracker and may have dropped the registration
+            from multiprocessing import resource_tracker
+            resource_tracker.register(shm._name, 'shared_memory')
+        shm.unlink()
+
+
+class FrameBusReader:
+    """
+    Attaches to a bus by name and reads frames in order
+    latest=True always jumps to the newest frame (for live display or detection that
+    cannot keep up); otherwise frames are read in order and a reader that falls more
+    than the ring behind skips ahead. stride reads every stride-th frame.
+    """
+
+    def __init__(self, name, latest=False, stride=1, wait=10.0):
+        deadline = time.time() + wait
+        while True:
+            try:
+                shm = _attach(name)
+                header = np.ndarray((HEADER_FIELDS,), np.int64, shm.buf, 0)
+                if header[H_MAGIC] == MAGIC:
+                    break
+                del header
+                shm.close()
+            except FileNotFoundError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError(f'Frame bus not found: {name}')
+            time.sleep(0.05)
+
+        slots = int(header[H_SLOTS])
+        frame_shape = (int(header[H_HEIGHT]), int(header[H_WIDTH]), int(header[H_CHANNELS]))
+        del header
+        self.name = name
+        # Readers get read-only views so one consumer cannot draw on another's frame
+        self.ring = _Ring(shm, slots, frame_shape, writable=False)
+        self.latest = latest
+        self.stride = max(1, int(stride))
+        self.cursor = int(self.ring.header[H_HEAD])
+        self.read_count = 0
+        self.skipped = 0
+        self.torn = 0
+        self._reader_row = self._register()
+
+    def _register(self):
+        pid = os.getpid()
+        for row in range(MAX_READERS):
+            if self.ring.readers[row, 0] == 0:
+                self.ring.readers[row] = (pid, self.cursor, 0, 0)
+                return row
+        return None    # Table full: the reader works, the writer just cannot see its lag
+
+    @property
+    def frame_shape(self):
+        return self.ring.frame_shape
+
+    @property
+    def fps(self):
+        return self.ring.header[H_FPS_MILLI] / 1000.0
+
+    @property
+    def closed(self):
+        return bool(self.ring.header[H_CLOSED])
+
+    def _slot_state(self, seq):
+        return int(self.ring.slot_table[seq % self.ring.slots, 0])
+
+    def still_valid(self, seq):
+        """True while the slot read for seq has not been overwritten"""
+        return self._slot_state(seq) == 2 * seq
+
+    def read(self, timeout=None, copy=False):
+        """
+        Next frame as (seq, frame_index, frame), or None when the writer closed the
+        bus or timeout seconds passed without a new frame
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        header = self.ring.header
+        while True:
+            head = int(header[H_HEAD])
+            wanted = self.cursor + self.stride
+            if self.latest and head > self.cursor:
+                wanted = max(wanted, head)
+            elif head - wanted >= self.ring.slots - 1:
+                # Fell behind: the oldest slots are gone or about to be rewritten
+                wanted = head - self.ring.slots // 2
+            if head < wanted:
+                if header[H_CLOSED]:
+                    return None
+                if deadline is not None and time.time() > deadline:
+                    return None
+                time.sleep(0.001)
+                continue
+
+            slot = wanted % self.ring.slots
+            frame_index = int(self.ring.slot_table[slot, 1])
+            frame = self.ring.frames[slot]
+            if copy:
+                frame = frame.copy()
+            if self.still_valid(wanted):
+                break
+            # Overwritten while we looked at it; move on to newer frames
+            self.torn += 1
+            self.skipped += 1
+            self.cursor = wanted
+
+        self.skipped += max(0, (wanted - self.cursor) // self.stride - 1)
+        self.read_count += 1
+        self.cursor = wanted
+        if self._reader_row is not None:
+            self.ring.readers[self._reader_row, 1:] = (wanted, self.read_count, self.skipped)
+        return wanted, frame_index, frame
+
+    def stats(self):
+        return {'read': self.read_count, 'skipped': self.skipped, 'torn': self.torn,
+                'lag': int(self.ring.header[H_HEAD]) - self.cursor}
+
+    def close(self):
+        if self.ring.header is None:
+            return
+        if self._reader_row is not None:
+            self.ring.readers[self._reader_row] = 0
+        self.ring.release()
+
+
+class BusSource:
+    """
+    FrameSource-compatible reader, so a script can take its frames from a bus:
+        source = BusSource(os.environ['FRAME_BUS']) if os.environ.get('FRAME_BUS') else FrameSource(path)
+    Frames are read-only zero-copy views, valid until the writer reuses the slot;
+    copy=True gives a private copy for scripts that draw on the frame.
+    """
+
+    def __init__(self, name, stride=1, latest=False, copy=False, wait=10.0):
+        self.reader = FrameBusReader(name, latest=latest, stride=stride, wait=wait)
+        self.copy = copy
+        self._started = None
+
+    def is_opened(self):
+        return self.reader.ring.header is not None
+
+    @property
+    def fps(self):
+        """Rate of the source's frame indexes, like FrameSource.fps"""
+        return self.reader.fps
+
+    @property
+    def frame_size(self):
+        height, width, _ = self.reader.frame_shape
+        return (width, height)
+
+    def read(self):
+        if self._started is None:
+            self._started = time.time()
+        item = self.reader.read(copy=self.copy)
+        if item is None:
+            return None, None
+        _, frame_index, frame = item
+        return frame_index, frame
+
+    def __iter__(self):
+        while True:
+            index, frame = self.read()
+            if frame is None:
+                return
+            yield index, frame
+
+    def stats(self):
+        elapsed = time.time() - self._started if self._started else 0
+        stats = self.reader.stats()
+        stats['decoded_fps'] = round(stats['read'] / elapsed, 1) if elapsed > 0 else 0.0
+        return stats
+
+    def release(self):
+        self.reader.close()
+
+
+def publish(source, name, slots=8, stride=1, loop=False, realtime=False, resize=None, max_frames=None):
+    """Decode a source once and write every sampled frame to the bus"""
+    from frame_source import FrameSource
+
+    frames = FrameSource(source, stride=stride, loop=loop, realtime=realtime)
+    if not frames.is_opened():
+        raise RuntimeError(f'Could not open source: {source}')
+    width, height = resize or frames.frame_size
+    writer = FrameBusWriter(name, (height, width, 3), slots=slots, fps=frames.fps)
+    print(f"Publishing {source} on frame bus '{name}' ({width}x{height}, {slots} slots)")
+
+    last_report = time.time()
+    try:
+        for frame_index, frame in frames:
+            writer.write(frame, frame_index)
+            if max_frames and writer.written >= max_frames:
+                break
+            if time.time() - last_report >= 10:
+                print(f"{frames.stats()} reader lag: {writer.lag()}")
+                last_report = time.time()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        frames.release()
+    print(frames.stats())
+
+
+def _bench_consumer(name, conn):
+    reader = FrameBusReader(name)
+    checksum = 0
+    while True:
+        item = reader.read()
+        if item is None:
+            break
+        checksum += int(item[2][0, 0, 0])
+    conn.send(reader.stats())
+    reader.close()
+
+
+def _pipe_consumer(conn):
+    count = 0
+    while True:
+        frame = conn.recv()
+        if frame is None:
+            break
+        count += 1
+    conn.send({'read': count})
+
+
+def _bench_bus(frame, frames, slots, consumers, paced):
+    """Frames through the bus, timed until every reader has reached the end of the stream"""
+    import multiprocessing
+
+    name = f'framebus-bench-{os.getpid()}'
+    writer = FrameBusWriter(name, frame.shape, slots=slots)
+    pipes, procs = [], []
+    for _ in range(consumers):
+        parent, child = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target=_bench_consumer, args=(name, child))
+        proc.start()
+        pipes.append(parent)
+        procs.append(proc)
+    while sum(1 for pid, _, _, _ in writer.ring.readers if pid) < consumers:
+        time.sleep(0.01)
+
+    started = time.perf_counter()
+    for seq in range(1, frames + 1):
+        # Paced: wait for the slowest reader so no slot is overwritten before everyone read it
+        while paced:
+            cursors = [int(cursor) for pid, cursor, _, _ in writer.ring.readers if pid]
+            if not cursors or seq - min(cursors) <= slots - 2:
+                break
+            time.sleep(0)
+        writer.write(frame)
+    write_elapsed = time.perf_counter() - started
+    writer.ring.header[H_CLOSED] = 1
+    reads = [conn.recv() for conn in pipes]
+    elapsed = time.perf_counter() - started
+    for proc in procs:
+        proc.join()
+    writer.close()
+
+    delivered = [r['read'] for r in reads]
+    return {'fps': round(frames / elapsed, 1), 'ms_per_frame': round(1000 * elapsed / frames, 3),
+            'writer_ms_per_frame': round(1000 * write_elapsed / frames, 3), 'delivered': delivered,
+            'skip_rate': round(1 - sum(delivered) / (frames * consumers), 3), 'readers': reads}
+
+
+def bench(width, height, frames, slots, consumers):
+    """
+    Frames per second through a multiprocessing pipe vs the shared-memory bus
+    Every mode is timed until all consumers have read the whole stream. The pipe and
+    the paced bus deliver every frame to every consumer; the free-running bus
+    (the writer never waits, as in publish) may skip frames, reported as skip_rate.
+    """
+    import multiprocessing
+
+    frame = np.random.randint(0, 255, (height, width, 3), np.uint8)
+    results = {}
+
+    # Pickled through one pipe per consumer
+    pipes, procs = [], []
+    for _ in range(consumers):
+        parent, child = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target=_pipe_consumer, args=(child,))
+        proc.start()
+        pipes.append(parent)
+        procs.append(proc)
+    started = time.perf_counter()
+    for _ in range(frames):
+        for conn in pipes:
+            conn.send(frame)
+    for conn in pipes:
+        conn.send(None)
+    reads = [conn.recv() for conn in pipes]
+    elapsed = time.perf_counter() - started
+    for proc in procs:
+        proc.join()
+    delivered = [r['read'] for r in reads]
+    results['pipe'] = {'fps': round(frames / elapsed, 1), 'ms_per_frame': round(1000 * elapsed / frames, 3),
+                       'delivered': delivered, 'skip_rate': round(1 - sum(delivered) / (frames * consumers), 3)}
+
+    # Written once to the bus
+    results['shared_memory_paced'] = _bench_bus(frame, frames, slots, consumers, paced=True)
+    results['shared_memory_free'] = _bench_bus(frame, frames, slots, consumers, paced=False)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared-memory frame bus')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    pub = sub.add_parser('publish', help='decode a video/camera once and share its frames')
+    pub.add_argument('source', help='video file, camera index or stream URL')
+    pub.add_argument('--name', required=True, help='bus name consumers attach to (FRAME_BUS)')
+    pub.add_argument('--slots', type=int, default=8)
+    pub.add_argument('--stride', type=int, default=1)
+    pub.add_argument('--loop', action='store_true')
+    pub.add_argument('--realtime', action='store_true')
+    pub.add_argument('--resize', type=int, nargs=2, metavar=('WIDTH', 'HEIGHT'))
+    pub.add_argument('--max-frames', type=int)
+
+    b = sub.add_parser('bench', help='compare pickling frames through pipes with the bus')
+    b.add_argument('--width', type=int, default=1920)
+    b.add_argument('--height', type=int, default=1080)
+    b.add_argument('--frames', type=int, default=300)
+    b.add_argument('--slots', type=int, default=8)
+    b.add_argument('--consumers', type=int, default=3)
+
+    args = parser.parse_args()
+    if args.command == 'publish':
+        publish(args.source, args.name, slots=args.slots, stride=args.stride, loop=args.loop,
+                realtime=args.realtime, resize=tuple(args.resize) if args.resize else None,
+                max_frames=args.max_frames)
+    else:
+        import json
+        print(json.dumps(bench(args.width, args.height, args.frames, args.slots, args.consumers), indent=2))
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
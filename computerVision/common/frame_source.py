@@ -0,0 +1,155 @@
+import time
+
+import cv2
+
+
+LIVE_PREFIXES = ('rtsp://', 'rtmp://', 'http://', 'https://', 'udp://', 'tcp://')
+
+
+def is_live_source(source):
+    return isinstance(source, int) or str(source).isdigit() or str(source).lower().startswith(LIVE_PREFIXES)
+
+
+class FrameSource:
+    """
+    Frame reader shared by the CV scripts
+    - stride: only every stride-th frame is decoded; the others are skipped with
+      cap.grab(), which demuxes without decoding
+    - realtime: pace file replay to the file's fps (live sources are paced by the camera);
+      otherwise files run as fast as possible
+    - loop: restart a file at its end instead of stopping
+    - live streams (camera index, rtsp/http URL) reconnect with exponential backoff
+    Iterating yields (frame_index, frame); for files frame_index is the position in
+    the file and starts again at 0 on every loop.
+    """
+
+    def __init__(self, source, stride=1, realtime=False, loop=False, reconnect=None,
+                 max_backoff=30.0, max_reconnects=None):
+        self.source = int(source) if str(source).isdigit() else source
+        self.stride = max(1, int(stride))
+        self.realtime = realtime
+        self.loop = loop
+        self.live = is_live_source(self.source)
+        self.reconnect = self.live if reconnect is None else reconnect
+        self.max_backoff = max_backoff
+        self.max_reconnects = max_reconnects
+
+        self.decoded = 0
+        self.skipped = 0
+        self.loops = 0
+        self.reconnects = 0
+
+        self.cap = None
+        self._position = 0
+        self._started = None
+        self._pace_start = None
+        self._pace_position = 0
+        self._open()
+
+    def _open(self):
+        if self.cap is not None:
+            self.cap.release()
+        self.cap = cv2.VideoCapture(self.source)
+        self._position = 0
+        self._pace_start = None
+        return self.cap.isOpened()
+
+    def is_opened(self):
+        return self.cap is not None and self.cap.isOpened()
+
+    @property
+    def fps(self):
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if self.cap is not None else 0
+        return fps if fps and fps > 0 else 30.0
+
+    @property
+    def frame_size(self):
+        """(width, height) as reported by the container/stream"""
+        return (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def _restart(self):
+        """End of input: loop a file, reconnect a live stream, or stop"""
+        if self.reconnect:
+            backoff = 1.0
+            attempts = 0
+            while self.max_reconnects is None or attempts < self.max_reconnects:
+                attempts += 1
+                print(f"Stream lost, reconnecting in {backoff:.0f}s: {self.source}")
+                time.sleep(backoff)
+                if self._open():
+                    self.reconnects += 1
+                    return True
+                backoff = min(backoff * 2, self.max_backoff)
+            return False
+
+        if self.loop:
+            if self._position == 0:
+                # Nothing could be read since the last restart
+                return False
+            self.loops += 1
+            if not self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                self._open()
+            self._position = 0
+            self._pace_start = None
+            return True
+
+        return False
+
+    def _pace(self):
+        if not self.realtime or self.live:
+            return
+        now = time.time()
+        if self._pace_start is None:
+            self._pace_start = now
+            self._pace_position = self._position
+            return
+        due = self._pace_start + (self._position - self._pace_position) / self.fps
+        if due > now:
+            time.sleep(due - now)
+
+    def read(self):
+        """Next sampled frame as (frame_index, frame), or (None, None) when the source is done"""
+        if self._started is None:
+            self._started = time.time()
+
+        while True:
+            ret, frame = self.cap.read()
+            if ret and frame is not None:
+                break
+            if not self._restart():
+                return None, None
+
+        index = self._position
+        self._pace()
+        self.decoded += 1
+        self._position += 1
+
+        # Skip to the next sampled frame without decoding the ones in between
+        for _ in range(self.stride - 1):
+            if not self.cap.grab():
+                break
+            self.skipped += 1
+            self._position += 1
+
+        return index, frame
+
+    def __iter__(self):
+        while True:
+            index, frame = self.read()
+            if frame is None:
+                return
+            yield index, frame
+
+    def stats(self):
+        elapsed = time.time() - self._started if self._started else 0
+        return {
+            'decoded': self.decoded,
+            'skipped': self.skipped,
+            'decoded_fps': round(self.decoded / elapsed, 1) if elapsed > 0 else 0.0,
+            'loops': self.loops,
+            'reconnects': self.reconnects,
+        }
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
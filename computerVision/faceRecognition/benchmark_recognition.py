@@ -0,0 +1,395 @@
+"""
+Face recognition benchmark and scaling harness
+
+Generates synthetic 128-d galleries (1k .. 1M entries) and measures match latency
+and memory for each storage / index strategy, plus face sync throughput against a
+local HTTP server and a local Mongo stand-in (mongomock). Results are written as
+JSON so they can be tracked over releases.
+
+Usage:
+    python benchmark_recognition.py
+    python benchmark_recognition.py --sizes 1000 10000 --output bench_results.json
+    python benchmark_recognition.py --skip-sync --queries 200
+"""
+import argparse
+import http.server
+import json
+import os
+import pickle
+import platform
+import shutil
+import socketserver
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from face_gallery import FaceGallery
+
+try:
+    import face_recognition
+except ImportError:
+    face_recognition = None
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+TOLERANCE = 0.6
+# Per-dimension spread of synthetic identities; distinct people end up ~1.4 apart,
+# close to real dlib encodings, while probes of a known person stay well under 0.6
+IDENTITY_STD = 0.09
+PROBE_NOISE_STD = 0.02
+
+
+def make_gallery(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"{i:024x}" for i in range(n)]
+    encodings = rng.normal(0, IDENTITY_STD, size=(n, 128))
+    return ids, encodings
+
+
+def make_probes(encodings, n_queries, seed=1):
+    """Half the probes are noisy copies of gallery entries, half are strangers"""
+    rng = np.random.default_rng(seed)
+    n_known = n_queries // 2
+    picks = rng.integers(0, len(encodings), size=n_known)
+    known = encodings[picks] + rng.normal(0, PROBE_NOISE_STD, size=(n_known, 128))
+    strangers = rng.normal(0, IDENTITY_STD, size=(n_queries - n_known, 128))
+    return np.vstack([known, strangers]), picks
+
+
+def latency_stats(samples):
+    samples = np.asarray(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'mean_ms': round(float(samples.mean()), 4),
+    }
+
+
+def time_queries(match_one, probes):
+    samples = []
+    results = []
+    for probe in probes:
+        start = time.perf_counter()
+        results.append(match_one(probe))
+        samples.append(time.perf_counter() - start)
+    return samples, results
+
+
+def accuracy(results, picks, ids):
+    n_known = len(picks)
+    hits = sum(1 for r, p in zip(results[:n_known], picks) if r == ids[p])
+    false_accepts = sum(1 for r in results[n_known:] if r is not None)
+    return {
+        'known_hit_rate': round(hits / max(n_known, 1), 4),
+        'stranger_false_accepts': false_accepts,
+    }
+
+
+# --- Strategies -----------------------------------------------------------------
+
+def bench_pickle_files(ids, encodings, probes, picks, workdir):
+    """Current behaviour of util.recognize: one pickle per user, loaded and compared per query"""
+    db_dir = os.path.join(workdir, 'db')
+    os.makedirs(db_dir, exist_ok=True)
+    for id_, enc in zip(ids, encodings):
+        with open(os.path.join(db_dir, f"{id_}.pickle"), 'wb') as f:
+            pickle.dump(enc, f)
+
+    def match_one(probe):
+        for filename in sorted(os.listdir(db_dir)):
+            with open(os.path.join(db_dir, filename), 'rb') as f:
+                stored = pickle.load(f)
+            if face_recognition is not None:
+                match = face_recognition.compare_faces([stored], probe, tolerance=TOLERANCE)[0]
+            else:
+                match = np.linalg.norm(stored - probe) <= TOLERANCE
+            if match:
+                return filename[:-7]
+        return None
+
+    samples, results = time_queries(match_one, probes)
+    disk = sum(os.path.getsize(os.path.join(db_dir, f)) for f in os.listdir(db_dir))
+    shutil.rmtree(db_dir)
+    return {
+        'single_query': latency_stats(samples),
+        'disk_bytes': disk,
+        **accuracy(results, picks, ids),
+    }
+
+
+def bench_gallery(ids, encodings, probes, picks, dtype):
+    """In-memory FaceGallery matrix (what recognize_users_from_faces uses)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    gallery = FaceGallery(ids, encodings, dtype=dtype)
+    build_s = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples, results = time_queries(lambda p: gallery.match([p], tolerance=TOLERANCE)[0], probes)
+
+    batch = probes[:8]
+    batch_samples = []
+    for _ in range(max(1, len(probes) // 8)):
+        start = time.perf_counter()
+        gallery.match(batch, tolerance=TOLERANCE)
+        batch_samples.append(time.perf_counter() - start)
+
+    return {
+        'build_s': round(build_s, 4),
+        'matrix_bytes': int(gallery.encodings.nbytes),
+        'build_peak_bytes': int(peak),
+        'single_query': latency_stats(samples),
+        'batch8_query': latency_stats(batch_samples),
+        **accuracy(results, picks, ids),
+    }
+
+
+def bench_balltree(ids, encodings, probes, picks):
+    """Exact nearest neighbour with scikit-learn's BallTree (optional)"""
+    from sklearn.neighbors import BallTree
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    tree = BallTree(encodings.astype(np.float32))
+    build_s = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    def match_one(probe):
+        dist, idx = tree.query(probe.reshape(1, -1).astype(np.float32), k=1)
+        return ids[idx[0, 0]] if dist[0, 0] <= TOLERANCE else None
+
+    samples, results = time_queries(match_one, probes)
+    return {
+        'build_s': round(build_s, 4),
+        'build_peak_bytes': int(peak),
+        'single_query': latency_stats(samples),
+        **accuracy(results, picks, ids),
+    }
+
+
+def bench_faiss(ids, encodings, probes, picks):
+    """Exact L2 search with faiss IndexFlatL2 (optional)"""
+    import faiss
+
+    start = time.perf_counter()
+    index = faiss.IndexFlatL2(128)
+    index.add(encodings.astype(np.float32))
+    build_s = time.perf_counter() - start
+
+    def match_one(probe):
+        d2, idx = index.search(probe.reshape(1, -1).astype(np.float32), 1)
+        return ids[idx[0, 0]] if np.sqrt(d2[0, 0]) <= TOLERANCE else None
+
+    samples, results = time_queries(match_one, probes)
+    return {
+        'build_s': round(build_s, 4),
+        'index_bytes': int(index.ntotal * 128 * 4),
+        'single_query': latency_stats(samples),
+        **accuracy(results, picks, ids),
+    }
+
+
+def bench_db_handler(ids, encodings, probes, picks, workdir):
+    """DatabaseHandler end to end with a mongomock stand-in: gallery load + matching"""
+    from db_handler import DatabaseHandler
+
+    client = mongomock.MongoClient('mongodb://localhost:27017/temple_management')
+    from bson import ObjectId
+    client.get_database()['users'].insert_many(
+        [{'_id': ObjectId(id_), 'name': f'user{i}', 'profileImage': 'x'} for i, id_ in enumerate(ids)])
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        os.makedirs('./face_cache', exist_ok=True)
+        for id_, enc in zip(ids, encodings):
+            with open(f"./face_cache/{id_}.pickle", 'wb') as f:
+                pickle.dump(enc, f)
+
+        handler = DatabaseHandler(client=client)
+        start = time.perf_counter()
+        handler.load_face_gallery()
+        load_s = time.perf_counter() - start
+
+        def match_one(probe):
+            user = handler.recognize_user_from_face(probe)
+            return str(user['_id']) if user is not None else None
+
+        samples, results = time_queries(match_one, probes)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(os.path.join(workdir, 'face_cache'), ignore_errors=True)
+
+    return {
+        'gallery_load_s': round(load_s, 4),
+        'single_query': latency_stats(samples),
+        **accuracy(results, picks, ids),
+    }
+
+
+# --- Sync throughput ------------------------------------------------------------
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_directory(directory):
+    handler = lambda *a, **kw: _QuietHandler(*a, directory=directory, **kw)
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_sync(n_users, workdir, image_dir=None):
+    """
+    sync_face_encodings_to_cache against a local HTTP server and a mongomock stand-in
+    Serves the images in image_dir (round robin) or synthetic 320x320 JPEGs
+    (synthetic images contain no face, so they measure download + decode + detection)
+    """
+    from bson import ObjectId
+    from db_handler import DatabaseHandler
+
+    serve_dir = os.path.join(workdir, 'images')
+    os.makedirs(serve_dir, exist_ok=True)
+    if image_dir:
+        sources = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+        for f in sources:
+            shutil.copy(os.path.join(image_dir, f), serve_dir)
+    else:
+        rng = np.random.default_rng(2)
+        sources = []
+        for i in range(8):
+            img = rng.integers(0, 255, size=(320, 320, 3), dtype=np.uint8)
+            name = f"synthetic_{i}.jpg"
+            cv2.imwrite(os.path.join(serve_dir, name), img)
+            sources.append(name)
+
+    server = serve_directory(serve_dir)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    client = mongomock.MongoClient('mongodb://localhost:27017/temple_management')
+    client.get_database()['users'].insert_many(
+        [{'_id': ObjectId(), 'name': f'user{i}', 'profileImage': f"{base_url}/{sources[i % len(sources)]}"}
+         for i in range(n_users)])
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        handler = DatabaseHandler(client=client)
+        start = time.perf_counter()
+        handler.sync_face_encodings_to_cache()
+        elapsed = time.perf_counter() - start
+        cached = len(os.listdir('./face_cache'))
+
+        # Second run: everything already cached (or faceless) is skipped
+        start = time.perf_counter()
+        handler.sync_face_encodings_to_cache()
+        resync = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        shutil.rmtree(os.path.join(workdir, 'face_cache'), ignore_errors=True)
+
+    return {
+        'users': n_users,
+        'images': 'provided' if image_dir else 'synthetic',
+        'elapsed_s': round(elapsed, 3),
+        'users_per_s': round(n_users / elapsed, 2) if elapsed > 0 else None,
+        'encodings_cached': cached,
+        'resync_s': round(resync, 3),
+    }
+
+
+def environment():
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                      stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        rev = None
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'git_rev': rev,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--max-file-gallery', type=int, default=10000,
+                        help='largest gallery for the one-pickle-per-user strategies')
+    parser.add_argument('--sync-users', type=int, default=50)
+    parser.add_argument('--sync-images', default=None, help='directory of real face images to serve')
+    parser.add_argument('--skip-sync', action='store_true')
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'tolerance': TOLERANCE, 'galleries': [], 'sync': None, 'skipped': []}
+    workdir = tempfile.mkdtemp(prefix='face_bench_')
+
+    try:
+        for n in args.sizes:
+            print(f"Gallery size {n}...")
+            ids, encodings = make_gallery(n)
+            probes, picks = make_probes(encodings, args.queries)
+            entry = {'size': n, 'strategies': {}}
+
+            entry['strategies']['gallery_float64'] = bench_gallery(ids, encodings, probes, picks, np.float64)
+            entry['strategies']['gallery_float32'] = bench_gallery(ids, encodings, probes, picks, np.float32)
+
+            for name, fn in (('sklearn_balltree', bench_balltree), ('faiss_flat', bench_faiss)):
+                try:
+                    entry['strategies'][name] = fn(ids, encodings, probes, picks)
+                except ImportError:
+                    report['skipped'].append(f"{name}: not installed")
+
+            if n <= args.max_file_gallery:
+                # The per-file loop is O(n) file reads per query; a few probes are enough
+                few = max(4, args.queries // 20)
+                few_probes = np.vstack([probes[:few // 2], probes[-(few - few // 2):]])
+                entry['strategies']['pickle_files'] = bench_pickle_files(
+                    ids, encodings, few_probes, picks[:few // 2], workdir)
+                if mongomock is not None and face_recognition is not None:
+                    entry['strategies']['db_handler'] = bench_db_handler(ids, encodings, probes, picks, workdir)
+
+            for name, result in entry['strategies'].items():
+                print(f"  {name:18s} p50 {result['single_query']['p50_ms']:9.3f} ms"
+                      f"  p95 {result['single_query']['p95_ms']:9.3f} ms")
+            report['galleries'].append(entry)
+            del encodings
+
+        if mongomock is None or face_recognition is None:
+            report['skipped'].append('db_handler/sync: mongomock and face_recognition are required')
+        elif not args.skip_sync:
+            print(f"Sync throughput ({args.sync_users} users)...")
+            report['sync'] = bench_sync(args.sync_users, workdir, args.sync_images)
+            print(f"  {report['sync']['users_per_s']} users/s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
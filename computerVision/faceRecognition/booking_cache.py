@@ -0,0 +1,275 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+# Allow entry 30 minutes before slot and 1 hour after
+ENTRY_BEFORE = timedelta(minutes=30)
+ENTRY_AFTER = timedelta(hours=1)
+
+
+def parse_slot_window(visit_date, time_slot):
+    """
+    Parse a booking time slot (format: "09:00 AM - 10:00 AM")
+    Returns: (slot_datetime, allowed_start, allowed_end)
+    """
+    start_time_str = time_slot.split('-')[0].strip()
+    slot_datetime = datetime.combine(visit_date.date(), datetime.strptime(start_time_str, '%I:%M %p').time())
+    return slot_datetime, slot_datetime - ENTRY_BEFORE, slot_datetime + ENTRY_AFTER
+
+
+def check_slot_window(window, now=None):
+    """
+    Check the current time against a parsed slot window
+    Returns: dict with validation result
+    """
+    slot_datetime, allowed_start, allowed_end = window
+    now = now or datetime.now()
+    is_valid = allowed_start <= now <= allowed_end
+
+    return {
+        'is_valid': is_valid,
+        'slot_time': slot_datetime,
+        'current_time': now,
+        'message': 'Entry allowed' if is_valid else f'Entry only allowed between {allowed_start.strftime("%I:%M %p")} and {allowed_end.strftime("%I:%M %p")}'
+    }
+
+
+class BookingCache:
+    """
+    Local copy of today's active tokens (keyed by userId) and active queue entries
+    Slot windows are parsed once at load time, so a gate decision is a dict lookup.
+    Kept fresh from a change stream when the server supports one, otherwise by
+    polling on updatedAt. Lookups return None whenever the cache cannot be trusted
+    (not loaded yet, or refresh failing for longer than max_staleness) so callers
+    fall back to direct queries.
+    """
+
+    def __init__(self, tokens, queues, poll_interval=15, full_reload_interval=600,
+                 max_staleness=120, use_change_stream=True):
+        self.tokens = tokens
+        self.queues = queues
+        self.poll_interval = poll_interval
+        self.full_reload_interval = full_reload_interval
+        self.max_staleness = max_staleness
+        self.use_change_stream = use_change_stream
+
+        self._lock = threading.Lock()
+        self._by_user = {}       # user_id -> {token_id: token}
+        self._token_owner = {}   # token_id -> user_id
+        self._queues = {}        # (user_id, temple_id) -> queue
+        self._queue_keys = {}    # queue_id -> (user_id, temple_id)
+
+        self._day = None
+        self._last_refresh = None
+        self._last_full_load = None
+        self._tokens_seen = None
+        self._queues_seen = None
+
+        self._stop = threading.Event()
+        self._thread = None
+        self.mode = 'direct'
+
+    @property
+    def ready(self):
+        return (self._last_refresh is not None and self._day == datetime.now().date()
+                and time.time() - self._last_refresh <= self.max_staleness)
+
+    def load(self):
+        """Bulk load today's active tokens and all active queue entries"""
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow = today + timedelta(days=1)
+
+        tokens = list(self.tokens.find({
+            'status': 'active',
+            'visitDate': {'$gte': today, '$lt': tomorrow}
+        }))
+        queues = list(self.queues.find({'status': 'active'}))
+
+        with self._lock:
+            self._by_user = {}
+            self._token_owner = {}
+            self._queues = {}
+            self._queue_keys = {}
+            self._tokens_seen = None
+            self._queues_seen = None
+            for token in tokens:
+                self._apply_token(token, today.date())
+            for queue in queues:
+                self._apply_queue(queue)
+
+            self._day = today.date()
+            self._last_refresh = time.time()
+            self._last_full_load = self._last_refresh
+
+        return len(tokens)
+
+    def start(self):
+        """Load and keep refreshing in a background thread"""
+        self.load()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def get_today_bookings(self, user_id):
+        """Today's active tokens for a user, or None if the cache can't answer"""
+        if not self.ready:
+            return None
+        with self._lock:
+            return list(self._by_user.get(str(user_id), {}).values())
+
+    def get_queue_status(self, user_id, temple_id):
+        """
+        Active queue entry for a user at a temple
+        Returns (hit, queue): hit is False when the cache can't answer
+        """
+        if not self.ready:
+            return False, None
+        with self._lock:
+            return True, self._queues.get((str(user_id), temple_id))
+
+    def mark_used(self, booking_id):
+        """Drop a token locally as soon as it is used, ahead of the change feed"""
+        with self._lock:
+            self._remove_token(str(booking_id))
+
+    def refresh(self):
+        """One incremental polling pass (tokens and queues changed since the last pass)"""
+        today = datetime.now().date()
+        if self._day != today or time.time() - self._last_full_load >= self.full_reload_interval:
+            self.load()
+            return
+
+        token_query = {'updatedAt': {'$gte': self._tokens_seen}} if self._tokens_seen else {}
+        queue_query = {'updatedAt': {'$gte': self._queues_seen}} if self._queues_seen else {}
+        if not token_query:
+            token_query = {'status': 'active', 'visitDate': {'$gte': datetime.combine(today, datetime.min.time())}}
+        if not queue_query:
+            queue_query = {'status': 'active'}
+
+        changed_tokens = list(self.tokens.find(token_query))
+        changed_queues = list(self.queues.find(queue_query))
+
+        with self._lock:
+            for token in changed_tokens:
+                self._apply_token(token, today)
+            for queue in changed_queues:
+                self._apply_queue(queue)
+            self._last_refresh = time.time()
+
+    def _run(self):
+        if self.use_change_stream and self._watch():
+            return
+
+        self.mode = 'polling'
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Stale entries age out through max_staleness; lookups then fall back
+                print(f"Booking cache refresh failed: {str(e)}")
+
+    def _watch(self):
+        """
+        Follow token and queue changes from change streams
+        Returns False if the deployment doesn't support them (standalone server, stand-ins)
+        """
+        try:
+            token_stream = self.tokens.watch(full_document='updateLookup', max_await_time_ms=1000)
+            queue_stream = self.queues.watch(full_document='updateLookup', max_await_time_ms=1000)
+        except Exception:
+            return False
+
+        self.mode = 'change_stream'
+        try:
+            with token_stream, queue_stream:
+                while not self._stop.is_set():
+                    for stream, apply in ((token_stream, self._apply_token_change),
+                                          (queue_stream, self._apply_queue_change)):
+                        change = stream.try_next()
+                        while change is not None:
+                            apply(change)
+                            change = stream.try_next()
+
+                    with self._lock:
+                        self._last_refresh = time.time()
+                    if self._day != datetime.now().date() or time.time() - self._last_full_load >= self.full_reload_interval:
+                        self.load()
+        except Exception as e:
+            print(f"Booking cache change stream closed: {str(e)}")
+            if self._stop.is_set():
+                return True
+            return False
+        return True
+
+    def _apply_token_change(self, change):
+        with self._lock:
+            if change['operationType'] == 'delete' or change.get('fullDocument') is None:
+                self._remove_token(str(change['documentKey']['_id']))
+            else:
+                self._apply_token(change['fullDocument'], datetime.now().date())
+
+    def _apply_queue_change(self, change):
+        with self._lock:
+            if change['operationType'] == 'delete' or change.get('fullDocument') is None:
+                self._remove_queue(str(change['documentKey']['_id']))
+            else:
+                self._apply_queue(change['fullDocument'])
+
+    def _apply_token(self, token, today):
+        token_id = str(token['_id'])
+        self._remove_token(token_id)
+
+        updated = token.get('updatedAt')
+        if updated is not None and (self._tokens_seen is None or updated > self._tokens_seen):
+            self._tokens_seen = updated
+
+        if token.get('status') != 'active' or token['visitDate'].date() != today:
+            return
+
+        entry = dict(token)
+        try:
+            entry['_slotWindow'] = parse_slot_window(token['visitDate'], token['timeSlot'])
+        except Exception:
+            # Left unparsed; validate_booking_time reports the error as before
+            pass
+
+        user_id = str(token['userId'])
+        self._by_user.setdefault(user_id, {})[token_id] = entry
+        self._token_owner[token_id] = user_id
+
+    def _remove_token(self, token_id):
+        user_id = self._token_owner.pop(token_id, None)
+        if user_id is None:
+            return
+        user_tokens = self._by_user.get(user_id)
+        if user_tokens is not None:
+            user_tokens.pop(token_id, None)
+            if not user_tokens:
+                del self._by_user[user_id]
+
+    def _apply_queue(self, queue):
+        queue_id = str(queue['_id'])
+        self._remove_queue(queue_id)
+
+        updated = queue.get('updatedAt')
+        if updated is not None and (self._queues_seen is None or updated > self._queues_seen):
+            self._queues_seen = updated
+
+        if queue.get('status') != 'active':
+            return
+
+        key = (str(queue['userId']), queue['templeId'])
+        self._queues[key] = queue
+        self._queue_keys[queue_id] = key
+
+    def _remove_queue(self, queue_id):
+        key = self._queue_keys.pop(queue_id, None)
+        if key is not None:
+            self._queues.pop(key, None)
@@ -0,0 +1,96 @@
+"""
+Self-check of the gate booking path against a local Mongo stand-in (mongomock)
+
+Covers slot window parsing and checking, DatabaseHandler with an injected client,
+today's bookings from the cache or the database, the full booking list, and
+BookingCache loading and incremental refresh (new, used and other-day tokens).
+Exits non-zero on the first failed check.
+
+Usage:
+    python check_booking.py
+"""
+import sys
+from datetime import datetime, timedelta
+
+import mongomock
+from bson import ObjectId
+
+from booking_cache import BookingCache, parse_slot_window, check_slot_window
+from db_handler import DatabaseHandler
+
+
+def check(condition, message):
+    print(f"{'✓' if condition else '✗'} {message}")
+    if not condition:
+        sys.exit(1)
+
+
+def check_slot_windows():
+    visit = datetime(2024, 5, 1)
+    window = parse_slot_window(visit, '09:00 AM - 10:00 AM')
+    check(window == (datetime(2024, 5, 1, 9, 0), datetime(2024, 5, 1, 8, 30), datetime(2024, 5, 1, 10, 0)),
+          'slot window is 30 minutes before to 1 hour after the slot start')
+    for at, expected in (((8, 29), False), ((8, 30), True), ((10, 0), True), ((10, 1), False)):
+        result = check_slot_window(window, now=datetime(2024, 5, 1, *at))
+        check(result['is_valid'] == expected, f"entry at {at[0]:02d}:{at[1]:02d} {'allowed' if expected else 'refused'}")
+    check(parse_slot_window(visit, '02:30 PM - 03:30 PM')[0] == datetime(2024, 5, 1, 14, 30), 'PM slots parse')
+
+
+def token(user_id, visit_date, updated, status='active', slot='09:00 AM - 10:00 AM'):
+    return {'_id': ObjectId(), 'userId': user_id, 'visitDate': visit_date, 'timeSlot': slot,
+            'status': status, 'updatedAt': updated}
+
+
+def check_booking_cache():
+    client = mongomock.MongoClient('mongodb://localhost:27017/temple_management')
+    handler = DatabaseHandler(client=client)
+    check(handler.tokens.database.name == 'temple_management', 'DatabaseHandler uses the injected client')
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    started = datetime.now().replace(microsecond=0) - timedelta(minutes=5)
+    user, other = ObjectId(), ObjectId()
+    active = token(user, today, started)
+    future = token(user, today + timedelta(days=1), started)
+    handler.tokens.insert_many([active, token(user, today, started, status='used'), future,
+                                token(other, today, started)])
+    handler.queues.insert_one({'_id': ObjectId(), 'userId': user, 'templeId': 'temple-1', 'status': 'active',
+                               'updatedAt': started})
+    check([b['_id'] for b in handler.get_today_bookings(str(user))] == [active['_id']],
+          "without the cache, today's bookings come from the database")
+
+    cache = BookingCache(handler.tokens, handler.queues, use_change_stream=False)
+    check(cache.load() == 2, "load keeps today's active tokens only")
+    handler.booking_cache = cache
+    bookings = handler.get_today_bookings(str(user))
+    check([b['_id'] for b in bookings] == [active['_id']], "today's bookings come from the cache")
+    check(sorted(b['_id'] for b in handler.get_user_bookings(str(user))) == sorted([active['_id'], future['_id']]),
+          'get_user_bookings still lists future bookings alongside today')
+    check(bookings[0]['_slotWindow'] == parse_slot_window(today, active['timeSlot']), 'slot window parsed at load')
+    check(handler.validate_booking_time(bookings[0])['slot_time'] == today.replace(hour=9),
+          'validate_booking_time uses the cached window')
+    check(handler.get_user_queue_status(str(user), 'temple-1') is not None, 'queue entry comes from the cache')
+
+    # Incremental refresh: a new booking appears, the old one is used up
+    later = started + timedelta(minutes=1)
+    added = token(user, today, later, slot='11:00 AM - 12:00 PM')
+    handler.tokens.insert_one(added)
+    handler.tokens.update_one({'_id': active['_id']}, {'$set': {'status': 'used', 'updatedAt': later}})
+    handler.queues.update_many({'userId': user}, {'$set': {'status': 'completed', 'updatedAt': later}})
+    cache.refresh()
+    check([b['_id'] for b in cache.get_today_bookings(str(user))] == [added['_id']],
+          'refresh adds new tokens and drops used ones')
+    check(cache.get_queue_status(str(user), 'temple-1') == (True, None), 'refresh drops finished queue entries')
+    check(len(cache.get_today_bookings(str(other))) == 1, "other users' bookings are untouched")
+
+    cache.mark_used(added['_id'])
+    check(cache.get_today_bookings(str(user)) == [], 'mark_used drops the token ahead of the change feed')
+
+
+def main():
+    check_slot_windows()
+    check_booking_cache()
+    print('All booking checks passed')
+
+
+if __name__ == '__main__':
+    main()
@@ -8,49 +8,98 @@ import numpy as np
 from PIL import Image
 import cv2
 
+from face_gallery import FaceGallery
+from booking_cache import BookingCache, parse_slot_window, check_slot_window
+
 load_dotenv()
 
 class DatabaseHandler:
-    def __init__(self):
-        # MongoDB connection
+    def __init__(self, client=None):
+        # MongoDB connection (a client can be passed in, e.g. a local Mongo stand-in)
         mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/temple_management')
-        self.client = MongoClient(mongo_uri)
+        self.client = client if client is not None else MongoClient(mongo_uri)
         self.db = self.client.get_database()
         self.users = self.db['users']
         self.tokens = self.db['tokens']
         self.queues = self.db['queues']
+
+        # Known faces, loaded lazily and rebuilt after a sync
+        self.gallery = None
+        self.gallery_users = {}
+
+        # Optional local cache of today's bookings; direct queries when disabled
+        self.booking_cache = None
         
     def get_all_users_with_images(self):
         """Fetch all users who have profile images"""
         users = self.users.find({'profileImage': {'$ne': None}})
         return list(users)
     
+    def load_face_gallery(self):
+        """
+        Load cached encodings of all users with images into one in-memory gallery
+        Returns the FaceGallery used for matching
+        """
+        users = self.get_all_users_with_images()
+        self.gallery_users = {str(user['_id']): user for user in users}
+        self.gallery = FaceGallery.from_cache_dir('./face_cache', ids=list(self.gallery_users.keys()))
+        return self.gallery
+
+    def recognize_users_from_faces(self, face_encodings, tolerance=0.6):
+        """
+        Match a batch of face encodings against all known users
+        Returns a list with the user data (or None) for each encoding
+        """
+        if self.gallery is None:
+            self.load_face_gallery()
+
+        matched_ids = self.gallery.match(face_encodings, tolerance=tolerance)
+        return [self.gallery_users.get(user_id) if user_id is not None else None for user_id in matched_ids]
+
     def recognize_user_from_face(self, face_encoding):
         """
         Match face encoding against all users in database
         Returns user data if match found, None otherwise
         """
-        users = self.get_all_users_with_images()
-        
-        for user in users:
-            # Get stored face encoding from user's profile
-            # Assuming face encodings are stored in a separate field or derived from profileImage
-            # For now, we'll use a hybrid approach with local cache
-            user_id = str(user['_id'])
-            cache_file = f"./face_cache/{user_id}.pickle"
-            
-            if os.path.exists(cache_file):
-                with open(cache_file, 'rb') as f:
-                    stored_encoding = pickle.load(f)
-                
-                # Compare faces
-                match = face_recognition.compare_faces([stored_encoding], face_encoding, tolerance=0.6)[0]
-                
-                if match:
-                    return user
-        
-        return None
+        return self.recognize_users_from_faces([face_encoding])[0]
     
+    def enable_booking_cache(self, **kwargs):
+        """
+        Start the local booking/queue cache used for gate decisions
+        Falls back to direct queries if the initial load fails
+        """
+        cache = BookingCache(self.tokens, self.queues, **kwargs)
+        try:
+            cache.start()
+        except Exception as e:
+            print(f"Booking cache disabled, using direct queries: {str(e)}")
+            return None
+
+        self.booking_cache = cache
+        return cache
+
+    def get_today_bookings(self, user_id):
+        """
+        Active tokens for a user visiting today, for gate decisions
+        Served from the local cache when it is ready, otherwise from the database
+        """
+        from bson import ObjectId
+
+        if self.booking_cache is not None:
+            cached = self.booking_cache.get_today_bookings(user_id)
+            if cached is not None:
+                return cached
+
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        tokens = self.tokens.find({
+            'userId': ObjectId(user_id),
+            'status': 'active',
+            'visitDate': {'$gte': today, '$lt': today + timedelta(days=1)}
+        })
+
+        return list(tokens)
+
     def get_user_bookings(self, user_id):
         """Get active bookings/tokens for a user"""
         from bson import ObjectId
@@ -71,31 +120,13 @@ class DatabaseHandler:
         Validate if current time matches booking slot
         Returns: dict with validation result
         """
-        visit_date = booking['visitDate']
-        time_slot = booking['timeSlot']
-        
-        # Parse time slot (format: "09:00 AM - 10:00 AM")
+        # Slot window pre-parsed by the booking cache, if the booking came from there
+        window = booking.get('_slotWindow')
+
         try:
-            start_time_str = time_slot.split('-')[0].strip()
-            
-            # Convert to datetime
-            slot_datetime = datetime.combine(visit_date.date(), datetime.strptime(start_time_str, '%I:%M %p').time())
-            
-            # Current time
-            now = datetime.now()
-            
-            # Allow entry 30 minutes before slot and 1 hour after
-            allowed_start = slot_datetime - timedelta(minutes=30)
-            allowed_end = slot_datetime + timedelta(hours=1)
-            
-            is_valid = allowed_start <= now <= allowed_end
-            
-            return {
-                'is_valid': is_valid,
-                'slot_time': slot_datetime,
-                'current_time': now,
-                'message': 'Entry allowed' if is_valid else f'Entry only allowed between {allowed_start.strftime("%I:%M %p")} and {allowed_end.strftime("%I:%M %p")}'
-            }
+            if window is None:
+                window = parse_slot_window(booking['visitDate'], booking['timeSlot'])
+            return check_slot_window(window)
         except Exception as e:
             return {
                 'is_valid': False,
@@ -105,6 +136,11 @@ class DatabaseHandler:
     def get_user_queue_status(self, user_id, temple_id):
         """Get user's queue status for a temple"""
         from bson import ObjectId
+
+        if self.booking_cache is not None:
+            hit, queue = self.booking_cache.get_queue_status(user_id, temple_id)
+            if hit:
+                return queue
         
         queue = self.queues.find_one({
             'userId': ObjectId(user_id),
@@ -122,6 +158,9 @@ class DatabaseHandler:
             {'_id': ObjectId(booking_id)},
             {'$set': {'status': 'used'}}
         )
+
+        if self.booking_cache is not None:
+            self.booking_cache.mark_used(booking_id)
         
         return result.modified_count > 0
     
@@ -175,7 +214,12 @@ class DatabaseHandler:
                         print(f"✗ No face detected in image for user: {user['name']}")
             except Exception as e:
                 print(f"Error processing user {user.get('name', 'Unknown')}: {str(e)}")
+
+        # Pick up newly cached users on the next match
+        self.gallery = None
     
     def close(self):
         """Close database connection"""
+        if self.booking_cache is not None:
+            self.booking_cache.stop()
         self.client.close()
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+
+class EntryJournal:
+    """
+    Write-behind journal for granted entries
+    An entry is appended (and fsynced) to a local JSON-lines file before the gate
+    answers; a background thread then marks the tokens used in Mongo in batches
+    with bulk_write and appends a 'flushed' record. Tokens recorded here are refused
+    a second time immediately, whether or not the flush has happened yet.
+    On startup the journal is replayed, so unflushed entries survive a crash.
+    """
+
+    def __init__(self, tokens, journal_path='./entry_journal.jsonl', log_path='./login_log.txt',
+                 booking_cache=None, batch_size=200, flush_interval=1.0):
+        self.tokens = tokens
+        self.journal_path = journal_path
+        self.log_path = log_path
+        self.booking_cache = booking_cache
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._used = set()      # booking ids recorded today
+        self._pending = {}      # booking id -> entry record not yet in Mongo
+        self._log_lines = []    # legacy login_log.txt lines waiting to be written
+
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._replay()
+        self._file = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _replay(self):
+        """Rebuild used/pending state and compact the journal to today's records"""
+        if not os.path.exists(self.journal_path):
+            return
+
+        today = datetime.now().date().isoformat()
+        records = {}     # booking id -> entry record
+        flushed = set()
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn last line after a crash
+                    continue
+
+                if record['type'] == 'entry':
+                    records[record['bookingId']] = record
+                    flushed.discard(record['bookingId'])
+                elif record['type'] == 'flushed':
+                    flushed.update(record['bookingIds'])
+
+        for booking_id, record in records.items():
+            if booking_id not in flushed:
+                self._pending[booking_id] = record
+            if record['time'][:10] == today:
+                self._used.add(booking_id)
+
+        # Keep what is still needed: unflushed entries and today's used tokens
+        kept = [r for b, r in records.items() if b in self._pending or b in self._used]
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in kept:
+                f.write(json.dumps(record) + '\n')
+            done = [r['bookingId'] for r in kept if r['bookingId'] not in self._pending]
+            if done:
+                f.write(json.dumps({'type': 'flushed', 'bookingIds': done}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher after a final flush attempt"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+        self.flush()
+        self._file.close()
+
+    def is_used(self, booking_id):
+        with self._lock:
+            return str(booking_id) in self._used
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def record_entry(self, user, booking):
+        """
+        Durably record a granted entry
+        Returns False (and records nothing) if the token was already used at this gate
+        """
+        booking_id = str(booking['_id'])
+        now = datetime.now()
+        record = {
+            'type': 'entry',
+            'time': now.isoformat(),
+            'bookingId': booking_id,
+            'tokenNumber': booking['tokenNumber'],
+            'userId': str(user['_id']),
+            'name': user['name'],
+            'email': user['email'],
+        }
+
+        with self._lock:
+            if booking_id in self._used:
+                return False
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+            self._used.add(booking_id)
+            self._pending[booking_id] = record
+            self._log_lines.append(f"{user['name']},{user['email']},{now},ENTRY_GRANTED,{booking['tokenNumber']}\n")
+
+        if self.booking_cache is not None:
+            self.booking_cache.mark_used(booking_id)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Push pending entries to Mongo in batches; failed batches stay pending"""
+        with self._lock:
+            pending = list(self._pending.values())
+            log_lines, self._log_lines = self._log_lines, []
+
+        if log_lines:
+            with open(self.log_path, 'a') as f:
+                f.writelines(log_lines)
+
+        for i in range(0, len(pending), self.batch_size):
+            batch = pending[i:i + self.batch_size]
+            ops = [UpdateOne({'_id': ObjectId(r['bookingId'])}, {'$set': {'status': 'used'}}) for r in batch]
+            try:
+                self.tokens.bulk_write(ops, ordered=False)
+            except Exception as e:
+                print(f"Entry journal flush failed, will retry: {str(e)[:80]}")
+                return
+
+            booking_ids = [r['bookingId'] for r in batch]
+            with self._lock:
+                self._file.write(json.dumps({'type': 'flushed', 'bookingIds': booking_ids}) + '\n')
+                self._file.flush()
+                for booking_id in booking_ids:
+                    self._pending.pop(booking_id, None)
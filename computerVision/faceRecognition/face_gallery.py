@@ -0,0 +1,77 @@
+import os
+import pickle
+
+import numpy as np
+
+
+class FaceGallery:
+    """
+    Known face encodings held as one (n, 128) matrix
+    Matching a batch of unknown faces is a single vectorized distance computation
+    instead of one compare_faces call (and one pickle load) per known user
+    """
+
+    def __init__(self, ids=None, encodings=None, dtype=np.float64):
+        self.ids = list(ids) if ids is not None else []
+        self.dtype = dtype
+        if encodings is None or len(self.ids) == 0:
+            self.encodings = np.zeros((0, 128), dtype=dtype)
+        else:
+            self.encodings = np.asarray(encodings, dtype=dtype).reshape(len(self.ids), -1)
+        # Squared norms are reused for every query
+        self._sq_norms = np.einsum('ij,ij->i', self.encodings, self.encodings)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_cache_dir(cls, cache_dir, ids=None):
+        """
+        Build a gallery from a directory of <id>.pickle encodings
+        If ids is given only those entries are loaded (missing files are skipped)
+        """
+        if ids is None:
+            if not os.path.isdir(cache_dir):
+                return cls()
+            ids = sorted(f[:-7] for f in os.listdir(cache_dir) if f.endswith('.pickle'))
+
+        loaded_ids = []
+        encodings = []
+        for id_ in ids:
+            path_ = os.path.join(cache_dir, f"{id_}.pickle")
+            if not os.path.exists(path_):
+                continue
+            with open(path_, 'rb') as f:
+                encodings.append(pickle.load(f))
+            loaded_ids.append(id_)
+
+        return cls(loaded_ids, encodings)
+
+    def distances(self, face_encodings):
+        """Euclidean distance matrix of shape (n_queries, n_known)"""
+        queries = np.asarray(face_encodings, dtype=self.dtype).reshape(-1, 128)
+        if len(self.ids) == 0:
+            return np.zeros((len(queries), 0))
+
+        q_sq = np.einsum('ij,ij->i', queries, queries)
+        d2 = q_sq[:, None] + self._sq_norms[None, :] - 2.0 * queries @ self.encodings.T
+        np.maximum(d2, 0, out=d2)
+        return np.sqrt(d2)
+
+    def match(self, face_encodings, tolerance=0.6):
+        """
+        Match a batch of encodings against the gallery
+        Returns a list with the best matching id (or None) for each query,
+        using the same distance <= tolerance rule as face_recognition.compare_faces
+        """
+        queries = np.asarray(face_encodings, dtype=self.dtype).reshape(-1, 128)
+        if len(queries) == 0:
+            return []
+        if len(self.ids) == 0:
+            return [None] * len(queries)
+
+        dist = self.distances(queries)
+        best = np.argmin(dist, axis=1)
+        best_dist = dist[np.arange(len(queries)), best]
+
+        return [self.ids[b] if d <= tolerance else None for b, d in zip(best, best_dist)]
@@ -9,6 +9,8 @@ import face_recognition
 
 import util
 from db_handler import DatabaseHandler
+from walkthrough import WalkThroughRecognizer
+from entry_journal import EntryJournal
 
 
 class App:
@@ -19,31 +21,46 @@ class App:
 
         # Initialize database handler
         self.db_handler = DatabaseHandler()
+
+        # Today's bookings kept locally so gate decisions don't wait on Mongo
+        self.db_handler.enable_booking_cache()
+
+        self.current_user = None
+        self.log_path = './login_log.txt'
+
+        # Granted entries are journaled locally and flushed to Mongo in batches
+        self.entry_journal = EntryJournal(self.db_handler.tokens, log_path=self.log_path,
+                                          booking_cache=self.db_handler.booking_cache)
+        self.entry_journal.start()
         
         # Sync face encodings from database
         self.sync_button = util.get_button(self.main_window, 'Sync Faces from DB', 'blue', self.sync_faces)
-        self.sync_button.place(x=750, y=100)
+        self.sync_button.place(x=750, y=10)
 
         self.login_button_main_window = util.get_button(self.main_window, 'Face Login', 'green', self.login)
-        self.login_button_main_window.place(x=750, y=200)
+        self.login_button_main_window.place(x=750, y=90)
+
+        # Hands-free mode: every face walking past the camera gets one decision
+        self.walkthrough_button = util.get_button(self.main_window, 'Walk-through Mode', 'purple', self.toggle_walkthrough)
+        self.walkthrough_button.place(x=750, y=170)
 
         self.check_booking_button = util.get_button(self.main_window, 'Check Bookings', 'orange', self.check_bookings)
-        self.check_booking_button.place(x=750, y=300)
+        self.check_booking_button.place(x=750, y=250)
 
         self.exit_button = util.get_button(self.main_window, 'Exit', 'red', self.exit_app)
-        self.exit_button.place(x=750, y=400)
+        self.exit_button.place(x=750, y=330)
 
         self.webcam_label = util.get_img_label(self.main_window)
         self.webcam_label.place(x=10, y=0, width=700, height=580)
 
         # Info display area
         self.info_text = tk.Text(self.main_window, height=10, width=50, font=('Arial', 10))
-        self.info_text.place(x=750, y=450)
+        self.info_text.place(x=750, y=420)
 
-        self.add_webcam(self.webcam_label)
+        self.walkthrough = WalkThroughRecognizer(self.db_handler, self.evaluate_entry)
+        self._last_metrics_time = datetime.datetime.now()
 
-        self.current_user = None
-        self.log_path = './login_log.txt'
+        self.add_webcam(self.webcam_label)
 
     def sync_faces(self):
         """Sync face encodings from database to local cache"""
@@ -73,7 +90,20 @@ class App:
         ret, frame = self.cap.read()
 
         self.most_recent_capture_arr = frame
-        img_ = cv2.cvtColor(self.most_recent_capture_arr, cv2.COLOR_BGR2RGB)
+        display = frame
+
+        if self.walkthrough.running:
+            self.walkthrough.submit(frame)
+            self.show_walkthrough_events()
+            display = frame.copy()
+            for box, label in self.walkthrough.track_snapshot():
+                top, right, bottom, left = box
+                color = (0, 255, 0) if label not in (None, 'unknown') else (0, 165, 255)
+                cv2.rectangle(display, (left, top), (right, bottom), color, 2)
+                cv2.putText(display, label or '...', (left, top - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+        img_ = cv2.cvtColor(display, cv2.COLOR_BGR2RGB)
         self.most_recent_capture_pil = Image.fromarray(img_)
         imgtk = ImageTk.PhotoImage(image=self.most_recent_capture_pil)
         self._label.imgtk = imgtk
@@ -81,6 +111,85 @@ class App:
 
         self._label.after(20, self.process_webcam)
 
+    def toggle_walkthrough(self):
+        """Start or stop continuous walk-through recognition"""
+        if self.walkthrough.running:
+            self.walkthrough.stop()
+            self.update_info("Walk-through mode stopped.\n")
+        else:
+            self.walkthrough.start()
+            self.update_info("Walk-through mode started.\n")
+
+    def show_walkthrough_events(self):
+        """Display decisions emitted by the walk-through recognizer"""
+        for event in self.walkthrough.poll_events():
+            if event['type'] == 'error':
+                self.info_text.insert(tk.END, f"Walk-through error: {event['message']}\n")
+                continue
+
+            name = event['user']['name'] if event['user'] else 'Unknown'
+            mark = '✓' if event['granted'] else '✗'
+            self.info_text.insert(tk.END, f"{mark} {name}: {event['decision']} ({event['latency'] * 1000:.0f} ms)\n")
+            self.info_text.see(tk.END)
+
+        # Headline metrics every 10 seconds
+        now = datetime.datetime.now()
+        if (now - self._last_metrics_time).total_seconds() >= 10:
+            self._last_metrics_time = now
+            m = self.walkthrough.metrics()
+            self.info_text.insert(tk.END, f"[{m['decisions_per_minute']}/min | p50 {m['latency_p50_ms']:.0f} ms"
+                                          f" | p95 {m['latency_p95_ms']:.0f} ms]\n")
+            self.info_text.see(tk.END)
+
+    def evaluate_entry(self, user):
+        """
+        Decide entry for a recognized user without touching the UI
+        Grants (journals) the entry when the booking is valid
+        Returns: dict with decision, granted flag, message and booking
+        """
+        user_id = str(user['_id'])
+        # Today's bookings come from the local cache; only a miss goes to the database
+        today_bookings = self.db_handler.get_today_bookings(user_id)
+
+        if len(today_bookings) == 0:
+            bookings = self.db_handler.get_user_bookings(user_id)
+
+            if len(bookings) == 0:
+                return {'decision': 'no_booking', 'granted': False, 'booking': None,
+                        'message': 'You have no active bookings.'}
+
+            # A booking made since the last cache refresh is still found here
+            today = datetime.datetime.now().date()
+            today_bookings = [b for b in bookings if b['visitDate'].date() == today]
+
+        if len(today_bookings) == 0:
+            future_dates = [b['visitDate'].strftime('%Y-%m-%d') for b in bookings]
+            return {'decision': 'no_booking_today', 'granted': False, 'booking': None,
+                    'future_dates': future_dates,
+                    'message': 'You have no booking for today.'}
+
+        # Tokens already used at this gate may not have reached the database yet
+        unused_bookings = [b for b in today_bookings if not self.entry_journal.is_used(b['_id'])]
+
+        if len(unused_bookings) == 0:
+            return {'decision': 'already_used', 'granted': False, 'booking': today_bookings[0],
+                    'message': 'this token has already been used for entry.'}
+
+        # Validate time slot for today's booking
+        booking = unused_bookings[0]  # Take first booking
+        validation = self.db_handler.validate_booking_time(booking)
+
+        if not validation['is_valid']:
+            return {'decision': 'denied', 'granted': False, 'booking': booking,
+                    'message': validation['message']}
+
+        # Journal the entry; the token is marked used in Mongo by the background flush
+        if not self.entry_journal.record_entry(user, booking):
+            return {'decision': 'already_used', 'granted': False, 'booking': booking,
+                    'message': 'this token has already been used for entry.'}
+
+        return {'decision': 'granted', 'granted': True, 'booking': booking, 'message': 'Entry allowed'}
+
     def login(self):
         """Face recognition login with booking validation"""
         self.update_info("Processing face recognition...\n")
@@ -106,55 +215,39 @@ class App:
         # User recognized
         self.current_user = user
         user_name = user['name']
-        user_id = str(user['_id'])
         
         self.update_info(f"✓ User recognized: {user_name}\n")
         self.update_info(f"Email: {user['email']}\n")
         self.update_info(f"Phone: {user['phone']}\n")
         
-        # Get user bookings
-        bookings = self.db_handler.get_user_bookings(user_id)
-        
-        if len(bookings) == 0:
+        result = self.evaluate_entry(user)
+        booking = result['booking']
+
+        if result['decision'] == 'no_booking':
             util.msg_box('No Booking', f'Welcome {user_name}!\nYou have no active bookings.')
             self.update_info("No active bookings found.\n")
             return
         
-        # Check today's bookings
-        today = datetime.datetime.now().date()
-        today_bookings = [b for b in bookings if b['visitDate'].date() == today]
-        
-        if len(today_bookings) == 0:
-            future_dates = [b['visitDate'].strftime('%Y-%m-%d') for b in bookings]
+        if result['decision'] == 'no_booking_today':
+            future_dates = result['future_dates']
             util.msg_box('No Booking Today', 
-                        f'{user_name}, you have no booking for today.\nYour upcoming bookings: {', '.join(future_dates)}')
+                        f"{user_name}, you have no booking for today.\nYour upcoming bookings: {', '.join(future_dates)}")
             self.update_info(f"No booking for today. Future bookings: {future_dates}\n")
             return
         
-        # Validate time slot for today's booking
-        booking = today_bookings[0]  # Take first booking
-        validation = self.db_handler.validate_booking_time(booking)
-        
         self.update_info(f"Time Slot: {booking['timeSlot']}\n")
         self.update_info(f"Temple ID: {booking['templeId']}\n")
         self.update_info(f"Token: {booking['tokenNumber']}\n")
         self.update_info(f"Visitors: {booking['numberOfVisitors']}\n")
         
-        if validation['is_valid']:
-            # Mark entry
-            self.db_handler.mark_user_entry(user_id, str(booking['_id']))
-            
-            # Log entry
-            with open(self.log_path, 'a') as f:
-                f.write(f"{user_name},{user['email']},{datetime.datetime.now()},ENTRY_GRANTED,{booking['tokenNumber']}\n")
-            
+        if result['granted']:
             util.msg_box('✓ Entry Granted', 
                         f"Welcome {user_name}!\n\nToken: {booking['tokenNumber']}\nTemple: {booking['templeId']}\nSlot: {booking['timeSlot']}\nVisitors: {booking['numberOfVisitors']}")
             self.update_info("✓ ENTRY GRANTED\n")
         else:
             util.msg_box('Entry Denied', 
-                        f"{user_name}, {validation['message']}\n\nYour slot: {booking['timeSlot']}")
-            self.update_info(f"✗ ENTRY DENIED: {validation['message']}\n")
+                        f"{user_name}, {result['message']}\n\nYour slot: {booking['timeSlot']}")
+            self.update_info(f"✗ ENTRY DENIED: {result['message']}\n")
         
         self.update_info("-" * 50 + "\n")
 
@@ -191,6 +284,8 @@ class App:
 
     def exit_app(self):
         """Close application and cleanup"""
+        self.walkthrough.stop()
+        self.entry_journal.stop()
         self.db_handler.close()
         self.cap.release()
         cv2.destroyAllWindows()
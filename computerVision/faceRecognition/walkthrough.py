@@ -0,0 +1,216 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+import face_recognition
+
+
+def box_iou(box_a, box_b):
+    """IoU of two face_recognition boxes in (top, right, bottom, left) order"""
+    top = max(box_a[0], box_b[0])
+    right = min(box_a[1], box_b[1])
+    bottom = min(box_a[2], box_b[2])
+    left = max(box_a[3], box_b[3])
+
+    inter = max(0, right - left) * max(0, bottom - top)
+    if inter == 0:
+        return 0.0
+
+    area_a = (box_a[1] - box_a[3]) * (box_a[2] - box_a[0])
+    area_b = (box_b[1] - box_b[3]) * (box_b[2] - box_b[0])
+    return inter / float(area_a + area_b - inter)
+
+
+class FaceTrack:
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.missed = 0
+        self.label = None  # set once the track has been matched
+
+
+class WalkThroughRecognizer:
+    """
+    Hands-free gate mode
+    Frames are sampled from the webcam loop, faces are detected on a downscaled
+    copy and tracked across samples by IoU. Only new tracks are encoded, all new
+    faces of a frame in one batch, and each track gets exactly one entry decision.
+    Decisions are emitted as event dicts that the UI thread polls.
+    """
+
+    def __init__(self, db_handler, decide_entry, sample_every=3, detect_scale=0.5,
+                 iou_threshold=0.3, max_missed=5, repeat_cooldown=60):
+        self.db_handler = db_handler
+        self.decide_entry = decide_entry
+        self.sample_every = sample_every
+        self.detect_scale = detect_scale
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.repeat_cooldown = repeat_cooldown
+
+        # tracks are updated by the worker and drawn by the UI thread; both go through _lock
+        self.tracks = []
+        self._lock = threading.Lock()
+        self._next_track_id = 1
+        self._frame_count = 0
+        self._recent_users = {}  # user_id -> time of last decision
+
+        # maxsize=1: if the worker is busy the newest frame is simply dropped
+        self._frames = queue.Queue(maxsize=1)
+        self._events = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._decision_times = deque()
+        self._latencies = deque(maxlen=500)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._thread = None
+        with self._lock:
+            self.tracks = []
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, frame):
+        """Offer a webcam frame (BGR); only every sample_every-th frame is processed"""
+        self._frame_count += 1
+        if self._frame_count % self.sample_every != 0:
+            return
+        try:
+            self._frames.put_nowait((time.time(), frame))
+        except queue.Full:
+            pass
+
+    def track_snapshot(self):
+        """(box, label) of the current tracks, safe to use from the UI thread"""
+        with self._lock:
+            return [(track.box, track.label) for track in self.tracks]
+
+    def poll_events(self):
+        """Return all decision events emitted since the last poll"""
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def metrics(self):
+        """Throughput over the last minute and per-person decision latency"""
+        now = time.time()
+        while self._decision_times and now - self._decision_times[0] > 60:
+            self._decision_times.popleft()
+
+        latencies = np.array(self._latencies) if self._latencies else np.zeros(1)
+        return {
+            'decisions_per_minute': len(self._decision_times),
+            'latency_p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'latency_p95_ms': float(np.percentile(latencies, 95) * 1000),
+            'active_tracks': len(self.track_snapshot()),
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                captured_at, frame = self._frames.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                self.process_frame(frame, captured_at)
+            except Exception as e:
+                self._events.put({'type': 'error', 'message': str(e), 'time': time.time()})
+
+    def detect_faces(self, rgb):
+        """Face boxes in full-resolution coordinates, detected on a downscaled copy"""
+        small = cv2.resize(rgb, (0, 0), fx=self.detect_scale, fy=self.detect_scale)
+        inv = 1.0 / self.detect_scale
+        return [tuple(int(v * inv) for v in loc) for loc in face_recognition.face_locations(small)]
+
+    def update_tracks(self, boxes, now):
+        """Associate detections with existing tracks; returns the newly created tracks"""
+        with self._lock:
+            return self._update_tracks(boxes, now)
+
+    def _update_tracks(self, boxes, now):
+        unmatched = list(range(len(boxes)))
+        for track in self.tracks:
+            best, best_iou = None, self.iou_threshold
+            for i in unmatched:
+                iou = box_iou(track.box, boxes[i])
+                if iou >= best_iou:
+                    best, best_iou = i, iou
+            if best is None:
+                track.missed += 1
+            else:
+                track.box = boxes[best]
+                track.last_seen = now
+                track.missed = 0
+                unmatched.remove(best)
+
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+
+        new_tracks = []
+        for i in unmatched:
+            track = FaceTrack(self._next_track_id, boxes[i], now)
+            self._next_track_id += 1
+            self.tracks.append(track)
+            new_tracks.append(track)
+        return new_tracks
+
+    def process_frame(self, frame, captured_at=None):
+        captured_at = captured_at if captured_at is not None else time.time()
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        new_tracks = self.update_tracks(self.detect_faces(rgb), captured_at)
+        if not new_tracks:
+            return
+
+        # One encoding pass and one gallery lookup for every new face in the frame
+        encodings = face_recognition.face_encodings(rgb, known_face_locations=[t.box for t in new_tracks])
+        users = self.db_handler.recognize_users_from_faces(encodings)
+
+        for track, user in zip(new_tracks, users):
+            self._decide(track, user, captured_at)
+
+    def _decide(self, track, user, captured_at):
+        event = {'type': 'decision', 'track_id': track.track_id, 'user': user}
+
+        if user is None:
+            with self._lock:
+                track.label = 'unknown'
+            event.update({'decision': 'unknown', 'granted': False, 'message': 'Face not recognized'})
+        else:
+            user_id = str(user['_id'])
+            with self._lock:
+                track.label = user['name']
+            last = self._recent_users.get(user_id)
+            if last is not None and time.time() - last < self.repeat_cooldown:
+                # Same person re-acquired as a new track; already decided
+                return
+            self._recent_users[user_id] = time.time()
+            event.update(self.decide_entry(user))
+
+        # Latency covers the decision itself, including its DB and journal writes
+        now = time.time()
+        event['time'] = now
+        event['latency'] = now - captured_at
+        self._latencies.append(event['latency'])
+        self._decision_times.append(now)
+        self._events.put(event)
@@ -0,0 +1,183 @@
+"""
+Crowd forecast replay benchmark
+
+Replays zone counts through CrowdForecaster and compares its predicted alert
+levels with the reactive get_alert_level on the actual counts:
+- lead time: how long before a zone actually reached `high` the forecast said so
+- false alarms: forecast `high` episodes not followed by an actual `high`
+  within the longest horizon (plus --grace seconds)
+
+Counts come from a local history file (heatmap_history.py) or, without one, from
+a synthetic multi-day series with daily peaks and random rushes.
+
+Usage:
+    python benchmark_forecast.py
+    python benchmark_forecast.py --history history/camera-1.heatmap --days 14
+    python benchmark_forecast.py --days 7 --alpha 0.4 --beta 0.1 --confirm 3
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from heatmap_core import SEND_INTERVAL, default_zones, get_alert_level
+from crowd_forecast import CrowdForecaster, HORIZONS, LEVELS
+
+
+ALERT = LEVELS.index('high')
+
+
+def synthetic_counts(zones, days, interval, seed):
+    """Daily morning/evening peaks, Poisson noise and a few ramps past capacity per day"""
+    rng = np.random.default_rng(seed)
+    start = time.time() - days * 86400
+    start -= start % 86400
+    t = start + np.arange(int(days * 86400 / interval)) * interval
+    hour = (t % 86400) / 3600
+    daily = 0.25 + 0.2 * np.exp(-((hour - 9) / 1.5) ** 2) + 0.25 * np.exp(-((hour - 18) / 2) ** 2)
+
+    counts = {}
+    for zone_id, info in zones.items():
+        expected = daily * info['capacity']
+        for _ in range(rng.poisson(3 * days)):
+            onset = rng.uniform(t[0], t[-1])
+            ramp = rng.uniform(600, 1800)      # 10-30 minutes to build up
+            hold = rng.uniform(300, 1200)
+            peak = rng.uniform(0.5, 0.8) * info['capacity']
+            rise = np.clip((t - onset) / ramp, 0, 1)
+            fall = np.clip(1 - (t - onset - ramp - hold) / ramp, 0, 1)
+            expected = expected + peak * np.minimum(rise, fall)
+        counts[zone_id] = rng.poisson(expected).astype(float)
+    return t, counts
+
+
+def history_counts(path, zones, days):
+    from heatmap_history import HeatmapHistory
+
+    history = HeatmapHistory(path)
+    end = time.time()
+    records = history.slice(end - days * 86400, end)
+    counts = {z: records['zones'][:, history.zone_ids.index(z)].astype(float)
+              for z in zones if z in history.zone_ids}
+    return np.array(records['t']), counts
+
+
+def merge_gaps(t, flags, gap):
+    """Treat alert episodes separated by less than gap seconds as one"""
+    flags = np.asarray(flags, bool).copy()
+    starts = episodes(flags)
+    ends = episodes(~flags)
+    for end in ends:
+        following = starts[starts > end]
+        if end > 0 and len(following) and t[following[0]] - t[end] < gap:
+            flags[end:following[0]] = True
+    return flags
+
+
+def episodes(flags):
+    """Start indices of runs of True"""
+    flags = np.asarray(flags, bool)
+    return np.flatnonzero(flags & ~np.concatenate(([False], flags[:-1])))
+
+
+def evaluate(t, actual_flags, predicted_flags, horizon, grace):
+    actual_starts = episodes(actual_flags)
+    predicted_starts = episodes(predicted_flags)
+
+    # Lead time: the forecast episode running (or started) when the actual one began
+    leads = []
+    for i in actual_starts:
+        window = predicted_starts[(t[predicted_starts] <= t[i]) & (t[predicted_starts] >= t[i] - horizon - grace)]
+        if len(window) and predicted_flags[window[-1]:i + 1].all():
+            leads.append(t[i] - t[window[-1]])
+        else:
+            leads.append(0.0)
+
+    # False alarm: no actual alert from the forecast start until the horizon has passed
+    false_alarms = 0
+    for i in predicted_starts:
+        until = np.searchsorted(t, t[i] + horizon + grace, 'right')
+        if not actual_flags[i:until].any():
+            false_alarms += 1
+    return actual_starts, predicted_starts, leads, false_alarms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay benchmark for crowd forecasting')
+    parser.add_argument('--history', help='heatmap history file to replay (default: synthetic series)')
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--interval', type=float, default=SEND_INTERVAL)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--alpha', type=float, default=0.1)
+    parser.add_argument('--beta', type=float, default=0.02)
+    parser.add_argument('--phi', type=float, default=0.995)
+    parser.add_argument('--confirm', type=int, default=2)
+    parser.add_argument('--grace', type=float, default=300, help='seconds allowed past the horizon')
+    parser.add_argument('--smooth', type=float, default=60, help='seconds of counts averaged for the ground truth')
+    parser.add_argument('--merge', type=float, default=300,
+                        help='alert episodes closer than this many seconds count as one')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+
+    zones = default_zones(1280, 720)
+    if args.history:
+        t, counts = history_counts(args.history, zones, args.days)
+        zones = {z: zones[z] for z in counts}
+    else:
+        t, counts = synthetic_counts(zones, args.days, args.interval, args.seed)
+
+    forecaster = CrowdForecaster(zones, confirm=args.confirm, interval=args.interval,
+                                 alpha=args.alpha, beta=args.beta, phi=args.phi)
+    predicted = {z: np.zeros(len(t), bool) for z in zones}
+    started = time.perf_counter()
+    for i in range(len(t)):
+        levels = forecaster.update(t[i], {z: counts[z][i] for z in zones})
+        for z in zones:
+            predicted[z][i] = LEVELS.index(levels[z]) >= ALERT
+    update_us = (time.perf_counter() - started) / max(len(t), 1) / len(zones) * 1e6
+
+    report = {'intervals': len(t), 'days': round((t[-1] - t[0]) / 86400, 2) if len(t) else 0,
+              'update_us_per_zone': round(update_us, 2), 'zones': {}}
+    all_leads, total_alarms, total_false, total_events = [], 0, 0, 0
+    horizon = max(HORIZONS)
+    for z, info in zones.items():
+        # Ground truth from the count averaged over --smooth seconds, so single noisy frames are not rushes
+        window = max(1, int(args.smooth / args.interval))
+        smoothed = np.convolve(counts[z], np.ones(window) / window)[:len(t)]
+        actual = np.array([LEVELS.index(get_alert_level(c, info['capacity'])) >= ALERT for c in smoothed])
+        actual = merge_gaps(t, actual, args.merge)
+        flags = merge_gaps(t, predicted[z], args.merge)
+        actual_starts, predicted_starts, leads, false_alarms = evaluate(t, actual, flags, horizon, args.grace)
+        early = [lead for lead in leads if lead > 0]
+        report['zones'][z] = {
+            'actual_alerts': len(actual_starts),
+            'forecast_alerts': len(predicted_starts),
+            'warned_early': len(early),
+            'lead_s_median': round(float(np.median(early)), 1) if early else 0.0,
+            'false_alarms': false_alarms,
+        }
+        all_leads += leads
+        total_alarms += len(predicted_starts)
+        total_false += false_alarms
+        total_events += len(actual_starts)
+
+    early = [lead for lead in all_leads if lead > 0]
+    report['overall'] = {
+        'actual_alerts': total_events,
+        'warned_early_pct': round(100 * len(early) / total_events, 1) if total_events else 0.0,
+        'lead_s_median': round(float(np.median(early)), 1) if early else 0.0,
+        'lead_s_mean_all': round(float(np.mean(all_leads)), 1) if all_leads else 0.0,
+        'forecast_alerts': total_alarms,
+        'false_alarm_rate': round(total_false / total_alarms, 3) if total_alarms else 0.0,
+        'false_alarms_per_day': round(total_false / max(report['days'], 1e-9), 2) if report['days'] else 0.0,
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
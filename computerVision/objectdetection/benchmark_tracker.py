@@ -0,0 +1,238 @@
+"""
+Tracker benchmark: per-frame cost and identity switches
+
+Every tracker is fed the same detections, so only the association is compared:
+- sort:      the pure-NumPy SortTracker (sort_tracker.py)
+- bytetrack: ultralytics' BYTETracker, what model.track uses by default
+- deepsort:  the DeepSORT wrapper (tracker.py), only with --video since it needs
+             frames for its appearance features
+
+Without --video, people walk across a synthetic frame and cross each other;
+detections are jittered, dropped, weakened during occlusion and mixed with false
+positives. Ground truth is known, so ID switches (a person's matched track id
+changing) and the share of people-frames that got an id are reported.
+
+With --video, YOLO runs once per frame and its detections are replayed through
+each tracker. There is no ground truth there, so unique ids and mean track length
+stand in for identity stability (fewer, longer tracks for the same crowd means
+fewer switches).
+
+Usage:
+    python benchmark_tracker.py
+    python benchmark_tracker.py --people 80 --frames 1500 --miss 0.15
+    python benchmark_tracker.py --video people.mp4 --frames 600 --trackers sort,bytetrack,deepsort
+"""
+import argparse
+import json
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from sort_tracker import SortTracker, iou_matrix, match
+
+
+LOW_CONF = 0.1
+CONF = 0.5
+
+
+def synthetic_sequence(people, frames, width, height, miss, false_positives, seed):
+    """Per frame: ground-truth (ids, boxes) and detections (boxes, scores)"""
+    rng = np.random.default_rng(seed)
+    h = rng.uniform(90, 200, people)
+    w = h * rng.uniform(0.35, 0.5, people)
+    position = np.stack([rng.uniform(0, width, people), rng.uniform(0, height, people)], axis=1)
+    velocity = rng.normal(0, 2.5, (people, 2))
+    # People enter and leave over the sequence
+    enter = rng.integers(0, frames // 2, people)
+    leave = enter + rng.integers(frames // 4, frames, people)
+
+    sequence = []
+    for f in range(frames):
+        velocity += rng.normal(0, 0.3, velocity.shape)
+        velocity = np.clip(velocity, -5, 5)
+        position += velocity
+        # Bounce off the frame edges
+        for axis, size in ((0, width), (1, height)):
+            out = (position[:, axis] < 0) | (position[:, axis] > size)
+            velocity[out, axis] *= -1
+            position[:, axis] = np.clip(position[:, axis], 0, size)
+
+        present = np.flatnonzero((enter <= f) & (f < leave))
+        gt = np.stack([position[present, 0] - w[present] / 2, position[present, 1] - h[present] / 2,
+                       position[present, 0] + w[present] / 2, position[present, 1] + h[present] / 2], axis=1)
+
+        # Occluded people (mostly covered by someone nearer the camera, i.e. lower in frame) score low
+        overlap = iou_matrix(gt, gt)
+        np.fill_diagonal(overlap, 0)
+        nearer = gt[:, 3][None, :] > gt[:, 3][:, None]
+        occluded = (overlap * nearer).max(axis=1, initial=0) > 0.3
+        scores = np.where(occluded, rng.uniform(0.15, 0.5, len(gt)), rng.uniform(0.55, 0.95, len(gt)))
+        seen = rng.random(len(gt)) >= np.where(occluded, 2 * miss, miss)
+
+        jitter = rng.normal(0, 0.04, (len(gt), 4)) * np.repeat(h[present][:, None], 4, axis=1)
+        boxes = (gt + jitter)[seen]
+        scores = scores[seen]
+        n_fp = rng.poisson(false_positives)
+        if n_fp:
+            fx, fy = rng.uniform(0, width, n_fp), rng.uniform(0, height, n_fp)
+            fh = rng.uniform(60, 160, n_fp)
+            fp = np.stack([fx, fy, fx + fh * 0.4, fy + fh], axis=1)
+            boxes = np.concatenate([boxes, fp])
+            scores = np.concatenate([scores, rng.uniform(0.1, 0.6, n_fp)])
+        sequence.append((present, gt, boxes, scores))
+    return sequence
+
+
+def video_sequence(path, frames, model_path):
+    """YOLO person detections (down to LOW_CONF) per frame, with the frames for DeepSORT"""
+    import cv2
+    from ultralytics import YOLO
+
+    model = YOLO(model_path)
+    capture = cv2.VideoCapture(path)
+    sequence = []
+    while len(sequence) < frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        boxes = model.predict(frame, conf=LOW_CONF, classes=[0], verbose=False)[0].boxes
+        sequence.append((frame, boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy()))
+    capture.release()
+    return sequence
+
+
+class Sort:
+    def __init__(self):
+        self.tracker = SortTracker(high_thresh=CONF, low_thresh=LOW_CONF)
+
+    def __call__(self, frame, boxes, scores):
+        ids = self.tracker.update(boxes, scores)
+        keep = ids >= 0
+        return boxes[keep], ids[keep]
+
+
+class ByteTrack:
+    """ultralytics' BYTETracker with the defaults of its bytetrack.yaml"""
+
+    def __init__(self):
+        from ultralytics.trackers.byte_tracker import BYTETracker
+
+        args = SimpleNamespace(tracker_type='bytetrack', track_high_thresh=CONF, track_low_thresh=LOW_CONF,
+                               new_track_thresh=0.6, track_buffer=30, match_thresh=0.8, fuse_score=True)
+        self.tracker = BYTETracker(args, frame_rate=30)
+
+    def __call__(self, frame, boxes, scores):
+        xywh = np.concatenate([(boxes[:, :2] + boxes[:, 2:]) / 2, boxes[:, 2:] - boxes[:, :2]], axis=1)
+        results = SimpleNamespace(xyxy=boxes, xywh=xywh, conf=scores, cls=np.zeros(len(boxes)))
+        out = self.tracker.update(results, frame)
+        if len(out) == 0:
+            return np.zeros((0, 4)), np.zeros(0, int)
+        return out[:, :4], out[:, 4].astype(int)
+
+
+class DeepSort:
+    def __init__(self):
+        from tracker import Tracker
+
+        self.tracker = Tracker()
+
+    def __call__(self, frame, boxes, scores):
+        keep = scores >= CONF
+        self.tracker.update(frame, [[*b, s] for b, s in zip(boxes[keep].tolist(), scores[keep].tolist())])
+        tracks = self.tracker.tracks
+        if not tracks:
+            return np.zeros((0, 4)), np.zeros(0, int)
+        return np.array([t.bbox for t in tracks]), np.array([t.track_id for t in tracks], int)
+
+
+TRACKERS = {'sort': Sort, 'bytetrack': ByteTrack, 'deepsort': DeepSort}
+
+
+def score_against_truth(outputs, sequence, iou_threshold=0.5):
+    """
+    ID switches and coverage from per-frame (boxes, ids) against the ground truth
+    People and track boxes are paired one-to-one per frame (as in CLEAR MOT), so
+    two overlapping people cannot both claim the same track.
+    """
+    last_id = {}
+    switches = 0
+    covered = 0
+    total = 0
+    for (boxes, ids), (present, gt, _, _) in zip(outputs, sequence):
+        total += len(gt)
+        for row, column in match(gt, np.asarray(boxes, np.float64).reshape(-1, 4), iou_threshold):
+            person = int(present[row])
+            track_id = int(ids[column])
+            covered += 1
+            if person in last_id and last_id[person] != track_id:
+                switches += 1
+            last_id[person] = track_id
+    return {'id_switches': switches, 'coverage': round(covered / total, 3) if total else 0.0,
+            'people': len(last_id)}
+
+
+def track_lengths(outputs):
+    lengths = {}
+    for _, ids in outputs:
+        for track_id in ids:
+            lengths[int(track_id)] = lengths.get(int(track_id), 0) + 1
+    return {'unique_ids': len(lengths),
+            'mean_track_length': round(float(np.mean(list(lengths.values()))), 1) if lengths else 0.0}
+
+
+def run(name, frames):
+    """(boxes, ids) per frame and the tracker's own time per frame"""
+    tracker = TRACKERS[name]()
+    outputs = []
+    times = []
+    for frame, boxes, scores in frames:
+        started = time.perf_counter()
+        outputs.append(tracker(frame, np.asarray(boxes, np.float64), np.asarray(scores, np.float64)))
+        times.append(time.perf_counter() - started)
+    times = np.array(times) * 1000
+    return outputs, {'ms_per_frame': round(float(times.mean()), 3),
+                     'p95_ms': round(float(np.percentile(times, 95)), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare trackers on the same detections')
+    parser.add_argument('--trackers', default='sort,bytetrack', help=f"comma-separated: {','.join(TRACKERS)}")
+    parser.add_argument('--video', help='replay YOLO detections from a video instead of synthetic people')
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--frames', type=int, default=1000)
+    parser.add_argument('--people', type=int, default=40, help='synthetic people over the sequence')
+    parser.add_argument('--miss', type=float, default=0.05, help='synthetic missed-detection rate')
+    parser.add_argument('--false-positives', type=float, default=1.0, help='synthetic false positives per frame')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.video:
+        frames = video_sequence(args.video, args.frames, args.model)
+        sequence = None
+    else:
+        sequence = synthetic_sequence(args.people, args.frames, 1920, 1080, args.miss, args.false_positives,
+                                      args.seed)
+        blank = np.zeros((1080, 1920, 3), np.uint8)
+        frames = [(blank, boxes, scores) for _, _, boxes, scores in sequence]
+
+    report = {}
+    for name in args.trackers.split(','):
+        if name == 'deepsort' and not args.video:
+            report[name] = {'skipped': 'needs --video for appearance features'}
+            continue
+        try:
+            outputs, timing = run(name, frames)
+        except ImportError as e:
+            report[name] = {'skipped': f'not available ({e})'}
+            continue
+        result = dict(timing)
+        result.update(score_against_truth(outputs, sequence) if sequence else track_lengths(outputs))
+        report[name] = result
+        print(f"{name:10s} {result}")
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
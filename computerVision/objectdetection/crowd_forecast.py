@@ -0,0 +1,173 @@
+"""
+Short-horizon crowd forecasting per zone
+
+Each zone count is followed with a damped Holt trend on top of a time-of-day
+profile (Holt-Winters with an hourly season). Every update is O(1), so it runs
+once per send interval next to the heatmap. Forecasts 5, 10 and 15 minutes ahead
+are turned into alert levels with the same capacity ratios as get_alert_level,
+so a queue that is filling up is flagged before it crosses the threshold.
+
+The profile starts flat and learns slowly; it can be seeded from a local
+HeatmapHistory file (heatmap_history.py).
+"""
+import math
+import time
+
+import numpy as np
+
+from heatmap_core import SEND_INTERVAL, get_alert_level
+
+
+HORIZONS = (300, 600, 900)      # seconds ahead
+LEVELS = ['normal', 'warning', 'high', 'critical']
+SEASON_BINS = 24                # hour of day
+DAY = 86400
+
+
+class ZoneForecaster:
+    """
+    Damped-trend Holt-Winters for one count series
+    alpha: level smoothing, beta: trend smoothing, gamma: profile learning rate,
+    phi: trend damping per interval (1.0 = no damping)
+    """
+
+    def __init__(self, interval=SEND_INTERVAL, alpha=0.1, beta=0.02, gamma=0.01, phi=0.995,
+                 utc_offset=None):
+        self.interval = interval
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.phi = phi
+        # Local time-of-day by default, so the profile follows the temple's daily rhythm
+        self.utc_offset = -time_offset() if utc_offset is None else utc_offset
+        self.season = np.zeros(SEASON_BINS)
+        self.level = None
+        self.trend = 0.0
+        self.last_t = None
+
+    def _season_at(self, t):
+        """Profile value at t, interpolated between hourly bin centres"""
+        position = ((t + self.utc_offset) % DAY) / DAY * SEASON_BINS - 0.5
+        lower = math.floor(position)
+        weight = position - lower
+        return (1 - weight) * self.season[lower % SEASON_BINS] + weight * self.season[(lower + 1) % SEASON_BINS]
+
+    def _bin(self, t):
+        return int(((t + self.utc_offset) % DAY) / DAY * SEASON_BINS) % SEASON_BINS
+
+    def seed_profile(self, hour_starts, hour_means):
+        """Set the time-of-day profile from hourly means (e.g. HeatmapHistory.hourly)"""
+        if len(hour_starts) == 0:
+            return
+        bins = ((np.asarray(hour_starts) + self.utc_offset) % DAY // 3600).astype(int) % SEASON_BINS
+        sums = np.bincount(bins, weights=hour_means, minlength=SEASON_BINS)
+        counts = np.bincount(bins, minlength=SEASON_BINS)
+        seen = counts > 0
+        profile = np.zeros(SEASON_BINS)
+        profile[seen] = sums[seen] / counts[seen]
+        # Hours never seen take the overall mean; the profile is kept relative to it
+        profile[~seen] = profile[seen].mean()
+        self.season = profile - profile.mean()
+
+    def update(self, t, count):
+        seasonal = self._season_at(t)
+        if self.level is None:
+            self.level = count - seasonal
+            self.last_t = t
+            return
+        dt = t - self.last_t
+        if dt <= 0:
+            return
+        steps = dt / self.interval
+
+        previous = self.level
+        self.level = self.alpha * (count - seasonal) + (1 - self.alpha) * (self.level + self.trend * steps)
+        # Trend is kept per interval; a long gap only counts as one observation of it
+        self.trend = self.beta * (self.level - previous) / steps + (1 - self.beta) * self.trend * self.phi
+        self.season[self._bin(t)] += self.gamma * (count - self.level - seasonal)
+        self.last_t = t
+
+    def forecast(self, horizon):
+        """Expected count horizon seconds after the last update"""
+        if self.level is None:
+            return 0.0
+        steps = horizon / self.interval
+        if self.phi < 1.0:
+            damped = self.phi * (1 - self.phi ** steps) / (1 - self.phi)
+        else:
+            damped = steps
+        value = self.level + self.trend * damped + self._season_at(self.last_t + horizon)
+        return max(0.0, value)
+
+
+def time_offset():
+    """Seconds west of UTC for local time (time.timezone, honouring DST)"""
+    return time.altzone if time.localtime().tm_isdst > 0 else time.timezone
+
+
+class CrowdForecaster:
+    """
+    One ZoneForecaster per zone, updated once per interval; describe() adds the
+    forecasts to the zones_data list sent to the backend:
+        'forecast': [{'horizonMinutes': 5, 'peopleCount': 41, 'alertLevel': 'warning'}, ...]
+        'predictedAlertLevel': worst forecast level, raised only after `confirm`
+                               consecutive intervals agree, to cut one-off spikes
+    """
+
+    def __init__(self, zones, horizons=HORIZONS, confirm=2, **options):
+        self.capacities = {zone_id: info['capacity'] for zone_id, info in zones.items()}
+        self.horizons = horizons
+        self.confirm = confirm
+        self.models = {zone_id: ZoneForecaster(**options) for zone_id in zones}
+        self._pending = {zone_id: ('normal', 0) for zone_id in zones}
+        self.predicted = {zone_id: 'normal' for zone_id in zones}
+
+    def seed(self, history, days=28):
+        """Seed every zone's time-of-day profile from a HeatmapHistory"""
+        start = time.time() - days * DAY
+        for zone_id, model in self.models.items():
+            if zone_id in history.zone_ids:
+                hour_starts, means, _ = history.hourly(start=start, zone=zone_id)
+                model.seed_profile(hour_starts, means)
+
+    def update(self, t, zone_counts):
+        """Feed one interval of {zoneId: count}; returns {zoneId: predicted level}"""
+        for zone_id, model in self.models.items():
+            model.update(t, zone_counts.get(zone_id, 0))
+            worst = 'normal'
+            for horizon in self.horizons:
+                level = get_alert_level(model.forecast(horizon), self.capacities[zone_id])
+                if LEVELS.index(level) > LEVELS.index(worst):
+                    worst = level
+
+            # Raise after `confirm` agreeing intervals, lower at once
+            candidate, streak = self._pending[zone_id]
+            streak = streak + 1 if worst == candidate else 1
+            self._pending[zone_id] = (worst, streak)
+            current = self.predicted[zone_id]
+            if LEVELS.index(worst) < LEVELS.index(current) or streak >= self.confirm:
+                self.predicted[zone_id] = worst
+        return dict(self.predicted)
+
+    def describe(self, zones_data):
+        """Add the current forecast fields to a zones_data payload"""
+        for zone in zones_data:
+            model = self.models.get(zone['zoneId'])
+            if model is None:
+                continue
+            capacity = self.capacities[zone['zoneId']]
+            zone['forecast'] = []
+            for horizon in self.horizons:
+                count = model.forecast(horizon)
+                zone['forecast'].append({
+                    'horizonMinutes': horizon // 60,
+                    'peopleCount': round(count, 1),
+                    'alertLevel': get_alert_level(count, capacity),
+                })
+            zone['predictedAlertLevel'] = self.predicted[zone['zoneId']]
+        return zones_data
+
+    def annotate(self, t, zones_data):
+        """update() from the zones_data payload and add the forecast fields to it"""
+        self.update(t, {z['zoneId']: z['peopleCount'] for z in zones_data})
+        return self.describe(zones_data)
@@ -0,0 +1,288 @@
+"""
+Crowd motion field and counter-flow / surge detection from dense optical flow
+
+The heatmap shows where people are, not how they move. Every `every` frames the
+frame is downscaled to FLOW_WIDTH pixels wide, converted to grayscale and
+Farneback optical flow is computed against the previous one. Pixels that move
+(more than NOISE_PX) are pooled into the GRID_SIZE x GRID_SIZE heatmap cells as
+one mean velocity per cell, in full-frame pixels per second.
+
+Each cell keeps a slow baseline of its usual velocity (BASELINE_SECONDS) and
+speed. Once a cell has seen WARMUP_SECONDS of motion it is flagged as
+- counter-flow: people move against the cell's dominant direction
+  (cosine to the baseline at or below REVERSE_COS)
+- surge: speed jumps to SURGE_RATIO times the usual speed and SURGE_SIGMA
+  standard deviations above it
+A two-way corridor has no dominant direction (its baseline averages out), so it
+is not flagged as counter-flow.
+
+At 160 x 90, every second frame, this costs about 2 ms per 720p frame on one CPU
+thread, a few percent of a YOLOv8n pass; stats() reports the measured cost per
+frame and `bench --model` the share of a detection pass.
+
+Usage:
+    python crowd_motion.py bench                           # synthetic corridor with a reversal and a surge
+    python crowd_motion.py bench --video people.mp4 --model yolov8n.pt
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+from heatmap_core import GRID_SIZE
+
+
+FLOW_WIDTH = 160
+FLOW_EVERY = 2            # frames between flow computations
+NOISE_PX = 0.3            # flow below this (downscaled pixels) is not motion
+MIN_MOVING = 0.05         # fraction of a cell's pixels that must move
+MIN_SPEED = 0.02          # frame heights per second
+REVERSE_COS = -0.5
+SURGE_RATIO = 2.0
+SURGE_SIGMA = 3.0
+SMOOTHING_SECONDS = 1.0
+BASELINE_SECONDS = 60.0
+WARMUP_SECONDS = 10.0
+
+
+class CrowdMotion:
+    """
+    Per-cell motion field of one camera
+    update(frame, t) runs on every frame with the video time in seconds; annotate()
+    adds the result to the zones_data payload:
+        'meanSpeed': mean speed of the moving cells, full-frame pixels per second
+        'counterFlow': a cell of the zone moves against its usual direction
+        'surge': a cell of the zone moves much faster than usual
+    """
+
+    def __init__(self, frame_width, frame_height, grid_size=GRID_SIZE, width=FLOW_WIDTH, every=FLOW_EVERY,
+                 min_speed=MIN_SPEED, reverse_cos=REVERSE_COS, surge_ratio=SURGE_RATIO, surge_sigma=SURGE_SIGMA,
+                 smoothing=SMOOTHING_SECONDS, baseline=BASELINE_SECONDS, warmup=WARMUP_SECONDS):
+        self.frame_width, self.frame_height = frame_width, frame_height
+        self.grid_size = grid_size
+        self.size = (width, max(int(round(width * frame_height / frame_width)), grid_size))
+        # Full-frame pixels per downscaled pixel, x and y
+        self.scale = np.array([frame_width / self.size[0], frame_height / self.size[1]], np.float32)
+        self.every = every
+        self.min_speed = min_speed * frame_height
+        self.reverse_cos = reverse_cos
+        self.surge_ratio = surge_ratio
+        self.surge_sigma = surge_sigma
+        self.smoothing = smoothing
+        self.baseline_seconds = baseline
+        self.warmup = warmup
+
+        cells = (grid_size, grid_size)
+        self.velocity = np.zeros(cells + (2,), np.float32)    # smoothed mean velocity of moving pixels
+        self.moving = np.zeros(cells, np.float32)             # smoothed fraction of moving pixels
+        self.baseline = np.zeros(cells + (2,), np.float32)    # usual velocity (dominant direction)
+        self.speed_mean = np.zeros(cells, np.float32)
+        self.speed_var = np.zeros(cells, np.float32)
+        self.observed = np.zeros(cells, np.float32)           # seconds of motion seen
+        self.counter_flow = np.zeros(cells, bool)
+        self.surge = np.zeros(cells, bool)
+
+        self.previous = None
+        self.previous_t = None
+        self.frames = 0
+        self.flows = 0
+        self.flow_time = 0.0
+        self.total_time = 0.0
+        self.events = {'counter_flow': 0, 'surge': 0}
+
+    def update(self, frame, t):
+        started = time.perf_counter()
+        self.frames += 1
+        if (self.frames - 1) % self.every == 0:
+            small = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), self.size, interpolation=cv2.INTER_AREA)
+            # A looping file jumps back in time; the pair across the jump is skipped
+            if self.previous is not None and t > self.previous_t:
+                flow = cv2.calcOpticalFlowFarneback(self.previous, small, None, 0.5, 2, 9, 2, 5, 1.1, 0)
+                self._update_field(flow, t - self.previous_t)
+                self.flows += 1
+                self.flow_time += time.perf_counter() - started
+            self.previous, self.previous_t = small, t
+        self.total_time += time.perf_counter() - started
+
+    def _update_field(self, flow, dt):
+        cells = (self.grid_size, self.grid_size)
+        moving = (cv2.magnitude(flow[..., 0], flow[..., 1]) >= NOISE_PX).astype(np.float32)
+        fraction = cv2.resize(moving, cells, interpolation=cv2.INTER_AREA)
+        summed = cv2.resize(flow * moving[..., None], cells, interpolation=cv2.INTER_AREA)
+        velocity = summed / np.maximum(fraction, 1e-6)[..., None] * (self.scale / dt)
+        active = fraction >= MIN_MOVING
+        velocity[~active] = 0
+
+        weight = 1 - np.exp(-dt / self.smoothing)
+        self.velocity += weight * (velocity - self.velocity)
+        self.moving += weight * (fraction - self.moving)
+        speed = np.linalg.norm(self.velocity, axis=2)
+
+        # Judged against the baseline before this update, so a spike does not raise its own bar
+        base_speed = np.linalg.norm(self.baseline, axis=2)
+        ready = (self.observed >= self.warmup) & (self.moving >= MIN_MOVING) & (speed >= self.min_speed)
+        cosine = (self.velocity * self.baseline).sum(axis=2) / np.maximum(speed * base_speed, 1e-6)
+        counter_flow = ready & (base_speed >= self.min_speed / 2) & (cosine <= self.reverse_cos)
+        surge = ready & (speed >= self.surge_ratio * self.speed_mean) & \
+            (speed >= self.speed_mean + self.surge_sigma * np.sqrt(self.speed_var))
+        self.events['counter_flow'] += int((counter_flow & ~self.counter_flow).sum())
+        self.events['surge'] += int((surge & ~self.surge).sum())
+        self.counter_flow, self.surge = counter_flow, surge
+
+        # Baselines only learn from cells that move now: a running mean over their first
+        # BASELINE_SECONDS of motion, an exponential average after that
+        weight = dt / np.minimum(self.observed[active] + dt, self.baseline_seconds)
+        self.baseline[active] += weight[:, None] * (self.velocity[active] - self.baseline[active])
+        delta = speed[active] - self.speed_mean[active]
+        self.speed_mean[active] += weight * delta
+        self.speed_var[active] = (1 - weight) * (self.speed_var[active] + weight * delta * delta)
+        self.observed[active] += dt
+
+    def _cells(self, zone):
+        # The zone's heatmap cells, as analyze_zones slices them
+        g = self.grid_size
+        return (slice(int(zone['y1'] / self.frame_height * g), int(zone['y2'] / self.frame_height * g)),
+                slice(int(zone['x1'] / self.frame_width * g), int(zone['x2'] / self.frame_width * g)))
+
+    def annotate(self, zones_data, zones):
+        """Add per-zone motion fields to zones_data"""
+        speed = np.linalg.norm(self.velocity, axis=2)
+        for zone in zones_data:
+            cells = self._cells(zones[zone['zoneId']])
+            moving = self.moving[cells] >= MIN_MOVING
+            zone['meanSpeed'] = round(float(speed[cells][moving].mean()), 1) if moving.any() else 0.0
+            zone['counterFlow'] = bool(self.counter_flow[cells].any())
+            zone['surge'] = bool(self.surge[cells].any())
+        return zones_data
+
+    def draw(self, frame):
+        cell_w, cell_h = self.frame_width / self.grid_size, self.frame_height / self.grid_size
+        # Arrows show half a second of movement, at most one cell long
+        length = 0.5 * np.linalg.norm(self.velocity, axis=2)
+        limit = np.minimum(1.0, min(cell_w, cell_h) / np.maximum(length, 1e-6))
+        for row, col in zip(*np.nonzero(self.moving >= MIN_MOVING)):
+            x, y = (col + 0.5) * cell_w, (row + 0.5) * cell_h
+            dx, dy = 0.5 * self.velocity[row, col] * limit[row, col]
+            color = (0, 0, 255) if self.counter_flow[row, col] else (0, 165, 255) if self.surge[row, col] \
+                else (0, 255, 0)
+            cv2.arrowedLine(frame, (int(x), int(y)), (int(x + dx), int(y + dy)), color, 2, tipLength=0.3)
+            if self.counter_flow[row, col] or self.surge[row, col]:
+                cv2.rectangle(frame, (int(col * cell_w), int(row * cell_h)),
+                              (int((col + 1) * cell_w), int((row + 1) * cell_h)), color, 2)
+        return frame
+
+    def stats(self):
+        return {'flow_ms': round(1000 * self.flow_time / self.flows, 3) if self.flows else 0.0,
+                'per_frame_ms': round(1000 * self.total_time / self.frames, 3) if self.frames else 0.0,
+                'counter_flow_cells': int(self.counter_flow.sum()), 'surge_cells': int(self.surge.sum()),
+                **{f'{k}_events': v for k, v in self.events.items()}}
+
+
+def synthetic_corridor(seconds=45, fps=30, size=(1280, 720), people=150, speed=90.0, reverse_at=20.0,
+                       surge_at=35.0, seed=0):
+    """
+    Frames of textured people walking right along a corridor
+    From reverse_at the upper half walks left (counter-flow) for 8 s; from surge_at
+    the lower half runs at four times the speed for 5 s.
+    Yields (t, frame).
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = rng.integers(40, 120, (height, width, 3), dtype=np.uint8)
+    background = cv2.GaussianBlur(background, (5, 5), 0)
+    patches = rng.integers(0, 256, (people, 60, 30, 3), dtype=np.uint8)
+    x = rng.uniform(0, width, people)
+    y = rng.uniform(200, height - 140, people).astype(int)
+    upper = y < (200 + height - 140) / 2
+
+    for k in range(int(seconds * fps)):
+        t = k / fps
+        velocity = np.full(people, speed)
+        if reverse_at <= t < reverse_at + 8:
+            velocity[upper] = -speed
+        if surge_at <= t < surge_at + 5:
+            velocity[~upper] = 4 * speed
+        x = (x + velocity / fps) % (width - 30)
+        frame = background.copy()
+        for i in range(people):
+            xi = int(x[i])
+            frame[y[i]:y[i] + 60, xi:xi + 30] = patches[i]
+        yield t, frame
+
+
+def bench(args):
+    detect = None
+    if args.model:
+        try:
+            from ultralytics import YOLO
+            model = YOLO(args.model)
+            detect = lambda frame: model.predict(frame, conf=0.5, classes=[0], verbose=False)
+        except ImportError:
+            print("ultralytics not installed; detection is not timed")
+
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        def frames():
+            k = 0
+            while k < args.frames:
+                ok, frame = cap.read()
+                if not ok:
+                    return
+                yield k / fps, frame
+                k += 1
+        source = frames()
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    else:
+        source = synthetic_corridor(seed=args.seed)
+        size = (1280, 720)
+
+    motion = CrowdMotion(*size, every=args.every, width=args.width)
+    detect_time, detected = 0.0, 0
+    timeline = []
+    for t, frame in source:
+        motion.update(frame, t)
+        if detect is not None and detected < args.detect_frames:
+            started = time.perf_counter()
+            detect(frame)
+            detect_time += time.perf_counter() - started
+            detected += 1
+        timeline.append((t, motion.counter_flow.copy(), motion.surge.copy()))
+
+    report = {'frames': motion.frames, 'flow_size': list(motion.size), 'every': motion.every, **motion.stats()}
+    if detected:
+        report['detect_ms'] = round(1000 * detect_time / detected, 3)
+        report['share_of_detection'] = round(report['per_frame_ms'] / report['detect_ms'], 4)
+
+    if not args.video:
+        # When the planted events were caught, and flags raised outside them
+        half = motion.grid_size // 2
+        first = lambda rows, grid_of, start, end: next(
+            (round(t - start, 2) for t, *g in timeline if start <= t < end and grid_of(g)[rows].any()), None)
+        report['counter_flow_detected_after_s'] = first(slice(0, half), lambda g: g[0], 20.0, 28.0)
+        report['surge_detected_after_s'] = first(slice(half, None), lambda g: g[1], 35.0, 40.0)
+        report['flagged_frames_before_events'] = sum(
+            1 for t, counter, surge in timeline if t < 20.0 and (counter.any() or surge.any()))
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crowd motion field benchmark')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('bench', help='flow cost per frame, against YOLO when --model is given')
+    p.add_argument('--video', help='video file; a synthetic corridor with planted events by default')
+    p.add_argument('--frames', type=int, default=600)
+    p.add_argument('--model', help='YOLO weights to time one detection pass against')
+    p.add_argument('--detect-frames', type=int, default=50)
+    p.add_argument('--every', type=int, default=FLOW_EVERY)
+    p.add_argument('--width', type=int, default=FLOW_WIDTH)
+    p.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    bench(args)
+
+
+if __name__ == '__main__':
+    main()
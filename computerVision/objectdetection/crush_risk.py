@@ -0,0 +1,247 @@
+"""
+Local crowd density and crush-risk clusters
+
+A zone's density (people / zone area) averages over the whole rectangle and hides
+a tight knot of people, e.g. pressed against the darshan rail. Here every person
+gets their own density: the people standing within radius_m of their feet,
+divided by the circle's area. People above the crush threshold that stand within
+the radius of each other form a cluster; clusters of min_people or more are
+reported.
+
+Neighbours are found through a uniform hash grid of radius-sized cells. Each
+point is only compared with the points of the 3x3 cells around its own, so the
+cost grows with people x local crowding instead of people squared. Everything is
+vectorized (sort + searchsorted per neighbour cell offset).
+
+Distances are in metres when a floor-plan calibration is given (floor_plan.CameraView).
+Without one, each person's radius in pixels is scaled from their box height
+(PERSON_HEIGHT_M tall), which follows the perspective well enough for this.
+
+Usage:
+    python crush_risk.py bench --people 500,1000,2000
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+RADIUS_M = 1.0
+CRUSH_DENSITY = 5.0       # people per m2; above 5 people/m2 a crowd can no longer move freely
+MIN_CLUSTER = 4
+PERSON_HEIGHT_M = 1.7
+RADIUS_PERCENTILE = 90    # hash grid cells are this percentile of the search radii
+MAX_RINGS = 3             # points needing more rings of cells than this are checked against all points
+
+
+def neighbour_pairs(points, radius):
+    """
+    Pairs (i, j), i != j, with |p_i - p_j| <= radius (scalar, or one radius per point
+    measured from i), found through a hash grid. Cells are sized to a typical radius
+    (RADIUS_PERCENTILE), so one person close to the camera does not make every cell
+    frame-sized: a point with a larger radius searches ceil(radius / cell) rings of
+    cells, and the few beyond MAX_RINGS are compared with every point directly.
+    """
+    points = np.asarray(points, np.float64).reshape(-1, 2)
+    n = len(points)
+    radius = np.broadcast_to(np.asarray(radius, np.float64), (n,))
+    if n < 2:
+        return np.zeros(0, int), np.zeros(0, int)
+
+    cell = max(float(np.percentile(radius, RADIUS_PERCENTILE)), 1e-9)
+    rings = np.maximum(np.ceil(radius / cell - 1e-9).astype(int), 1)
+    pad = int(min(rings.max(), MAX_RINGS))
+    cells = np.floor((points - points.min(axis=0)) / cell).astype(np.int64)
+    # One key per cell; the padding leaves room for the ring offsets at the edges
+    height = int(cells[:, 1].max()) + 2 * pad + 1
+    keys = (cells[:, 0] + pad) * height + (cells[:, 1] + pad)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    first, second = [np.zeros(0, int)], [np.zeros(0, int)]
+    for k in range(1, pad + 1):
+        group = np.flatnonzero(rings == k)
+        if len(group) == 0:
+            continue
+        for dx in range(-k, k + 1):
+            for dy in range(-k, k + 1):
+                target = keys[group] + dx * height + dy
+                start = np.searchsorted(sorted_keys, target, 'left')
+                counts = np.searchsorted(sorted_keys, target, 'right') - start
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                i = np.repeat(group, counts)
+                within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                j = order[np.repeat(start, counts) + within]
+                d2 = ((points[i] - points[j]) ** 2).sum(axis=1)
+                keep = (i != j) & (d2 <= radius[i] ** 2)
+                first.append(i[keep])
+                second.append(j[keep])
+
+    far = np.flatnonzero(rings > MAX_RINGS)
+    for chunk in range(0, len(far), 256):
+        rows = far[chunk:chunk + 256]
+        d2 = ((points[rows, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+        i, j = np.nonzero(d2 <= radius[rows, None] ** 2)
+        i = rows[i]
+        first.append(i[i != j])
+        second.append(j[i != j])
+    return np.concatenate(first), np.concatenate(second)
+
+
+def all_pairs_neighbours(points, radius):
+    """Reference neighbour counts from the full distance matrix (benchmark only)"""
+    points = np.asarray(points, np.float64)
+    d2 = ((points[:, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+    radius = np.broadcast_to(np.asarray(radius, np.float64), (len(points),))
+    return (d2 <= radius[:, None] ** 2).sum(axis=1) - 1
+
+
+class CrushRisk:
+    """
+    Per-person local density and crush-risk clusters for one camera
+    analyze(boxes) runs once per frame on the tracked boxes; annotate() adds the
+    result to the zones_data payload:
+        'peakLocalDensity': highest people/m2 of anyone in the zone
+        'crushRisk': a cluster reaches into the zone
+        'crushClusters': [{'x': 640, 'y': 410, 'people': 9, 'density': 6.4}, ...]
+    """
+
+    def __init__(self, radius_m=RADIUS_M, threshold=CRUSH_DENSITY, min_people=MIN_CLUSTER, view=None):
+        self.radius_m = radius_m
+        self.threshold = threshold
+        self.min_people = min_people
+        self.view = view
+        self.area = np.pi * radius_m * radius_m
+
+        self.feet = np.zeros((0, 2))
+        self.centres = np.zeros((0, 2))
+        self.density = np.zeros(0)
+        self.clusters = []
+        self.labels = np.zeros(0, int)        # cluster index per person, -1 when not in one
+        self.analyze_time = 0.0
+        self.frames = 0
+
+    def analyze(self, boxes):
+        started = time.perf_counter()
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        n = len(boxes)
+        self.feet = np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]])
+        self.centres = np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2])
+
+        if self.view is not None:
+            points, radius = self.view.to_floor(self.feet), self.radius_m
+        else:
+            points = self.feet
+            radius = self.radius_m * np.maximum(boxes[:, 3] - boxes[:, 1], 1.0) / PERSON_HEIGHT_M
+        i, j = neighbour_pairs(points, radius)
+        self.density = (np.bincount(i, minlength=n) + 1) / self.area
+
+        # Clusters: connected people who are both above the threshold
+        crowded = self.density >= self.threshold
+        self.labels = np.full(n, -1)
+        self.clusters = []
+        if crowded.sum() >= self.min_people:
+            both = crowded[i] & crowded[j]
+            graph = coo_matrix((np.ones(both.sum()), (i[both], j[both])), shape=(n, n))
+            _, components = connected_components(graph, directed=False)
+            sizes = np.bincount(components[crowded], minlength=components.max() + 1)
+            for label in np.flatnonzero(sizes >= self.min_people):
+                members = np.flatnonzero(crowded & (components == label))
+                self.labels[members] = len(self.clusters)
+                x, y = self.feet[members].mean(axis=0)
+                self.clusters.append({'x': int(x), 'y': int(y), 'people': int(len(members)),
+                                      'density': round(float(self.density[members].max()), 2)})
+
+        self.analyze_time += time.perf_counter() - started
+        self.frames += 1
+        return self.clusters
+
+    def annotate(self, zones_data, zones):
+        """Add per-zone local density and crush-risk fields; people belong to zones as in analyze_zones"""
+        zone_of = np.full(len(self.centres), -1)
+        zone_ids = list(zones)
+        for k, zone_id in reversed(list(enumerate(zone_ids))):
+            zone = zones[zone_id]
+            x, y = self.centres[:, 0].astype(int), self.centres[:, 1].astype(int)
+            inside = (x >= zone['x1']) & (x <= zone['x2']) & (y >= zone['y1']) & (y <= zone['y2'])
+            zone_of[inside] = k          # the first matching zone wins, as in analyze_zones
+
+        for zone in zones_data:
+            members = zone_of == zone_ids.index(zone['zoneId'])
+            clusters = sorted(set(self.labels[members & (self.labels >= 0)].tolist()))
+            zone['peakLocalDensity'] = round(float(self.density[members].max()), 2) if members.any() else 0.0
+            zone['crushRisk'] = bool(clusters)
+            zone['crushClusters'] = [self.clusters[c] for c in clusters]
+        return zones_data
+
+    def draw(self, frame):
+        for cluster in self.clusters:
+            cv2.circle(frame, (cluster['x'], cluster['y']), 40, (0, 0, 255), 3)
+            cv2.putText(frame, f"CRUSH {cluster['density']:.1f}/m2 ({cluster['people']})",
+                        (cluster['x'] - 60, cluster['y'] - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        return frame
+
+    def stats(self):
+        return {'clusters': len(self.clusters),
+                'peak_density': round(float(self.density.max()), 2) if len(self.density) else 0.0,
+                'analyze_ms': round(1000 * self.analyze_time / self.frames, 3) if self.frames else 0.0}
+
+
+def bench(args):
+    rng = np.random.default_rng(args.seed)
+    report = []
+    for people in [int(p) for p in args.people.split(',')]:
+        # A loose crowd over a 40 x 25 m floor plus one tight knot at a rail
+        points = rng.uniform([0, 0], [40, 25], (people, 2))
+        knot = min(people // 10, 60)
+        points[:knot] = rng.normal([20, 2], 0.6, (knot, 2))
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            i, _ = neighbour_pairs(points, RADIUS_M)
+        grid_ms = (time.perf_counter() - started) * 1000 / args.repeat
+        counts = np.bincount(i, minlength=people)
+
+        started = time.perf_counter()
+        reference = all_pairs_neighbours(points, RADIUS_M)
+        all_pairs_ms = (time.perf_counter() - started) * 1000
+
+        density = (counts + 1) / (np.pi * RADIUS_M ** 2)
+
+        # Uncalibrated path: pixel radii from box heights, plus one 700 px box close to the camera
+        pixels = points * 40
+        radius = RADIUS_M * rng.uniform(60, 140, people) / PERSON_HEIGHT_M
+        radius[-1] = RADIUS_M * 700 / PERSON_HEIGHT_M
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            near, _ = neighbour_pairs(pixels, radius)
+        near_box_ms = (time.perf_counter() - started) * 1000 / args.repeat
+        near_counts = np.bincount(near, minlength=people)
+
+        report.append({'people': people, 'hash_grid_ms': round(grid_ms, 3), 'all_pairs_ms': round(all_pairs_ms, 3),
+                       'near_box_ms': round(near_box_ms, 3),
+                       'same_counts': bool(np.array_equal(counts, reference)
+                                           and np.array_equal(near_counts, all_pairs_neighbours(pixels, radius))),
+                       'above_threshold': int((density >= CRUSH_DENSITY).sum())})
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local density / crush-risk benchmark')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('bench', help='hash grid against the all-pairs distance matrix')
+    p.add_argument('--people', default='100,500,1000,2000')
+    p.add_argument('--repeat', type=int, default=20)
+    p.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    bench(args)
+
+
+if __name__ == '__main__':
+    main()
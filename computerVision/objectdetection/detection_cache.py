@@ -0,0 +1,219 @@
+"""
+Persistent per-frame detection cache for replayed videos
+
+Looping a demo video or re-running a file while tuning zones and thresholds runs
+YOLO on frames it has already seen. Detections are stored per video, keyed by
+a fingerprint of the file's content, the model file and the inference settings,
+so a replay reads its boxes from disk and only decodes frames.
+
+Detections are kept down to CACHE_CONF, below every tracker's threshold, so
+raising the detection or tracking threshold still hits the cache.
+
+Each entry is one .npz: boxes (float32 xyxy), confidences and classes of all
+frames concatenated, with per-frame offsets and a mask of the frames present.
+The cache directory is kept under max_bytes by evicting the least recently used
+entries (the file time is bumped whenever an entry is opened).
+
+Usage:
+    python detection_cache.py cache/            # list entries, oldest first
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+
+CACHE_CONF = 0.1
+SAMPLE_BYTES = 1 << 20
+SAVE_EVERY = 500          # new frames between saves, so a crash loses little
+
+
+def fingerprint(path):
+    """Content hash of a large file from its size and three 1 MB samples"""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        for offset in (0, max(0, size // 2 - SAMPLE_BYTES // 2), max(0, size - SAMPLE_BYTES)):
+            f.seek(offset)
+            digest.update(f.read(SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def cache_key(video_path, model_path, settings):
+    # Model weights downloaded by name (yolov8n.pt) are identified by name only
+    model = fingerprint(model_path) if os.path.exists(model_path) else os.path.basename(model_path)
+    description = {'video': fingerprint(video_path), 'model': model, **settings}
+    return hashlib.sha1(json.dumps(description, sort_keys=True).encode()).hexdigest()[:24]
+
+
+def _empty():
+    return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, int)
+
+
+class VideoDetections:
+    """
+    Detections of one video under one model and settings
+    get(frame_index) returns (boxes, confidences, classes), or None when the frame
+    has not been detected yet; put() records a frame for the next save.
+    """
+
+    def __init__(self, cache, path, conf):
+        self.cache = cache
+        self.path = path
+        self.conf = conf
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+
+        if os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    self.offsets = data['offsets']
+                    self.present = data['present']
+                    self.boxes = data['boxes']
+                    self.confidences = data['confidences']
+                    self.classes = data['classes']
+                return
+            except (OSError, ValueError, KeyError):
+                print(f"Detection cache entry unreadable, starting over: {path}")
+        self.offsets = np.zeros(1, np.int64)
+        self.present = np.zeros(0, bool)
+        self.boxes, self.confidences, self.classes = _empty()
+
+    def __len__(self):
+        return int(self.present.sum()) + len(self._pending)
+
+    def get(self, frame_index):
+        if frame_index < len(self.present) and self.present[frame_index]:
+            lo, hi = self.offsets[frame_index], self.offsets[frame_index + 1]
+            self.hits += 1
+            return self.boxes[lo:hi], self.confidences[lo:hi].astype(np.float32), self.classes[lo:hi].astype(int)
+        if frame_index in self._pending:
+            self.hits += 1
+            return self._pending[frame_index]
+        self.misses += 1
+        return None
+
+    def put(self, frame_index, boxes, confidences, classes):
+        if frame_index < len(self.present) and self.present[frame_index]:
+            return
+        self._pending[frame_index] = (np.asarray(boxes, np.float32).reshape(-1, 4),
+                                      np.asarray(confidences, np.float32), np.asarray(classes, int))
+        if len(self._pending) >= SAVE_EVERY:
+            self.save()
+
+    def save(self):
+        """Merge new frames into the arrays and rewrite the entry atomically"""
+        if not self._pending:
+            return
+        frames = max(len(self.present), max(self._pending) + 1)
+        present = np.zeros(frames, bool)
+        present[:len(self.present)] = self.present
+        counts = np.zeros(frames, np.int64)
+        counts[:len(self.present)] = np.diff(self.offsets)
+        for index, (boxes, _, _) in self._pending.items():
+            present[index] = True
+            counts[index] = len(boxes)
+
+        offsets = np.zeros(frames + 1, np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        boxes = np.zeros((offsets[-1], 4), np.float32)
+        confidences = np.zeros(offsets[-1], np.float16)
+        classes = np.zeros(offsets[-1], np.int16)
+
+        # Existing rows shift by how many new rows were inserted before their frame
+        frame_of_row = np.repeat(np.arange(len(self.present)), np.diff(self.offsets))
+        rows = offsets[frame_of_row] + np.arange(len(frame_of_row)) - self.offsets[frame_of_row]
+        boxes[rows] = self.boxes
+        confidences[rows] = self.confidences
+        classes[rows] = self.classes
+        for index, (b, c, k) in self._pending.items():
+            boxes[offsets[index]:offsets[index + 1]] = b
+            confidences[offsets[index]:offsets[index + 1]] = c
+            classes[offsets[index]:offsets[index + 1]] = k
+
+        temporary = self.path + '.tmp.npz'
+        np.savez(temporary, offsets=offsets, present=present, boxes=boxes, confidences=confidences,
+                 classes=classes)
+        os.replace(temporary, self.path)
+        self.offsets, self.present = offsets, present
+        self.boxes, self.confidences, self.classes = boxes, confidences, classes
+        self._pending = {}
+        self.cache.evict(keep=self.path)
+
+    def close(self):
+        self.save()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'cached_frames': len(self), 'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0}
+
+
+class DetectionCache:
+    """Directory of VideoDetections entries, kept under max_bytes by LRU eviction"""
+
+    def __init__(self, directory, max_bytes=2 << 30, conf=CACHE_CONF):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.conf = conf
+        os.makedirs(directory, exist_ok=True)
+
+    def open(self, video_path, model_path, **settings):
+        """Entry for a video file; settings are whatever else changes the detections (classes, resize)"""
+        key = cache_key(video_path, model_path, {'conf': self.conf, **settings})
+        path = os.path.join(self.directory, f'{key}.npz')
+        if os.path.exists(path):
+            os.utime(path)
+        return VideoDetections(self, path, self.conf)
+
+    def entries(self):
+        """[(path, bytes, last used)] oldest first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz') and not name.endswith('.tmp.npz'):
+                path = os.path.join(self.directory, name)
+                st = os.stat(path)
+                entries.append((path, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda e: e[2])
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
+
+
+def open_from_env(video_path, model_path, **settings):
+    """Entry for video_path when DETECTION_CACHE names a cache directory (size limit DETECTION_CACHE_GB)"""
+    directory = os.environ.get('DETECTION_CACHE')
+    if not directory:
+        return None
+    max_bytes = int(float(os.environ.get('DETECTION_CACHE_GB', 2)) * (1 << 30))
+    return DetectionCache(directory, max_bytes=max_bytes).open(video_path, model_path, **settings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List a detection cache directory')
+    parser.add_argument('directory')
+    args = parser.parse_args()
+
+    cache = DetectionCache(args.directory)
+    entries = cache.entries()
+    for path, size, used in entries:
+        with np.load(path) as data:
+            frames = int(data['present'].sum())
+        print(f"{os.path.basename(path)}  {size / 1e6:8.1f} MB  {frames:7d} frames  "
+              f"last used {time.strftime('%Y-%m-%d %H:%M', time.localtime(used))}")
+    print(f"{len(entries)} entries, {sum(e[1] for e in entries) / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
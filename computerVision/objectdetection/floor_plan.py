@@ -0,0 +1,291 @@
+"""
+Site-wide floor-plan density from several calibrated cameras
+
+Each camera's grid (analyze_zones) is in image coordinates: a person near the
+camera covers many more cells than one at the back, and where two views overlap
+the same person is counted twice. Here every camera gets a homography from
+image pixels to a shared metric floor plan (calibrated from four or more floor
+points visible in the frame). Each frame, the foot points (bottom centre of the
+boxes) of one camera are projected with a single cv2.perspectiveTransform call
+and binned into floor cells.
+
+Overlaps are resolved once, at load time: every floor cell is owned by the camera
+that sees it with the most pixels per square metre, and a camera's people only
+count in the cells it owns. Per frame the fusion is one transform and one
+bincount per camera, so a dozen cameras cost well under a millisecond.
+
+floorplan.json (points in the pixels of the frames the detector sees, i.e. after resize):
+    {"width_m": 40, "height_m": 25, "cell_m": 1.0,
+     "cameras": {"main-hall": {"frame_size": [1280, 720],
+                               "image_points": [[102, 700], [1190, 690], [900, 260], [350, 255]],
+                               "floor_points": [[2, 3], [14, 3], [14, 18], [2, 18]]}}}
+
+Usage:
+    python floor_plan.py check floorplan.json --image ownership.png
+    python floor_plan.py bench --cameras 12 --people 400
+"""
+import argparse
+import json
+import time
+
+import cv2
+import numpy as np
+
+
+class CameraView:
+    """Homography of one camera from image pixels to floor metres"""
+
+    def __init__(self, camera_id, image_points, floor_points, frame_size):
+        self.camera_id = camera_id
+        self.frame_size = tuple(frame_size)
+        self.image_points = np.asarray(image_points, np.float32)
+        self.floor_points = np.asarray(floor_points, np.float32)
+        if len(self.image_points) < 4 or len(self.image_points) != len(self.floor_points):
+            raise ValueError(f'{camera_id}: need at least 4 matching image/floor points')
+        self.homography, _ = cv2.findHomography(self.image_points, self.floor_points)
+        if self.homography is None:
+            raise ValueError(f'{camera_id}: calibration points are degenerate')
+        self.inverse = np.linalg.inv(self.homography)
+
+    def to_floor(self, points):
+        """(n, 2) image points to floor metres"""
+        if len(points) == 0:
+            return np.zeros((0, 2), np.float32)
+        return cv2.perspectiveTransform(np.asarray(points, np.float32).reshape(-1, 1, 2), self.homography).reshape(-1, 2)
+
+    def to_image(self, points):
+        """(n, 2) floor points to image pixels, with a mask of points in front of the camera"""
+        points = np.asarray(points, np.float64).reshape(-1, 2)
+        projected = np.column_stack([points, np.ones(len(points))]) @ self.inverse.T
+        in_front = projected[:, 2] > 1e-9
+        return projected[:, :2] / np.where(in_front, projected[:, 2], 1.0)[:, None], in_front
+
+    def reprojection_error(self):
+        """Mean calibration error in metres"""
+        return float(np.linalg.norm(self.to_floor(self.image_points) - self.floor_points, axis=1).mean())
+
+
+def foot_points(boxes):
+    """Bottom centre of xyxy boxes, where a person stands"""
+    boxes = np.asarray(boxes, np.float32).reshape(-1, 4)
+    return np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]])
+
+
+class FloorPlan:
+    """
+    Floor grid of cell_m x cell_m cells fusing the latest detections of every camera
+    update(camera_id, boxes) replaces that camera's contribution; density() is the
+    site-wide people per square metre.
+    """
+
+    def __init__(self, width_m, height_m, cameras, cell_m=1.0):
+        self.width_m = width_m
+        self.height_m = height_m
+        self.cell_m = cell_m
+        self.cols = int(np.ceil(width_m / cell_m))
+        self.rows = int(np.ceil(height_m / cell_m))
+        self.cameras = {view.camera_id: view for view in cameras}
+        self.index = {camera_id: i for i, camera_id in enumerate(self.cameras)}
+
+        self.owner = self._ownership()
+        self.counts = np.zeros((len(self.cameras), self.rows, self.cols), np.float32)
+        self.updated = np.zeros(len(self.cameras))
+        self.seen = np.zeros(len(self.cameras), int)       # people projected into the plan, per camera
+        self.kept = np.zeros(len(self.cameras), int)       # of those, in cells the camera owns
+        self.update_time = 0.0
+        self.updates = 0
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            config = json.load(f)
+        cameras = [CameraView(camera_id, c['image_points'], c['floor_points'], c['frame_size'])
+                   for camera_id, c in config['cameras'].items()]
+        return cls(config['width_m'], config['height_m'], cameras, cell_m=config.get('cell_m', 1.0))
+
+    def _ownership(self):
+        """Camera index owning each cell (-1 where no camera sees it), by pixels per square metre"""
+        xs = np.arange(self.cols + 1) * self.cell_m
+        ys = np.arange(self.rows + 1) * self.cell_m
+        corners = np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2)
+        best = np.zeros((self.rows, self.cols))
+        owner = np.full((self.rows, self.cols), -1, np.int16)
+
+        for i, view in enumerate(self.cameras.values()):
+            image, in_front = view.to_image(corners)
+            image = image.reshape(self.rows + 1, self.cols + 1, 2)
+            in_front = in_front.reshape(self.rows + 1, self.cols + 1)
+            # Cell quad in the image: top-left, top-right, bottom-right, bottom-left
+            quad = [image[:-1, :-1], image[:-1, 1:], image[1:, 1:], image[1:, :-1]]
+            area = 0.5 * np.abs(sum(a[..., 0] * b[..., 1] - b[..., 0] * a[..., 1]
+                                    for a, b in zip(quad, quad[1:] + quad[:1])))
+            centre = sum(quad) / 4
+            width, height = view.frame_size
+            visible = (in_front[:-1, :-1] & in_front[:-1, 1:] & in_front[1:, 1:] & in_front[1:, :-1]
+                       & (centre[..., 0] >= 0) & (centre[..., 0] < width)
+                       & (centre[..., 1] >= 0) & (centre[..., 1] < height))
+            better = visible & (area > best)
+            owner[better] = i
+            best[better] = area[better]
+        return owner
+
+    def update(self, camera_id, boxes, t=None):
+        """Replace camera_id's people with these detections (xyxy in its frame); returns how many count"""
+        started = time.perf_counter()
+        i = self.index[camera_id]
+        floor = self.cameras[camera_id].to_floor(foot_points(boxes))
+        col = np.floor(floor[:, 0] / self.cell_m).astype(int)
+        row = np.floor(floor[:, 1] / self.cell_m).astype(int)
+        inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        col, row = col[inside], row[inside]
+        owned = self.owner[row, col] == i
+        cells = row[owned] * self.cols + col[owned]
+        self.counts[i] = np.bincount(cells, minlength=self.rows * self.cols).reshape(self.rows, self.cols)
+
+        self.updated[i] = time.time() if t is None else t
+        self.seen[i] += len(row)
+        self.kept[i] += len(cells)
+        self.update_time += time.perf_counter() - started
+        self.updates += 1
+        return len(cells)
+
+    def people(self, now=None, max_age=None):
+        """Fused people per cell; cameras not updated within max_age seconds are left out"""
+        if max_age is None:
+            return self.counts.sum(axis=0)
+        now = time.time() if now is None else now
+        fresh = now - self.updated <= max_age
+        return self.counts[fresh].sum(axis=0)
+
+    def density(self, now=None, max_age=None):
+        """People per square metre per cell"""
+        return self.people(now, max_age) / (self.cell_m * self.cell_m)
+
+    def total(self, now=None, max_age=None):
+        return int(self.people(now, max_age).sum())
+
+    def render(self, max_density=4.0, pixels_per_m=20):
+        """Colour image of the density (4 people/m2 is full red), with camera ownership borders"""
+        density = np.clip(self.density() / max_density, 0, 1)
+        image = cv2.applyColorMap((density * 255).astype(np.uint8), cv2.COLORMAP_JET)
+        image[self.owner < 0] = (40, 40, 40)
+        size = (int(self.cols * self.cell_m * pixels_per_m), int(self.rows * self.cell_m * pixels_per_m))
+        image = cv2.resize(image, size, interpolation=cv2.INTER_NEAREST)
+        owner = cv2.resize(self.owner.astype(np.float32), size, interpolation=cv2.INTER_NEAREST)
+        edges = (np.abs(np.diff(owner, axis=0, prepend=owner[:1])) + np.abs(np.diff(owner, axis=1, prepend=owner[:, :1]))) > 0
+        image[edges] = (255, 255, 255)
+        return image
+
+    def stats(self):
+        covered = self.owner >= 0
+        return {
+            'cameras': len(self.cameras),
+            'coverage': round(float(covered.mean()), 3),
+            'people': self.total(),
+            'peak_density': round(float(self.density().max()), 2),
+            # Share of projected people dropped because another camera owns their cell
+            'overlap_dropped': round(float(1 - self.kept.sum() / self.seen.sum()), 3) if self.seen.sum() else 0.0,
+            'fuse_us': round(1e6 * self.update_time / self.updates, 1) if self.updates else 0.0,
+        }
+
+
+def synthetic_site(cameras, width_m, height_m, frame_size=(1280, 720)):
+    """Cameras in a row along the site, each looking down a strip with perspective and overlapping its neighbours"""
+    width, height = frame_size
+    image_corners = np.float32([[0, height], [width, height], [width, 0], [0, 0]])
+    views = []
+    columns = int(np.ceil(cameras / 2))
+    strip = width_m / columns
+    for k in range(cameras):
+        x0 = (k % columns) * strip
+        near, far = (0.5, height_m * 0.6) if k < columns else (height_m - 0.5, height_m * 0.4)
+        # Far edge wider than the near edge, and 30% wider than the strip for overlap
+        floor = np.float32([[x0 + 0.2 * strip, near], [x0 + 0.8 * strip, near],
+                            [x0 + 1.3 * strip, far], [x0 - 0.3 * strip, far]])
+        views.append(CameraView(f'cam-{k:02d}', image_corners, floor, frame_size))
+    return views
+
+
+def bench(args):
+    rng = np.random.default_rng(args.seed)
+    views = synthetic_site(args.cameras, args.width, args.height)
+    plan = FloorPlan(args.width, args.height, views, cell_m=args.cell)
+
+    round_ms = []
+    naive_totals = []
+    fused_totals = []
+    truth_totals = []
+    for _ in range(args.frames):
+        people = rng.uniform([0, 0], [args.width, args.height], (args.people, 2))
+        per_camera = []
+        for view in views:
+            feet, in_front = view.to_image(people)
+            width, height = view.frame_size
+            visible = in_front & (feet[:, 0] >= 0) & (feet[:, 0] < width) & (feet[:, 1] >= 0) & (feet[:, 1] < height)
+            feet = feet[visible] + rng.normal(0, 2, (visible.sum(), 2))
+            boxes = np.column_stack([feet[:, 0] - 20, feet[:, 1] - 100, feet[:, 0] + 20, feet[:, 1]])
+            per_camera.append(boxes)
+
+        started = time.perf_counter()
+        for view, boxes in zip(views, per_camera):
+            plan.update(view.camera_id, boxes)
+        density = plan.density()
+        round_ms.append((time.perf_counter() - started) * 1000)
+
+        naive_totals.append(sum(len(b) for b in per_camera))
+        fused_totals.append(density.sum() * args.cell * args.cell)
+        covered = plan.owner[np.minimum((people[:, 1] / args.cell).astype(int), plan.rows - 1),
+                             np.minimum((people[:, 0] / args.cell).astype(int), plan.cols - 1)] >= 0
+        truth_totals.append(covered.sum())
+
+    truth = np.mean(truth_totals)
+    report = {
+        'cameras': args.cameras,
+        'people': args.people,
+        'fusion_ms_per_round': round(float(np.mean(round_ms)), 3),
+        'fusion_p95_ms': round(float(np.percentile(round_ms, 95)), 3),
+        'coverage': plan.stats()['coverage'],
+        'people_in_view': round(float(truth), 1),
+        'fused_count': round(float(np.mean(fused_totals)), 1),
+        'naive_sum_count': round(float(np.mean(naive_totals)), 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+def check(args):
+    plan = FloorPlan.from_file(args.config)
+    for camera_id, view in plan.cameras.items():
+        cells = int((plan.owner == plan.index[camera_id]).sum())
+        print(f"{camera_id}: reprojection error {view.reprojection_error():.2f} m, owns {cells} cells")
+    print(plan.stats())
+    if args.image:
+        cv2.imwrite(args.image, plan.render())
+        print(f"Ownership map written to {args.image}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Floor-plan calibration check and fusion benchmark')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('check', help='calibration error and camera coverage of a floorplan.json')
+    p.add_argument('config')
+    p.add_argument('--image', help='write the ownership map here')
+
+    p = sub.add_parser('bench', help='fusion cost and de-duplication on a synthetic site')
+    p.add_argument('--cameras', type=int, default=12)
+    p.add_argument('--people', type=int, default=400)
+    p.add_argument('--width', type=float, default=60)
+    p.add_argument('--height', type=float, default=30)
+    p.add_argument('--cell', type=float, default=1.0)
+    p.add_argument('--frames', type=int, default=200)
+    p.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == 'check':
+        check(args)
+    else:
+        bench(args)
+
+
+if __name__ == '__main__':
+    main()
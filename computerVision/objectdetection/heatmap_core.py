@@ -0,0 +1,303 @@
+import math
+import cv2
+import numpy as np
+import requests
+from datetime import datetime
+
+
+# Configuration
+BACKEND_URL = "http://localhost:5000/api/crowd/heatmap"
+SEND_INTERVAL = 5  # Send heatmap data every 5 seconds
+GRID_SIZE = 20  # Grid cells for heatmap (20x20)
+CAMERA_ID = "camera-1"  # Identifies this camera's heatmap on the backend
+
+# When to report, per zone (see ReportPolicy): immediately when the alert level rises or
+# the count moves by count_delta, otherwise a heartbeat every heartbeat seconds
+REPORT_POLICY = {
+    'default': {'count_delta': 5, 'heartbeat': 60},
+    'queue': {'count_delta': 3, 'heartbeat': 30},
+    'darshan': {'count_delta': 3, 'heartbeat': 30},
+}
+MIN_REPORT_INTERVAL = 1.0  # Never report more often than this (seconds)
+COUNT_SMOOTHING = 5.0  # Time constant (seconds) of the count compared against count_delta
+LEVEL_RISE = 1.0  # A higher alert level must hold this long before it is reported (filters one-frame spikes)
+LEVEL_SETTLE = 10.0  # A lower alert level must hold this long before it is reported
+
+ALERT_COLORS = {
+    'normal': (0, 255, 0),
+    'warning': (0, 255, 255),
+    'high': (0, 165, 255),
+    'critical': (0, 0, 255)
+}
+
+
+# Zone definitions (customize based on your venue layout)
+def default_zones(frame_width, frame_height):
+    return {
+        'entrance': {'x1': 0, 'y1': 0, 'x2': frame_width // 3, 'y2': frame_height // 2, 'capacity': 50},
+        'queue': {'x1': frame_width // 3, 'y1': 0, 'x2': 2 * frame_width // 3, 'y2': frame_height, 'capacity': 70},
+        'darshan': {'x1': 2 * frame_width // 3, 'y1': 0, 'x2': frame_width, 'y2': frame_height // 2, 'capacity': 80},
+        'exit': {'x1': 2 * frame_width // 3, 'y1': frame_height // 2, 'x2': frame_width, 'y2': frame_height, 'capacity': 40},
+    }
+
+# Initialize heatmap grid
+def create_heatmap_grid(grid_size):
+    return np.zeros((grid_size, grid_size), dtype=float)
+
+# Add detection to heatmap
+def update_heatmap(heatmap, x_center, y_center, frame_width, frame_height, grid_size):
+    grid_x = int((x_center / frame_width) * grid_size)
+    grid_y = int((y_center / frame_height) * grid_size)
+    
+    grid_x = min(max(0, grid_x), grid_size - 1)
+    grid_y = min(max(0, grid_y), grid_size - 1)
+    
+    heatmap[grid_y, grid_x] += 1
+    return heatmap
+
+# Determine alert level based on count and capacity
+def get_alert_level(count, capacity):
+    ratio = count / capacity if capacity > 0 else 0
+    if ratio >= 0.9:
+        return 'critical'
+    elif ratio >= 0.75:
+        return 'high'
+    elif ratio >= 0.6:
+        return 'warning'
+    else:
+        return 'normal'
+
+# Check if point is in zone
+def point_in_zone(x, y, zone):
+    return zone['x1'] <= x <= zone['x2'] and zone['y1'] <= y <= zone['y2']
+
+# Send heatmap data to backend
+def send_heatmap_to_backend(zones_data, overall_count, frame_width, frame_height, url=BACKEND_URL, camera_id=CAMERA_ID):
+    try:
+        payload = {
+            'cameraId': camera_id,
+            'timestamp': datetime.now().isoformat(),
+            'overallPeopleCount': overall_count,
+            'zones': zones_data,
+            'frameWidth': frame_width,
+            'frameHeight': frame_height,
+        }
+        
+        response = requests.post(url, json=payload, timeout=2)
+        if response.status_code == 201:
+            print(f"✓ Heatmap sent successfully | People: {overall_count}")
+            result = response.json()
+            if result.get('alertsTriggered', 0) > 0:
+                print(f"  🚨 ALERT TRIGGERED: {result['alertsTriggered']} zone(s)")
+            return True
+        print(f"✗ Failed to send heatmap: {response.status_code}")
+    except requests.exceptions.RequestException as e:
+        print(f"✗ Connection error: {str(e)[:50]}")
+    except Exception as e:
+        print(f"✗ Error sending heatmap: {str(e)[:50]}")
+    return False
+
+ALERT_ORDER = ['normal', 'warning', 'high', 'critical']
+# Zone flags reported like an alert level: crush_risk.py and crowd_motion.py
+RISK_FLAGS = ('crushRisk', 'counterFlow', 'surge')
+
+
+def _flags(zone):
+    return tuple(bool(zone.get(flag)) for flag in RISK_FLAGS)
+
+
+class ReportPolicy:
+    """
+    Decides when zones_data is worth sending instead of posting on a fixed interval
+    A report goes out when, for any zone:
+    - its alert level (or predicted level) rose, or a RISK_FLAGS flag came up, and
+      held for LEVEL_RISE seconds
+    - its count, smoothed over COUNT_SMOOTHING seconds so detection jitter does not
+      count, moved count_delta or more from the last reported count
+    - it fell to a lower level, or a flag cleared, and that held for LEVEL_SETTLE seconds
+    - heartbeat seconds passed since the last report
+    and at least MIN_REPORT_INTERVAL seconds passed since the previous report
+    (SEND_INTERVAL after a failed one).
+    """
+
+    def __init__(self, policy=None, min_interval=MIN_REPORT_INTERVAL, rise=LEVEL_RISE, settle=LEVEL_SETTLE,
+                 retry_interval=SEND_INTERVAL, smoothing=COUNT_SMOOTHING):
+        self.policy = policy or REPORT_POLICY
+        self.min_interval = min_interval
+        self.rise = rise
+        self.settle = settle
+        self.retry_interval = retry_interval
+        self.smoothing = smoothing
+        self.smoothed = {}           # zoneId -> (time, smoothed count)
+        self.last_sent = {}          # zoneId -> (time, count, alertLevel, predictedAlertLevel, flags)
+        self.higher_since = {}       # zoneId -> time the zone first looked higher than reported
+        self.lower_since = {}        # zoneId -> time the zone first looked lower than reported
+        self.next_allowed = 0.0
+        self.reasons = {}
+        self.failed = 0
+
+    def _zone_policy(self, zone_id):
+        return {**self.policy['default'], **self.policy.get(zone_id, {})}
+
+    def _smooth(self, now, zone):
+        previous = self.smoothed.get(zone['zoneId'])
+        if previous is None or self.smoothing <= 0:
+            self.smoothed[zone['zoneId']] = (now, zone['peopleCount'])
+            return
+        weight = 1 - math.exp(-max(now - previous[0], 0) / self.smoothing)
+        self.smoothed[zone['zoneId']] = (now, previous[1] + weight * (zone['peopleCount'] - previous[1]))
+
+    def _reason(self, now, zone):
+        zone_id = zone['zoneId']
+        if zone_id not in self.last_sent:
+            return 'new'
+        sent_at, count, level, predicted, flags = self.last_sent[zone_id]
+        policy = self._zone_policy(zone_id)
+
+        current = ALERT_ORDER.index(zone['alertLevel'])
+        reported = ALERT_ORDER.index(level)
+        new_predicted = zone.get('predictedAlertLevel', predicted)
+        predicted_change = 0
+        if new_predicted and predicted:
+            predicted_change = ALERT_ORDER.index(new_predicted) - ALERT_ORDER.index(predicted)
+        flag_changes = [int(new) - int(old) for new, old in zip(_flags(zone), flags)]
+
+        if current > reported or predicted_change > 0 or max(flag_changes) > 0:
+            self.lower_since.pop(zone_id, None)
+            if now - self.higher_since.setdefault(zone_id, now) >= self.rise:
+                return 'level'
+        elif current < reported or predicted_change < 0 or min(flag_changes) < 0:
+            self.higher_since.pop(zone_id, None)
+            if now - self.lower_since.setdefault(zone_id, now) >= self.settle:
+                return 'level'
+        else:
+            self.higher_since.pop(zone_id, None)
+            self.lower_since.pop(zone_id, None)
+        if abs(self.smoothed[zone_id][1] - count) >= policy['count_delta']:
+            return 'count'
+        if now - sent_at >= policy['heartbeat']:
+            return 'heartbeat'
+        return None
+
+    def should_send(self, now, zones_data):
+        """Reason to send now ('new', 'level', 'count', 'heartbeat'), or None"""
+        for zone in zones_data:
+            self._smooth(now, zone)
+        if now < self.next_allowed:
+            return None
+        reasons = [r for r in (self._reason(now, zone) for zone in zones_data) if r]
+        if not reasons:
+            return None
+        # The most urgent reason is the one recorded
+        return min(reasons, key=['level', 'count', 'new', 'heartbeat'].index)
+
+    def sent(self, now, zones_data, reason, delivered=True):
+        """Record a report; a failed one is retried after retry_interval"""
+        if not delivered:
+            self.failed += 1
+            self.next_allowed = now + self.retry_interval
+            return
+        self.next_allowed = now + self.min_interval
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        for zone in zones_data:
+            count = self.smoothed.get(zone['zoneId'], (now, zone['peopleCount']))[1]
+            self.last_sent[zone['zoneId']] = (now, count, zone['alertLevel'],
+                                              zone.get('predictedAlertLevel'), _flags(zone))
+            self.higher_since.pop(zone['zoneId'], None)
+            self.lower_since.pop(zone['zoneId'], None)
+
+    def stats(self):
+        return {**self.reasons, 'failed': self.failed}
+
+# Apply Gaussian blur to heatmap for smooth visualization
+def apply_gaussian_blur(heatmap, kernel_size=5):
+    return cv2.GaussianBlur(heatmap, (kernel_size, kernel_size), 0)
+
+# Render heatmap overlay on frame
+def render_heatmap_overlay(frame, heatmap, alpha=0.4):
+    # Normalize heatmap to 0-255
+    heatmap_norm = cv2.normalize(heatmap, None, 0, 255, cv2.NORM_MINMAX)
+    heatmap_norm = heatmap_norm.astype(np.uint8)
+    
+    # Resize to frame size
+    heatmap_resized = cv2.resize(heatmap_norm, (frame.shape[1], frame.shape[0]))
+    
+    # Apply color map (red for high density)
+    heatmap_colored = cv2.applyColorMap(heatmap_resized, cv2.COLORMAP_JET)
+    
+    # Blend with original frame
+    overlay = cv2.addWeighted(frame, 1 - alpha, heatmap_colored, alpha, 0)
+    
+    return overlay
+
+# Draw zone boundaries
+def draw_zones(frame, zones):
+    for zone_name, zone_info in zones.items():
+        color = (255, 255, 255)
+        cv2.rectangle(frame, (zone_info['x1'], zone_info['y1']), 
+                     (zone_info['x2'], zone_info['y2']), color, 2)
+        cv2.putText(frame, zone_name.upper(), (zone_info['x1'] + 10, zone_info['y1'] + 30),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+
+# Bin tracked people into the heatmap grid and zones, and build the per-zone backend payload
+def analyze_zones(boxes, track_ids, zones, frame_width, frame_height, grid_size=GRID_SIZE):
+    heatmap_grid = create_heatmap_grid(grid_size)
+    zone_counts = {zone: [] for zone in zones.keys()}
+
+    for box, track_id in zip(boxes, track_ids):
+        x1, y1, x2, y2 = map(int, box)
+        x_center = (x1 + x2) // 2
+        y_center = (y1 + y2) // 2
+
+        # Update heatmap
+        heatmap_grid = update_heatmap(heatmap_grid, x_center, y_center,
+                                      frame_width, frame_height, grid_size)
+
+        # Assign to zone
+        for zone_name, zone_info in zones.items():
+            if point_in_zone(x_center, y_center, zone_info):
+                zone_counts[zone_name].append({
+                    'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2,
+                    'trackId': int(track_id)
+                })
+                break
+
+    zones_data = []
+    for zone_name, detections in zone_counts.items():
+        zone_info = zones[zone_name]
+        people_count = len(detections)
+        zone_area = (zone_info['x2'] - zone_info['x1']) * (zone_info['y2'] - zone_info['y1'])
+        density = people_count / (zone_area / 10000) if zone_area > 0 else 0
+        alert_level = get_alert_level(people_count, zone_info['capacity'])
+
+        # Extract zone-specific heatmap grid
+        grid_x1 = int((zone_info['x1'] / frame_width) * grid_size)
+        grid_y1 = int((zone_info['y1'] / frame_height) * grid_size)
+        grid_x2 = int((zone_info['x2'] / frame_width) * grid_size)
+        grid_y2 = int((zone_info['y2'] / frame_height) * grid_size)
+        zone_heatmap = heatmap_grid[grid_y1:grid_y2, grid_x1:grid_x2].tolist()
+
+        zones_data.append({
+            'zoneId': zone_name,
+            'zoneName': zone_name.capitalize(),
+            'peopleCount': people_count,
+            'density': round(density, 2),
+            'heatmapGrid': zone_heatmap if zone_heatmap else [[0]],
+            'alertLevel': alert_level,
+            'boundingBoxes': detections,
+        })
+
+    return heatmap_grid, zones_data
+
+# Draw per-zone count and alert indicator
+def draw_zone_stats(frame, zones, zones_data):
+    for zone in zones_data:
+        zone_info = zones[zone['zoneId']]
+        stats_y = zone_info['y1'] + 60
+        cv2.putText(frame, f"Count: {zone['peopleCount']}",
+                   (zone_info['x1'] + 10, stats_y),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+        # Alert level indicator
+        alert_color = ALERT_COLORS.get(zone['alertLevel'], (255, 255, 255))
+        cv2.circle(frame, (zone_info['x1'] + 20, stats_y + 20), 8, alert_color, -1)
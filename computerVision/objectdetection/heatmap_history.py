@@ -0,0 +1,342 @@
+"""
+Local heatmap history for one camera, kept in a memory-mapped ring file
+
+Every send interval the monitor appends the full-frame grid, the per-zone counts
+and the overall count as one fixed-size record. The file is sized up front from
+the retention (retention / interval records) and the oldest records are
+overwritten once it is full. A second, much smaller ring keeps per-hour sums, so
+averages over weeks or months read a few thousand hourly rows instead of every
+raw record.
+
+Queries run vectorized over the mapped arrays; nothing goes through the backend.
+
+Usage:
+    python heatmap_history.py history/camera-1.heatmap --hours 24 --peaks 5
+    python heatmap_history.py --check      # self-check of peaks() on a synthetic file
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from heatmap_core import GRID_SIZE, SEND_INTERVAL
+
+
+MAGIC = b'HMHIST01'
+HEADER_BYTES = 4096       # magic, two int64 counters, then JSON metadata
+HOUR = 3600
+
+
+def record_dtype(grid_size, zone_count):
+    return np.dtype([
+        ('t', '<f8'),
+        ('overall', '<u2'),
+        ('zones', '<u2', (zone_count,)),
+        ('grid', '<u2', (grid_size, grid_size)),
+    ])
+
+
+def hour_dtype(grid_size, zone_count):
+    return np.dtype([
+        ('t', '<f8'),                                   # start of the hour
+        ('samples', '<u4'),
+        ('overall_sum', '<f8'),
+        ('overall_max', '<u2'),
+        ('zones_sum', '<f8', (zone_count,)),
+        ('zones_max', '<u2', (zone_count,)),
+        ('grid_sum', '<f4', (grid_size, grid_size)),
+    ])
+
+
+def _ordered_ranges(count, capacity):
+    """Physical index ranges of a ring, oldest first"""
+    if count <= capacity:
+        return [(0, count)]
+    head = count % capacity
+    return [(head, capacity), (0, head)]
+
+
+class HeatmapHistory:
+    """
+    Append-only ring of heatmap records
+    Opening an existing file keeps its layout; zone_ids and grid_size must match
+    what the file was created with.
+    """
+
+    def __init__(self, path, zone_ids=None, grid_size=GRID_SIZE, retention_days=30,
+                 interval=SEND_INTERVAL, hour_retention_days=730):
+        self.path = path
+        if os.path.exists(path):
+            meta = self._read_meta(path)
+            if zone_ids is not None and list(zone_ids) != meta['zone_ids']:
+                raise ValueError(f"{path} was created for zones {meta['zone_ids']}, not {list(zone_ids)}")
+            if grid_size != meta['grid_size']:
+                raise ValueError(f"{path} was created with grid size {meta['grid_size']}")
+        else:
+            if zone_ids is None:
+                raise ValueError('zone_ids are needed to create a history file')
+            meta = {
+                'zone_ids': list(zone_ids),
+                'grid_size': grid_size,
+                'interval': interval,
+                'capacity': int(retention_days * 86400 / interval),
+                'hour_capacity': int(hour_retention_days * 24),
+                'created': time.time(),
+            }
+            self._create(path, meta)
+
+        self.meta = meta
+        self.zone_ids = meta['zone_ids']
+        self.capacity = meta['capacity']
+        self.hour_capacity = meta['hour_capacity']
+        dtype = record_dtype(meta['grid_size'], len(self.zone_ids))
+        hdtype = hour_dtype(meta['grid_size'], len(self.zone_ids))
+
+        self._counters = np.memmap(path, dtype='<i8', mode='r+', offset=len(MAGIC), shape=(2,))
+        self.records = np.memmap(path, dtype=dtype, mode='r+', offset=HEADER_BYTES, shape=(self.capacity,))
+        self.hours = np.memmap(path, dtype=hdtype, mode='r+',
+                               offset=HEADER_BYTES + dtype.itemsize * self.capacity, shape=(self.hour_capacity,))
+
+    @staticmethod
+    def _read_meta(path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_BYTES)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'Not a heatmap history file: {path}')
+        return json.loads(header[len(MAGIC) + 16:].rstrip(b'\0'))
+
+    @staticmethod
+    def _create(path, meta):
+        dtype = record_dtype(meta['grid_size'], len(meta['zone_ids']))
+        hdtype = hour_dtype(meta['grid_size'], len(meta['zone_ids']))
+        size = HEADER_BYTES + dtype.itemsize * meta['capacity'] + hdtype.itemsize * meta['hour_capacity']
+        header = MAGIC + np.zeros(2, '<i8').tobytes() + json.dumps(meta).encode()
+        if len(header) > HEADER_BYTES:
+            raise ValueError('Too many zones for the history header')
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(header.ljust(HEADER_BYTES, b'\0'))
+            f.truncate(size)      # Sparse on most filesystems until written
+
+    @property
+    def count(self):
+        """Records appended since the file was created (including overwritten ones)"""
+        return int(self._counters[0])
+
+    @property
+    def hour_count(self):
+        return int(self._counters[1])
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, t, grid, zone_counts, overall):
+        """
+        Add one interval: t in epoch seconds, grid GRID_SIZE x GRID_SIZE,
+        zone_counts as {zoneId: count} or the zones_data list sent to the backend
+        """
+        if not isinstance(zone_counts, dict):
+            zone_counts = {z['zoneId']: z['peopleCount'] for z in zone_counts}
+        zones = np.array([zone_counts.get(z, 0) for z in self.zone_ids], np.uint16)
+        grid = np.clip(np.asarray(grid), 0, 65535).astype(np.uint16)
+        overall = min(int(overall), 65535)
+
+        record = self.records[self.count % self.capacity]
+        record['t'] = t
+        record['overall'] = overall
+        record['zones'] = zones
+        record['grid'] = grid
+        self._counters[0] = self.count + 1
+
+        self._add_to_hour(t, grid, zones, overall)
+
+    def _add_to_hour(self, t, grid, zones, overall):
+        hour_start = t - t % HOUR
+        count = self.hour_count
+        row = self.hours[(count - 1) % self.hour_capacity] if count else None
+        if row is None or row['t'] != hour_start:
+            row = self.hours[count % self.hour_capacity]
+            row['t'] = hour_start
+            row['samples'] = 0
+            row['overall_sum'] = 0
+            row['overall_max'] = 0
+            row['zones_sum'] = 0
+            row['zones_max'] = 0
+            row['grid_sum'] = 0
+            self._counters[1] = count + 1
+        row['samples'] += 1
+        row['overall_sum'] += overall
+        row['overall_max'] = max(row['overall_max'], overall)
+        row['zones_sum'] += zones
+        row['zones_max'] = np.maximum(row['zones_max'], zones)
+        row['grid_sum'] += grid
+
+    def flush(self):
+        self.records.flush()
+        self.hours.flush()
+        self._counters.flush()
+
+    def close(self):
+        self.flush()
+        self._counters = self.records = self.hours = None
+
+    def _zone_index(self, zone):
+        try:
+            return self.zone_ids.index(zone)
+        except ValueError:
+            raise KeyError(f'Unknown zone: {zone}')
+
+    def _slices(self, ring, count, capacity, start, end):
+        """Oldest-first views of the ring rows with start <= t < end"""
+        parts = []
+        for lo, hi in _ordered_ranges(count, capacity):
+            t = ring['t'][lo:hi]
+            a = lo + np.searchsorted(t, start, 'left') if start is not None else lo
+            b = lo + np.searchsorted(t, end, 'left') if end is not None else hi
+            if b > a:
+                parts.append(ring[a:b])
+        return parts
+
+    def slice(self, start=None, end=None):
+        """Records with start <= t < end, oldest first (a copy only when the range wraps)"""
+        parts = self._slices(self.records, self.count, self.capacity, start, end)
+        if not parts:
+            return self.records[:0]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def series(self, start=None, end=None, zone=None):
+        """(timestamps, counts) of one zone, or the overall count"""
+        records = self.slice(start, end)
+        if zone is None:
+            return records['t'], records['overall']
+        return records['t'], records['zones'][:, self._zone_index(zone)]
+
+    def cell_mean(self, start=None, end=None):
+        """
+        Average grid over a time range
+        Whole hours come from the hourly ring; only the partial hours at either end
+        are summed from raw records.
+        """
+        grid_size = self.meta['grid_size']
+        total = np.zeros((grid_size, grid_size), np.float64)
+        samples = 0
+
+        if self.count == 0:
+            return total
+        oldest = self.hours['t'][self.hour_count % self.hour_capacity] \
+            if self.hour_count > self.hour_capacity else self.hours['t'][0]
+        lo = max(start, oldest) if start is not None else oldest
+        hi = end if end is not None else time.time() + HOUR
+
+        # Whole hours strictly inside the range
+        full_lo = lo - lo % HOUR + (HOUR if lo % HOUR else 0)
+        full_hi = hi - hi % HOUR
+        if full_hi > full_lo:
+            for part in self._slices(self.hours, self.hour_count, self.hour_capacity, full_lo, full_hi):
+                total += part['grid_sum'].sum(axis=0, dtype=np.float64)
+                samples += int(part['samples'].sum())
+            edges = [(lo, full_lo), (full_hi, hi)]
+        else:
+            edges = [(lo, hi)]
+
+        for a, b in edges:
+            for part in self._slices(self.records, self.count, self.capacity, a, b):
+                total += part['grid'].sum(axis=0, dtype=np.float64)
+                samples += len(part)
+        return total / samples if samples else total
+
+    def hourly(self, start=None, end=None, zone=None):
+        """Per-hour (start, mean, max) of one zone or the overall count"""
+        parts = self._slices(self.hours, self.hour_count, self.hour_capacity, start, end)
+        hours = np.concatenate(parts) if len(parts) > 1 else (parts[0] if parts else self.hours[:0])
+        samples = np.maximum(hours['samples'], 1)
+        if zone is None:
+            return hours['t'], hours['overall_sum'] / samples, hours['overall_max']
+        i = self._zone_index(zone)
+        return hours['t'], hours['zones_sum'][:, i] / samples, hours['zones_max'][:, i]
+
+    def peaks(self, start=None, end=None, zone=None, top=5, min_gap=HOUR):
+        """
+        Highest counts in a range as [(t, count)], at least min_gap seconds apart,
+        so one long rush is reported once
+        """
+        t, counts = self.series(start, end, zone)
+        if len(counts) == 0:
+            return []
+        # Only the highest candidates need ordering
+        k = min(len(counts), max(top * 50, 1000))
+        candidates = np.argpartition(-counts.astype(np.int64), k - 1)[:k]
+        candidates = candidates[np.argsort(-counts[candidates].astype(np.int64), kind='stable')]
+
+        chosen = []
+        for i in candidates:
+            if all(abs(t[i] - t[j]) >= min_gap for j in chosen):
+                chosen.append(i)
+                if len(chosen) == top:
+                    break
+        return [(float(t[i]), int(counts[i])) for i in chosen]
+
+
+def check_peaks():
+    """peaks() on a synthetic file: counts must start at the maximum, never rise, and be min_gap apart"""
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        history = HeatmapHistory(os.path.join(tmp, 'check.heatmap'), zone_ids=['gate', 'queue'],
+                                 retention_days=1, interval=60)
+        start = 1_700_000_000.0
+        grid = np.zeros((GRID_SIZE, GRID_SIZE))
+        for k in range(12 * 60):          # 12 hours, one record a minute
+            history.append(start + k * 60, grid, {'gate': k % 7, 'queue': (k // 60) % 5}, k % 11)
+
+        for zone in (None, 'gate', 'queue'):
+            _, counts = history.series(zone=zone)
+            peaks = history.peaks(zone=zone, top=5)
+            found = [count for _, count in peaks]
+            times = sorted(t for t, _ in peaks)
+            passed = (len(peaks) == 5 and found[0] == int(counts.max())
+                      and all(a >= b for a, b in zip(found, found[1:]))
+                      and all(b - a >= HOUR for a, b in zip(times, times[1:])))
+            print(f"{'✓' if passed else '✗'} peaks({zone or 'overall'}): {found}, max {int(counts.max())}")
+            ok = ok and passed
+        history.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query a local heatmap history file')
+    parser.add_argument('path', nargs='?')
+    parser.add_argument('--hours', type=float, default=24, help='look back this many hours')
+    parser.add_argument('--zone', help='zone id (default: overall count)')
+    parser.add_argument('--peaks', type=int, default=5)
+    parser.add_argument('--check', action='store_true', help='self-check peaks() on a synthetic file and exit')
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if check_peaks() else 1)
+    if args.path is None:
+        parser.error('path is required unless --check is given')
+
+    history = HeatmapHistory(args.path)
+    end = time.time()
+    start = end - args.hours * HOUR
+    print(f"{args.path}: {len(history)} records (capacity {history.capacity}), zones {history.zone_ids}")
+
+    started = time.perf_counter()
+    mean = history.cell_mean(start, end)
+    mean_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    peaks = history.peaks(start, end, zone=args.zone, top=args.peaks)
+    peaks_ms = (time.perf_counter() - started) * 1000
+
+    row, col = np.unravel_index(np.argmax(mean), mean.shape)
+    print(f"Busiest cell: row {row}, col {col} (mean {mean[row, col]:.2f}) [{mean_ms:.1f} ms]")
+    print(f"Peaks ({args.zone or 'overall'}) [{peaks_ms:.1f} ms]:")
+    for t, count in peaks:
+        print(f"  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t))}  {count}")
+
+
+if __name__ == '__main__':
+    main()
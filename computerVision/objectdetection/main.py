@@ -1,5 +1,6 @@
 import os
 import random
+import sys
 
 import cv2
 from ultralytics import YOLO
@@ -9,17 +10,26 @@ from ultralytics import YOLO
 script_dir = os.path.dirname(os.path.abspath(__file__))
 video_path = os.path.join(script_dir, 'people.mp4')
 video_out_path = os.path.join(script_dir, 'out.mp4')
+sys.path.insert(0, os.path.join(script_dir, '..', 'common'))
 
-cap = cv2.VideoCapture(video_path)
-ret, frame = cap.read()
+from frame_source import FrameSource
+from frame_bus import BusSource
+from trackers import create_tracker
+from detection_cache import open_from_env
+
+# With FRAME_BUS set, frames come from a capture process (common/frame_bus.py);
+# this script draws on them, so it takes private copies
+if os.environ.get('FRAME_BUS'):
+    source = BusSource(os.environ['FRAME_BUS'], copy=True)
+else:
+    source = FrameSource(video_path)
 
 # Check if video opened successfully
-if not ret or frame is None:
+if not source.is_opened():
     print(f"Error: Could not open video file: {video_path}")
     exit()
 
-cap_out = cv2.VideoWriter(video_out_path, cv2.VideoWriter_fourcc(*'MP4V'), cap.get(cv2.CAP_PROP_FPS),
-                          (frame.shape[1], frame.shape[0]))
+cap_out = cv2.VideoWriter(video_out_path, cv2.VideoWriter_fourcc(*'MP4V'), source.fps, source.frame_size)
 
 # Load YOLO model
 model = YOLO("yolov8n.pt")
@@ -29,33 +39,31 @@ colors = [(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255
 
 detection_threshold = 0.5
 
-while ret:
-    # Check if frame is valid
-    if frame is None:
-        break
+# DETECTION_CACHE=<dir> keeps the file's detections, so re-runs skip YOLO
+detection_cache = None if os.environ.get('FRAME_BUS') else \
+    open_from_env(video_path, 'yolov8n.pt', classes=[0], frame_size=list(source.frame_size))
+
+# ultralytics (ByteTrack, default), sort (pure NumPy) or deepsort; see trackers.py
+tracker = create_tracker(os.environ.get('TRACKER', 'ultralytics'), model, conf=detection_threshold, classes=[0],  # class 0 is 'person'
+                         cache=detection_cache)
 
-    # Use YOLO's built-in tracking (ByteTrack)
-    results = model.track(frame, persist=True, conf=detection_threshold, classes=[0])  # class 0 is 'person'
+for frame_index, frame in source:
+    boxes, track_ids, confidences, _ = tracker(frame, frame_index)  # bounding boxes, track IDs, confidence scores
 
-    # Draw detections
-    person_count = 0
-    if results[0].boxes is not None and results[0].boxes.id is not None:
-        boxes = results[0].boxes.xyxy.cpu().numpy()  # bounding boxes
-        track_ids = results[0].boxes.id.cpu().numpy().astype(int)  # track IDs
-        confidences = results[0].boxes.conf.cpu().numpy()  # confidence scores
-        person_count = len(track_ids)
+    # Draw detections that have a track ID
+    tracked = track_ids >= 0
+    person_count = int(tracked.sum())
+    for box, track_id, conf in zip(boxes[tracked], track_ids[tracked], confidences[tracked]):
+        x1, y1, x2, y2 = map(int, box)
+        color = colors[track_id % len(colors)]
         
-        for box, track_id, conf in zip(boxes, track_ids, confidences):
-            x1, y1, x2, y2 = map(int, box)
-            color = colors[track_id % len(colors)]
-            
-            # Draw bounding box
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
-            
-            # Add label with ID and confidence
-            label = f'ID: {track_id} ({conf:.2f})'
-            cv2.putText(frame, label, (x1, y1 - 10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        # Draw bounding box
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
+        
+        # Add label with ID and confidence
+        label = f'ID: {track_id} ({conf:.2f})'
+        cv2.putText(frame, label, (x1, y1 - 10), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
     
     # Add people count
     cv2.rectangle(frame, (10, 10), (300, 50), (0, 0, 0), -1)
@@ -72,10 +80,10 @@ while ret:
     # Press 'q' to quit
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
-    
-    ret, frame = cap.read()
 
-cap.release()
+if detection_cache is not None:
+    detection_cache.close()
+source.release()
 cap_out.release()
 cv2.destroyAllWindows()
 print(f"\nProcessing complete! Output saved to: {video_out_path}")
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""
+SORT / ByteTrack-style multi-object tracker in pure NumPy
+
+Every track is a constant-velocity Kalman filter over [cx, cy, w, h]; predict and
+update run on all tracks at once as batched matrix products. Detections are
+matched to tracks by IoU with linear assignment, in two passes as in ByteTrack:
+confident detections first, then low-score ones against the tracks still
+unmatched, which keeps identities through partial occlusion. No appearance model,
+so it runs on CPU-only nodes without TensorFlow or the DeepSORT encoder.
+"""
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+
+# Constant-velocity model over [cx, cy, w, h, vcx, vcy, vw, vh]
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+_H = np.eye(4, 8)
+
+# Noise scaled by box height, as in ByteTrack
+STD_POSITION = 1.0 / 20
+STD_VELOCITY = 1.0 / 160
+
+
+def xyxy_to_cxcywh(boxes):
+    boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+    wh = boxes[:, 2:] - boxes[:, :2]
+    return np.concatenate([boxes[:, :2] + wh / 2, wh], axis=1)
+
+
+def cxcywh_to_xyxy(boxes):
+    half = boxes[:, 2:4] / 2
+    return np.concatenate([boxes[:, :2] - half, boxes[:, :2] + half], axis=1)
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU of xyxy boxes, (len(a), len(b))"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def match(tracks_xyxy, dets_xyxy, iou_threshold):
+    """Linear assignment on IoU; returns matched (track_idx, det_idx) pairs above the threshold"""
+    if len(tracks_xyxy) == 0 or len(dets_xyxy) == 0:
+        return np.zeros((0, 2), int)
+    iou = iou_matrix(tracks_xyxy, dets_xyxy)
+    rows, cols = linear_sum_assignment(-iou)
+    keep = iou[rows, cols] >= iou_threshold
+    return np.stack([rows[keep], cols[keep]], axis=1)
+
+
+class SortTracker:
+    """
+    update(boxes, scores) takes one frame's xyxy detections and returns a track id
+    per detection (-1 while a track is not yet confirmed, or for an unmatched
+    low-score detection).
+    - high_thresh: detections at or above it can start tracks and are matched first
+    - low_thresh: detections between low and high are only used to keep tracks alive
+    - min_hits: matches before a new track gets reported
+    - max_age: frames a track survives without a match
+    """
+
+    def __init__(self, max_age=30, min_hits=3, iou_threshold=0.3, high_thresh=0.5, low_thresh=0.1):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+
+        self.mean = np.zeros((0, 8))
+        self.cov = np.zeros((0, 8, 8))
+        self.ids = np.zeros(0, int)
+        self.hits = np.zeros(0, int)
+        self.misses = np.zeros(0, int)
+        self.next_id = 1
+        self.frames = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _noise(self, h, weights):
+        std = h[:, None] * np.asarray(weights)[None, :]
+        return np.einsum('ni,ij->nij', std ** 2, np.eye(len(weights)))
+
+    def _predict(self):
+        if len(self.ids) == 0:
+            return
+        h = np.maximum(self.mean[:, 3], 1.0)
+        q = self._noise(h, [STD_POSITION] * 4 + [STD_VELOCITY] * 4)
+        self.mean = self.mean @ _F.T
+        self.cov = _F @ self.cov @ _F.T + q
+        # Boxes cannot shrink below a pixel
+        self.mean[:, 2:4] = np.maximum(self.mean[:, 2:4], 1.0)
+
+    def _update(self, rows, measurements):
+        """Kalman update of the tracks in rows with their matched [cx, cy, w, h]"""
+        if len(rows) == 0:
+            return
+        mean = self.mean[rows]
+        cov = self.cov[rows]
+        r = self._noise(np.maximum(mean[:, 3], 1.0), [STD_POSITION] * 4)
+        s = _H @ cov @ _H.T + r
+        pht = cov @ _H.T
+        # K = P H^T S^-1, solved rather than inverted
+        gain = np.linalg.solve(s, pht.transpose(0, 2, 1)).transpose(0, 2, 1)
+        innovation = measurements - mean @ _H.T
+        self.mean[rows] = mean + np.einsum('nij,nj->ni', gain, innovation)
+        self.cov[rows] = cov - gain @ _H @ cov
+        self.hits[rows] += 1
+        self.misses[rows] = 0
+
+    def _start(self, measurements):
+        n = len(measurements)
+        if n == 0:
+            return
+        mean = np.zeros((n, 8))
+        mean[:, :4] = measurements
+        h = np.maximum(measurements[:, 3], 1.0)
+        cov = self._noise(h, [2 * STD_POSITION] * 4 + [10 * STD_VELOCITY] * 4)
+        self.mean = np.concatenate([self.mean, mean])
+        self.cov = np.concatenate([self.cov, cov])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+        self.hits = np.concatenate([self.hits, np.ones(n, int)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, int)])
+        self.next_id += n
+
+    def update(self, boxes, scores=None):
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        scores = np.ones(len(boxes)) if scores is None else np.asarray(scores, np.float64)
+        self.frames += 1
+        track_ids = np.full(len(boxes), -1, int)
+
+        self._predict()
+        self.misses += 1
+        predicted = cxcywh_to_xyxy(self.mean[:, :4])
+        measurements = xyxy_to_cxcywh(boxes)
+
+        high = np.flatnonzero(scores >= self.high_thresh)
+        low = np.flatnonzero((scores >= self.low_thresh) & (scores < self.high_thresh))
+
+        # First pass: confident detections against every track
+        pairs = match(predicted, boxes[high], self.iou_threshold)
+        rows, det = pairs[:, 0], high[pairs[:, 1]]
+        self._update(rows, measurements[det])
+        matched = np.zeros(len(self.ids), bool)
+        matched[rows] = True
+        track_rows = {int(d): int(r) for r, d in zip(rows, det)}
+
+        # Second pass: low-score detections keep the remaining tracks alive
+        remaining = np.flatnonzero(~matched)
+        pairs = match(predicted[remaining], boxes[low], max(self.iou_threshold, 0.5))
+        rows, det = remaining[pairs[:, 0]], low[pairs[:, 1]]
+        self._update(rows, measurements[det])
+        track_rows.update({int(d): int(r) for r, d in zip(rows, det)})
+
+        # Unmatched confident detections start tentative tracks
+        unmatched = np.setdiff1d(high, list(track_rows), assume_unique=True)
+        first_new = len(self.ids)
+        self._start(measurements[unmatched])
+        track_rows.update({int(d): first_new + i for i, d in enumerate(unmatched)})
+
+        # Report confirmed tracks (everything during the first min_hits frames)
+        confirmed = (self.hits >= self.min_hits) | (self.frames <= self.min_hits)
+        for d, r in track_rows.items():
+            if confirmed[r]:
+                track_ids[d] = self.ids[r]
+
+        # Drop tracks not seen for max_age frames, and tentative ones missed once
+        keep = (self.misses <= self.max_age) & ((self.hits >= self.min_hits) | (self.misses == 0))
+        if not keep.all():
+            self.mean, self.cov = self.mean[keep], self.cov[keep]
+            self.ids, self.hits, self.misses = self.ids[keep], self.hits[keep], self.misses[keep]
+        return track_ids
+
+    def boxes(self):
+        """Current filtered boxes (xyxy) and ids of all live tracks"""
+        return cxcywh_to_xyxy(self.mean[:, :4]), self.ids.copy()
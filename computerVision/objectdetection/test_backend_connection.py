@@ -1,9 +1,33 @@
 """
-Test script to verify backend connection without running full CV pipeline
+Test and load-test the heatmap ingestion API without running the CV pipeline
+
+With no options one sample payload is sent, to check the backend is reachable.
+With --cameras, N simulated cameras post realistic payloads (zone grids of varying
+size, bounding boxes, counts that drift over time) at a fixed rate each, through
+one pooled aiohttp session. Load can be stepped up with --steps; every step
+reports throughput, latency percentiles (measured from each request's scheduled
+time, so a slow server is not hidden by the generator waiting on it) and errors.
+With --listeners, M Socket.IO clients subscribe to crowd:heatmap-delta and the
+delay from a payload's timestamp to its broadcast is reported too.
+
+A local backend is enough; MONGO_URI=memory runs it against an in-memory MongoDB
+(see backend/src/config/db.js).
+
+Usage:
+    python test_backend_connection.py
+    python test_backend_connection.py --cameras 50 --rate 1 --duration 30 --listeners 5
+    python test_backend_connection.py --steps 10,50,100,200 --step-duration 20 --rate 1 --output load.json
+
+Load runs need aiohttp, and python-socketio for --listeners (requirements.txt).
 """
-import requests
+import argparse
+import asyncio
 import json
-from datetime import datetime
+import random
+import time
+from datetime import datetime, timezone
+
+import requests
 
 BACKEND_URL = "http://localhost:5000/api/crowd/heatmap"
 
@@ -35,31 +59,268 @@ test_data = {
     'frameHeight': 1080
 }
 
-print("🧪 Testing backend connection...")
-print(f"Backend URL: {BACKEND_URL}")
-print()
+ZONE_NAMES = ['entrance', 'queue', 'darshan', 'exit', 'parking', 'hall']
 
-try:
-    response = requests.post(BACKEND_URL, json=test_data, timeout=5)
-    
-    if response.status_code == 201:
-        print("✅ SUCCESS! Backend is receiving heatmap data")
+
+def send_test_payload(url=BACKEND_URL):
+    print("🧪 Testing backend connection...")
+    print(f"Backend URL: {url}")
+    print()
+
+    try:
+        response = requests.post(url, json=test_data, timeout=5)
+
+        if response.status_code == 201:
+            print("✅ SUCCESS! Backend is receiving heatmap data")
+            print()
+            result = response.json()
+            print(f"Response: {json.dumps(result, indent=2)}")
+        else:
+            print(f"❌ FAILED! Status code: {response.status_code}")
+            print(f"Response: {response.text}")
+
+    except requests.exceptions.ConnectionError:
+        print("❌ CONNECTION ERROR!")
         print()
-        result = response.json()
-        print(f"Response: {json.dumps(result, indent=2)}")
-    else:
-        print(f"❌ FAILED! Status code: {response.status_code}")
-        print(f"Response: {response.text}")
-        
-except requests.exceptions.ConnectionError:
-    print("❌ CONNECTION ERROR!")
+        print("Backend is not running. Please start it with:")
+        print("  cd backend")
+        print("  npm run dev")
+
+    except Exception as e:
+        print(f"❌ ERROR: {str(e)}")
+
     print()
-    print("Backend is not running. Please start it with:")
-    print("  cd backend")
-    print("  npm run dev")
-    
-except Exception as e:
-    print(f"❌ ERROR: {str(e)}")
-
-print()
-print("=" * 50)
+    print("=" * 50)
+
+
+class SimulatedCamera:
+    """One camera's zones, with counts that drift like a real crowd"""
+
+    def __init__(self, camera_id, rng, grid_size=20, width=1920, height=1080):
+        self.camera_id = camera_id
+        self.rng = rng
+        self.grid_size = grid_size
+        self.width = width
+        self.height = height
+        self.zones = []
+        for name in rng.sample(ZONE_NAMES, rng.randint(2, 5)):
+            self.zones.append({
+                'zoneId': name,
+                'capacity': rng.choice([40, 50, 70, 80]),
+                # Share of the frame grid covered by the zone
+                'rows': rng.randint(3, grid_size // 2),
+                'cols': rng.randint(3, grid_size // 2),
+                'count': rng.uniform(0, 30),
+            })
+
+    def payload(self):
+        zones = []
+        for zone in self.zones:
+            zone['count'] = max(0.0, zone['count'] + self.rng.gauss(0, 2))
+            count = int(zone['count'])
+            ratio = count / zone['capacity']
+            alert_level = 'critical' if ratio >= 0.9 else 'high' if ratio >= 0.75 else \
+                'warning' if ratio >= 0.6 else 'normal'
+
+            grid = [[0] * zone['cols'] for _ in range(zone['rows'])]
+            boxes = []
+            for track_id in range(count):
+                grid[self.rng.randrange(zone['rows'])][self.rng.randrange(zone['cols'])] += 1
+                x1 = self.rng.randrange(self.width - 80)
+                y1 = self.rng.randrange(self.height - 200)
+                boxes.append({'x1': x1, 'y1': y1, 'x2': x1 + self.rng.randint(40, 80),
+                              'y2': y1 + self.rng.randint(100, 200), 'trackId': track_id})
+            zones.append({
+                'zoneId': zone['zoneId'],
+                'zoneName': zone['zoneId'].capitalize(),
+                'peopleCount': count,
+                'density': round(count / (zone['rows'] * zone['cols']), 2),
+                'heatmapGrid': grid,
+                'alertLevel': alert_level,
+                'boundingBoxes': boxes,
+            })
+        return {
+            'cameraId': self.camera_id,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'overallPeopleCount': sum(z['peopleCount'] for z in zones),
+            'zones': zones,
+            'frameWidth': self.width,
+            'frameHeight': self.height,
+        }
+
+
+def percentiles(values):
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    values = sorted(values)
+
+    def pick(p):
+        return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 2)
+    return {'p50': pick(50), 'p95': pick(95), 'p99': pick(99), 'max': round(values[-1], 2)}
+
+
+class StepStats:
+    def __init__(self, cameras):
+        self.cameras = cameras
+        self.latencies_ms = []
+        self.errors = {}
+        self.sent = 0
+        self.ok = 0
+        self.bytes = 0
+        self.broadcast_ms = []
+        self.started = time.time()
+
+    def error(self, kind):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, rate):
+        elapsed = time.time() - self.started
+        return {
+            'cameras': self.cameras,
+            'offered_rps': round(self.cameras * rate, 1),
+            'achieved_rps': round(self.ok / elapsed, 1) if elapsed > 0 else 0.0,
+            'requests': self.sent,
+            'error_rate': round(1 - self.ok / self.sent, 4) if self.sent else 0.0,
+            'errors': self.errors,
+            'request_kb': round(self.bytes / self.sent / 1024, 1) if self.sent else 0.0,
+            'latency_ms': percentiles(self.latencies_ms),
+            'broadcast_delay_ms': percentiles(self.broadcast_ms),
+            'broadcasts_received': len(self.broadcast_ms),
+        }
+
+
+async def run_camera(session, url, camera, rate, stop_at, get_stats, timeout):
+    import aiohttp
+
+    interval = 1.0 / rate
+    # Spread cameras over the interval instead of firing together
+    next_at = time.perf_counter() + random.uniform(0, interval)
+    pending = set()
+
+    async def post(scheduled, body):
+        stats = get_stats()
+        stats.sent += 1
+        stats.bytes += len(body)
+        try:
+            async with session.post(url, data=body, headers={'Content-Type': 'application/json'},
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                await response.read()
+                if response.status == 201:
+                    stats.ok += 1
+                else:
+                    stats.error(f'http_{response.status}')
+        except asyncio.TimeoutError:
+            stats.error('timeout')
+        except aiohttp.ClientError as e:
+            stats.error(type(e).__name__)
+        stats.latencies_ms.append((time.perf_counter() - scheduled) * 1000)
+
+    while True:
+        now = time.perf_counter()
+        if now >= stop_at:
+            break
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+        # Open loop: requests go out on schedule even while earlier ones are still waiting
+        task = asyncio.ensure_future(post(next_at, json.dumps(camera.payload())))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+        next_at += interval
+    if pending:
+        await asyncio.wait(pending)
+
+
+async def attach_listeners(base_url, count, get_stats):
+    import socketio
+
+    clients = []
+    for _ in range(count):
+        client = socketio.AsyncClient(reconnection=False)
+
+        @client.on('crowd:heatmap-delta')
+        async def on_delta(delta):
+            if 'timestamp' in delta:
+                sent = datetime.fromisoformat(delta['timestamp'].replace('Z', '+00:00'))
+                get_stats().broadcast_ms.append((datetime.now(timezone.utc) - sent).total_seconds() * 1000)
+
+        await client.connect(base_url, transports=['websocket'])
+        await client.emit('crowd:subscribe', {})
+        clients.append(client)
+    return clients
+
+
+async def load_test(args):
+    import aiohttp
+
+    url = args.url.rstrip('/') + '/api/crowd/heatmap'
+    rng = random.Random(args.seed)
+    steps = [int(s) for s in args.steps.split(',')] if args.steps else [args.cameras]
+    cameras = [SimulatedCamera(f'sim-{i:03d}', rng, grid_size=rng.choice([10, 20, 30]))
+               for i in range(max(steps))]
+
+    current = {'stats': StepStats(0)}
+
+    def get_stats():
+        return current['stats']
+
+    listeners = await attach_listeners(args.url, args.listeners, get_stats) if args.listeners else []
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    results = []
+    async with aiohttp.ClientSession(connector=connector) as session:
+        for step in steps:
+            duration = args.step_duration if args.steps else args.duration
+            current['stats'] = StepStats(step)
+            stop_at = time.perf_counter() + duration
+            print(f"▶ {step} cameras x {args.rate}/s for {duration}s ...")
+            await asyncio.gather(*(run_camera(session, url, camera, args.rate, stop_at, get_stats, args.timeout)
+                                   for camera in cameras[:step]))
+            # Let the last broadcasts arrive
+            if listeners:
+                await asyncio.sleep(2)
+            report = current['stats'].report(args.rate)
+            results.append(report)
+            print(f"  {report['achieved_rps']} req/s, errors {report['error_rate']:.2%}, "
+                  f"latency p50 {report['latency_ms']['p50']} ms p99 {report['latency_ms']['p99']} ms, "
+                  f"broadcast p50 {report['broadcast_delay_ms']['p50']} ms")
+
+        server = {}
+        for name in ('ingest-stats', 'broadcast-stats'):
+            try:
+                async with session.get(f"{args.url.rstrip('/')}/api/crowd/{name}") as response:
+                    server[name] = (await response.json()).get('stats')
+            except aiohttp.ClientError:
+                pass
+
+    for client in listeners:
+        await client.disconnect()
+    return {'steps': results, 'server': server}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Heatmap API connection test and load generator')
+    parser.add_argument('--url', default='http://localhost:5000', help='backend base URL')
+    parser.add_argument('--cameras', type=int, default=0, help='simulated cameras (0 = single test payload)')
+    parser.add_argument('--rate', type=float, default=0.2, help='posts per second per camera')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--steps', help='comma-separated camera counts to ramp through, e.g. 10,50,100')
+    parser.add_argument('--step-duration', type=float, default=20)
+    parser.add_argument('--connections', type=int, default=100, help='HTTP connection pool size')
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--listeners', type=int, default=0, help='Socket.IO clients measuring broadcast delay')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+
+    if not args.cameras and not args.steps:
+        send_test_payload(args.url.rstrip('/') + '/api/crowd/heatmap')
+        return
+
+    report = asyncio.run(load_test(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Pluggable person trackers behind one call
+
+    tracker = create_tracker(os.environ.get('TRACKER', 'ultralytics'), model, conf=0.5, classes=[0])
+    boxes, track_ids, confidences, classes = tracker(frame)
+
+- ultralytics: model.track(persist=True), ByteTrack/BoT-SORT inside ultralytics (the default)
+- sort:        model.predict + the pure-NumPy SortTracker (sort_tracker.py), for CPU-only nodes
+- deepsort:    model.predict + the DeepSORT wrapper (tracker.py); needs TensorFlow and
+               model_data/mars-small128.pb
+
+Every tracker returns plain arrays: boxes (n, 4) float xyxy, track_ids (n,) int
+(-1 while a track is not confirmed), confidences (n,) float and classes (n,) int.
+
+With a detection cache entry (detection_cache.py) and the frame's index in the
+file, YOLO only runs on frames not cached yet; tracking always runs. The
+ultralytics option then feeds ultralytics' own tracker (the one model.track uses)
+with the cached detections.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+
+
+TRACKERS = ('ultralytics', 'sort', 'deepsort')
+
+
+def _empty():
+    return np.zeros((0, 4), np.float32), np.zeros(0, int), np.zeros(0, np.float32), np.zeros(0, int)
+
+
+def _arrays(results):
+    boxes = results[0].boxes
+    if boxes is None or len(boxes) == 0:
+        return _empty()
+    xyxy = boxes.xyxy.cpu().numpy().astype(np.float32)
+    ids = boxes.id.cpu().numpy().astype(int) if boxes.id is not None else np.full(len(xyxy), -1)
+    return xyxy, ids, boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy().astype(int)
+
+
+class Detection:
+    """YOLO predict for the trackers, read from a detection cache entry when there is one"""
+
+    def __init__(self, model, classes=(0,), cache=None):
+        self.model = model
+        self.classes = list(classes) if classes is not None else None
+        self.cache = cache
+
+    def detect(self, frame, conf, frame_index=None):
+        """(boxes, confidences, classes) at or above conf"""
+        if self.cache is None or frame_index is None:
+            boxes, _, confidences, classes = _arrays(
+                self.model.predict(frame, conf=conf, classes=self.classes, verbose=False))
+            return boxes, confidences, classes
+
+        cached = self.cache.get(frame_index)
+        if cached is None:
+            boxes, _, confidences, classes = _arrays(
+                self.model.predict(frame, conf=self.cache.conf, classes=self.classes, verbose=False))
+            self.cache.put(frame_index, boxes, confidences, classes)
+            cached = boxes, confidences, classes
+        boxes, confidences, classes = cached
+        keep = confidences >= conf
+        return boxes[keep], confidences[keep], classes[keep]
+
+
+class UltralyticsTracking(Detection):
+    """ultralytics' built-in tracker; state lives on the model"""
+
+    def __init__(self, model, conf=0.5, classes=(0,), config=None, cache=None):
+        super().__init__(model, classes, cache)
+        self.conf = conf
+        # 'bytetrack.yaml' or 'botsort.yaml'; ultralytics' default when None
+        self.config = config
+        self._tracker = None
+
+    def __call__(self, frame, frame_index=None):
+        if self.cache is None or frame_index is None:
+            options = {'tracker': self.config} if self.config else {}
+            results = self.model.track(frame, persist=True, conf=self.conf, classes=self.classes, verbose=False,
+                                       **options)
+            return _arrays(results)
+
+        boxes, confidences, classes = self.detect(frame, self.conf, frame_index)
+        if self._tracker is None:
+            self._tracker = self._create_tracker()
+        xywh = np.concatenate([(boxes[:, :2] + boxes[:, 2:]) / 2, boxes[:, 2:] - boxes[:, :2]], axis=1)
+        tracks = self._tracker.update(SimpleNamespace(xyxy=boxes, xywh=xywh, conf=confidences, cls=classes), frame)
+        if len(tracks) == 0:
+            return _empty()
+        # Rows are [x1, y1, x2, y2, id, score, cls, detection index]
+        return (tracks[:, :4].astype(np.float32), tracks[:, 4].astype(int), tracks[:, 5].astype(np.float32),
+                tracks[:, 6].astype(int))
+
+    def _create_tracker(self):
+        """The tracker model.track would build, from the same yaml config"""
+        from ultralytics.trackers.track import TRACKER_MAP
+        from ultralytics.utils import IterableSimpleNamespace, yaml_load
+        from ultralytics.utils.checks import check_yaml
+
+        config = IterableSimpleNamespace(**yaml_load(check_yaml(self.config or 'botsort.yaml')))
+        return TRACKER_MAP[config.tracker_type](args=config, frame_rate=30)
+
+
+class SortTracking(Detection):
+    """
+    Detection with YOLO, association with SortTracker
+    YOLO runs at the tracker's low threshold so the second (low-score) pass has
+    something to match; only tracked boxes at or above conf are returned.
+    """
+
+    def __init__(self, model, conf=0.5, classes=(0,), cache=None, **options):
+        from sort_tracker import SortTracker
+
+        super().__init__(model, classes, cache)
+        self.conf = conf
+        options.setdefault('high_thresh', conf)
+        self.tracker = SortTracker(**options)
+
+    def __call__(self, frame, frame_index=None):
+        return self.update(*self.detect(frame, self.tracker.low_thresh, frame_index))
+
+    def update(self, boxes, confidences, classes):
+        track_ids = self.tracker.update(boxes, confidences)
+        # Low-score detections only count when they extend a track
+        keep = (confidences >= self.conf) | (track_ids >= 0)
+        return boxes[keep], track_ids[keep], confidences[keep], classes[keep]
+
+
+class DeepSortTracking(Detection):
+    """Detection with YOLO, association with the DeepSORT wrapper (appearance features)"""
+
+    def __init__(self, model, conf=0.5, classes=(0,), cache=None):
+        from tracker import Tracker
+
+        super().__init__(model, classes, cache)
+        self.conf = conf
+        self.tracker = Tracker()
+
+    def __call__(self, frame, frame_index=None):
+        return self.update(frame, *self.detect(frame, self.conf, frame_index))
+
+    def update(self, frame, boxes, confidences, classes):
+        self.tracker.update(frame, [[*box, score] for box, score in zip(boxes.tolist(), confidences.tolist())])
+        if not self.tracker.tracks:
+            return _empty()
+        # DeepSORT reports its own filtered boxes; classes/confidences are matched back by IoU
+        from sort_tracker import iou_matrix
+
+        track_boxes = np.array([t.bbox for t in self.tracker.tracks], np.float32)
+        track_ids = np.array([t.track_id for t in self.tracker.tracks], int)
+        track_conf = np.zeros(len(track_boxes), np.float32)
+        track_cls = np.zeros(len(track_boxes), int)
+        if len(boxes):
+            nearest = iou_matrix(track_boxes, boxes).argmax(axis=1)
+            track_conf, track_cls = confidences[nearest], classes[nearest]
+        return track_boxes, track_ids, track_conf, track_cls
+
+
+def create_tracker(name, model, conf=0.5, classes=(0,), cache=None, **options):
+    """
+    Tracker by name (TRACKERS); options go to the tracker (e.g. max_age for sort),
+    cache is a detection_cache.VideoDetections for the file being read
+    """
+    if name == 'ultralytics':
+        return UltralyticsTracking(model, conf, classes, cache=cache, **options)
+    if name == 'sort':
+        return SortTracking(model, conf, classes, cache=cache, **options)
+    if name == 'deepsort':
+        return DeepSortTracking(model, conf, classes, cache=cache, **options)
+    raise ValueError(f'Unknown tracker {name!r}, expected one of {TRACKERS}')
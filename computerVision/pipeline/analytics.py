@@ -0,0 +1,240 @@
+import random
+import time
+
+import cv2
+import numpy as np
+
+from heatmap_core import (SEND_INTERVAL, GRID_SIZE, ReportPolicy, default_zones, analyze_zones, apply_gaussian_blur,
+                          render_heatmap_overlay, draw_zones, draw_zone_stats, send_heatmap_to_backend)
+from heatmap_history import HeatmapHistory
+from crowd_forecast import CrowdForecaster
+from crush_risk import CrushRisk
+from crowd_motion import CrowdMotion
+from fall_detector import FallDetector
+from fall_alerts import FallAlertPublisher
+
+
+PERSON_CLASS = 0
+
+colors = [(random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)) for j in range(50)]
+
+
+class Analytic:
+    """
+    A consumer of the shared detection pass
+    process() gets every sampled frame of its stream with that frame's detections;
+    draw() is only called when the stream is displayed or recorded.
+    """
+
+    name = None
+
+    def __init__(self, stream_id, frame_size, **options):
+        self.stream_id = stream_id
+        self.frame_width, self.frame_height = frame_size
+        self.options = options
+
+    def process(self, frame, detections, t):
+        pass
+
+    def draw(self, frame):
+        return frame
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+class ZoneHeatmap(Analytic):
+    """Zone counts and density heatmap, sent to the crowd heatmap API (heatmap_monitor.py)"""
+
+    name = 'heatmap'
+
+    def __init__(self, stream_id, frame_size, send_interval=SEND_INTERVAL, grid_size=GRID_SIZE, zones=None,
+                 history=None, report_policy=None, crush_risk=None, floor_view=None, motion=None, **options):
+        super().__init__(stream_id, frame_size, **options)
+        self.send_interval = send_interval
+        self.grid_size = grid_size
+        self.zones = zones or default_zones(self.frame_width, self.frame_height)
+        # Optional local history file of every interval
+        self.history = None
+        if history:
+            self.history = HeatmapHistory(history, zone_ids=list(self.zones), grid_size=grid_size,
+                                          interval=send_interval)
+        self.forecaster = CrowdForecaster(self.zones, interval=send_interval)
+        if self.history is not None:
+            self.forecaster.seed(self.history)
+        # Local density per person; crush_risk overrides radius_m/threshold/min_people, and a
+        # floor-plan calibration (floor_view) makes the distances metric
+        self.crush_risk = CrushRisk(view=floor_view, **(crush_risk or {}))
+        # Optical-flow motion field (counter-flow, surges); motion overrides CrowdMotion's settings
+        self.motion = CrowdMotion(self.frame_width, self.frame_height, grid_size, **(motion or {}))
+        # Per-zone change/heartbeat reporting; report_policy overrides REPORT_POLICY
+        self.report_policy = ReportPolicy(report_policy)
+        self.heatmap_grid = None
+        self.zones_data = []
+        self.people = 0
+        self.last_sample_time = time.time()
+        self.sent = 0
+
+    def process(self, frame, detections, t):
+        people = detections.tracked(PERSON_CLASS)
+        self.people = len(people)
+        self.heatmap_grid, self.zones_data = analyze_zones(people.boxes, people.track_ids, self.zones,
+                                                           self.frame_width, self.frame_height, self.grid_size)
+        self.crush_risk.analyze(people.boxes)
+        self.crush_risk.annotate(self.zones_data, self.zones)
+        self.motion.update(frame, t)
+        self.motion.annotate(self.zones_data, self.zones)
+
+        current_time = time.time()
+        if current_time - self.last_sample_time >= self.send_interval:
+            self.forecaster.update(current_time, {z['zoneId']: z['peopleCount'] for z in self.zones_data})
+            if self.history is not None:
+                self.history.append(current_time, self.heatmap_grid, self.zones_data, self.people)
+            self.last_sample_time = current_time
+
+        self.forecaster.describe(self.zones_data)
+        reason = self.report_policy.should_send(current_time, self.zones_data)
+        if reason:
+            delivered = send_heatmap_to_backend(self.zones_data, self.people, self.frame_width, self.frame_height,
+                                                camera_id=self.stream_id)
+            self.report_policy.sent(current_time, self.zones_data, reason, delivered)
+            self.sent += delivered
+
+    def draw(self, frame):
+        if self.heatmap_grid is None:
+            return frame
+        frame = render_heatmap_overlay(frame, apply_gaussian_blur(self.heatmap_grid.astype(np.float32)))
+        draw_zones(frame, self.zones)
+        draw_zone_stats(frame, self.zones, self.zones_data)
+        self.crush_risk.draw(frame)
+        self.motion.draw(frame)
+        return frame
+
+    def stats(self):
+        return {'people': self.people, 'sent': self.sent, 'reports': self.report_policy.stats(),
+                'crush_risk': self.crush_risk.stats(), 'motion': self.motion.stats()}
+
+    def close(self):
+        if self.history is not None:
+            self.history.close()
+
+
+class PeopleCounter(Analytic):
+    """Tracked people with ids and a running count (objectdetection/main.py)"""
+
+    name = 'counting'
+
+    def __init__(self, stream_id, frame_size, **options):
+        super().__init__(stream_id, frame_size, **options)
+        self.current = 0
+        self.peak = 0
+        self.seen_ids = set()
+        self.people = None
+
+    def process(self, frame, detections, t):
+        self.people = detections.tracked(PERSON_CLASS)
+        self.current = len(self.people)
+        self.peak = max(self.peak, self.current)
+        self.seen_ids.update(int(i) for i in self.people.track_ids)
+
+    def draw(self, frame):
+        if self.people is None:
+            return frame
+        for box, track_id, conf in zip(self.people.boxes, self.people.track_ids, self.people.confidences):
+            x1, y1, x2, y2 = map(int, box)
+            color = colors[track_id % len(colors)]
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 3)
+            cv2.putText(frame, f'ID: {track_id} ({conf:.2f})', (x1, y1 - 10),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+        cv2.rectangle(frame, (10, 80), (300, 120), (0, 0, 0), -1)
+        cv2.putText(frame, f'People Count: {self.current}', (20, 105),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        return frame
+
+    def stats(self):
+        return {'people': self.current, 'peak': self.peak, 'unique': len(self.seen_ids)}
+
+
+class FallDetection(Analytic):
+    """Track-aware fall detection with alerts to the emergency API (falldetection/main.py)"""
+
+    name = 'fall'
+
+    def __init__(self, stream_id, frame_size, location=None, publish=True, **options):
+        super().__init__(stream_id, frame_size)
+        self.detector = FallDetector(**options)
+        self.alerts = None
+        if publish:
+            self.alerts = FallAlertPublisher(camera_id=stream_id, location=location or f'Camera {stream_id}')
+            self.alerts.start()
+        self.people = None
+        self.fallen = np.zeros(0, bool)
+        self.falls = 0
+
+    def process(self, frame, detections, t):
+        self.people = detections.tracked(PERSON_CLASS)
+        self.fallen, events = self.detector.update(self.people.track_ids, self.people.boxes, t)
+        self.falls += len(events)
+        if self.alerts is not None:
+            for event in events:
+                self.alerts.publish(event)
+
+    def draw(self, frame):
+        if self.people is None:
+            return frame
+        for box, is_fallen in zip(self.people.boxes, self.fallen):
+            if is_fallen:
+                x1, y1, x2, y2 = map(int, box)
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
+                cv2.putText(frame, 'PERSON FALL DETECTED', (x1, max(y1 - 30, 20)),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+        return frame
+
+    def stats(self):
+        stats = {'falls': self.falls, 'tracked': self.detector.tracked}
+        if self.alerts is not None:
+            stats.update({'alerts_' + k: v for k, v in self.alerts.stats().items()})
+        return stats
+
+    def close(self):
+        if self.alerts is not None:
+            self.alerts.stop()
+
+
+class Recorder(Analytic):
+    """
+    Writes the annotated stream to a video file
+    Runs last, so its draw() receives the frame with every other analytic's overlay.
+    """
+
+    name = 'record'
+
+    def __init__(self, stream_id, frame_size, path=None, fps=30.0, **options):
+        super().__init__(stream_id, frame_size, **options)
+        self.path = path or f'{stream_id}.mp4'
+        self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*'MP4V'), fps, tuple(frame_size))
+        self.written = 0
+
+    def draw(self, frame):
+        self.writer.write(frame)
+        self.written += 1
+        return frame
+
+    def stats(self):
+        return {'written': self.written}
+
+    def close(self):
+        self.writer.release()
+
+
+# Order matters: the recorder sees the overlays drawn before it
+ANALYTICS = {
+    'heatmap': ZoneHeatmap,
+    'counting': PeopleCounter,
+    'fall': FallDetection,
+    'record': Recorder,
+}
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class Detections:
+    """
+    One frame's detect/track output as plain arrays, shared by every analytic
+    boxes: (n, 4) float xyxy, track_ids: (n,) int (-1 when the tracker gave no id),
+    confidences: (n,) float, classes: (n,) int
+    """
+
+    def __init__(self, boxes, track_ids, confidences, classes):
+        self.boxes = boxes
+        self.track_ids = track_ids
+        self.confidences = confidences
+        self.classes = classes
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, int), np.zeros(0, np.float32), np.zeros(0, int))
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def tracked(self, class_id=None):
+        """Subset with a track id, optionally of one class"""
+        keep = self.track_ids >= 0
+        if class_id is not None:
+            keep &= self.classes == class_id
+        return Detections(self.boxes[keep], self.track_ids[keep], self.confidences[keep], self.classes[keep])
+
+
+class Detector:
+    """
+    YOLO detect + track for one stream
+    Each stream gets its own model instance because the tracker state lives on
+    the model (persist=True) or in the tracker; all analytics of the stream share
+    its output. tracker is a name from objectdetection/trackers.py; cache is a
+    detection_cache.VideoDetections entry when the source is a file.
+    """
+
+    def __init__(self, model_path='yolov8n.pt', conf=0.5, classes=(0,), tracker='ultralytics', tracker_options=None,
+                 cache=None):
+        from ultralytics import YOLO
+        from trackers import create_tracker
+
+        self.model = YOLO(model_path)
+        self.conf = conf
+        self.classes = list(classes) if classes is not None else None
+        self.cache = cache
+        self.tracker = create_tracker(tracker, self.model, conf=conf, classes=self.classes, cache=cache,
+                                      **(tracker_options or {}))
+        self.frames = 0
+
+    def detect(self, frame, frame_index=None):
+        boxes, track_ids, confidences, classes = self.tracker(frame, frame_index)
+        self.frames += 1
+        return Detections(boxes, track_ids, confidences, classes)
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,330 @@
+"""
+Unified video analytics pipeline
+
+Each stream is decoded once and gets one YOLO detect/track pass per sampled
+frame; the detections fan out to the analytics enabled for that stream
+(zone heatmap, people counting, fall detection, recording). All streams are
+served round-robin from one process, so the model code, Python runtime and
+analytics are loaded once instead of once per script.
+
+Usage:
+    python run_pipeline.py [pipeline.json] [--display] [--max-frames 500]
+    python run_pipeline.py pipeline.json --baseline --max-frames 300
+
+--baseline runs the same work twice, each time in child processes: first as
+this shared pipeline, then as one process per (stream, analytic) pair, each with
+its own decode and detection, the way the standalone scripts run. It reports
+the CPU time of both so the saving can be tracked.
+
+pipeline.json:
+    {"model": "yolov8n.pt", "conf": 0.5, "tracker": "ultralytics",
+     "streams": [{"stream_id": "gate-1", "source": "people.mp4", "stride": 1,
+                  "analytics": {"heatmap": {}, "counting": {}, "fall": {"enabled": false},
+                                "record": {"path": "gate-1.mp4"}}}]}
+An analytic runs when its key is present and "enabled" is not false; the other
+keys are passed to the analytic. Relative paths resolve against the config file.
+"tracker" (ultralytics, sort or deepsort, see objectdetection/trackers.py) can be
+set for all streams or per stream, with "tracker_options" passed to it.
+"detection_cache": {"path": "cache", "max_gb": 2} keeps the detections of file
+sources (objectdetection/detection_cache.py), so replays only decode.
+"floor_plan": "floorplan.json" fuses the people of all calibrated streams into one
+site-wide people-per-square-metre grid (objectdetection/floor_plan.py); with
+--display it is shown in its own window. The heatmap of a calibrated stream then
+also measures local crush-risk density in metres (objectdetection/crush_risk.py).
+The heatmap also tracks crowd motion by optical flow (objectdetection/crowd_motion.py);
+its "motion" option overrides the flow settings.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(script_dir, '..', 'common'))
+sys.path.insert(0, os.path.join(script_dir, '..', 'objectdetection'))
+sys.path.insert(0, os.path.join(script_dir, '..', '..', 'falldetection'))
+
+from frame_source import FrameSource
+from detection_cache import DetectionCache
+from floor_plan import FloorPlan
+from detection import Detector
+from analytics import ANALYTICS
+
+
+def resolve_source(source, base_dir):
+    if isinstance(source, int) or str(source).isdigit():
+        return int(source)
+    if '://' in str(source):
+        return source
+    return os.path.join(base_dir, source)
+
+
+def enabled_analytics(config):
+    return [name for name in ANALYTICS
+            if name in config.get('analytics', {}) and config['analytics'][name].get('enabled', True)]
+
+
+class Stream:
+    """One source, its detector and the analytics consuming it"""
+
+    def __init__(self, config, base_dir, model_path, conf, tracker='ultralytics', tracker_options=None,
+                 detection_cache=None, floor_plan=None, only=None):
+        self.stream_id = config['stream_id']
+        self.source = FrameSource(resolve_source(config['source'], base_dir), stride=config.get('stride', 1),
+                                  realtime=config.get('realtime', False), loop=config.get('loop', False))
+        if not self.source.is_opened():
+            raise RuntimeError(f"Stream {self.stream_id}: could not open {config['source']}")
+
+        self.resize = tuple(config['resize']) if config.get('resize') else None
+        frame_size = self.resize or self.source.frame_size
+        cache = None
+        if detection_cache is not None and not self.source.live:
+            cache = detection_cache.open(self.source.source, model_path, classes=[0], frame_size=list(frame_size))
+        self.detector = Detector(model_path, conf=conf, tracker=config.get('tracker', tracker),
+                                 tracker_options=config.get('tracker_options', tracker_options), cache=cache)
+
+        # Streams without a calibration are left out of the floor plan
+        self.floor_plan = floor_plan if floor_plan is not None and self.stream_id in floor_plan.cameras else None
+        if self.floor_plan is not None:
+            # Image points are pixels of the calibrated frame size; any other size projects wrongly
+            calibrated = tuple(self.floor_plan.cameras[self.stream_id].frame_size)
+            if calibrated != tuple(frame_size):
+                raise RuntimeError(f"Stream {self.stream_id}: floor plan calibration is for {calibrated[0]}x"
+                                   f"{calibrated[1]} frames, the stream delivers {frame_size[0]}x{frame_size[1]}; "
+                                   f"set 'resize' or recalibrate")
+
+        self.analytics = []
+        for name in enabled_analytics(config):
+            if only is not None and name not in only:
+                continue
+            options = {k: v for k, v in config['analytics'][name].items() if k != 'enabled'}
+            if name == 'record':
+                options.setdefault('fps', self.source.fps / self.source.stride)
+                if 'path' in options:
+                    options['path'] = os.path.join(base_dir, options['path'])
+            if name == 'heatmap' and options.get('history'):
+                options['history'] = os.path.join(base_dir, options['history'])
+            if name == 'heatmap' and self.floor_plan is not None:
+                options['floor_view'] = self.floor_plan.cameras[self.stream_id]
+            self.analytics.append(ANALYTICS[name](self.stream_id, frame_size, **options))
+
+        self.frames = 0
+        self.detect_time = 0.0
+        self.analytics_time = 0.0
+        self.done = False
+
+    def step(self, annotate=False):
+        """Read, detect and fan out one frame; returns the annotated frame when asked"""
+        index, frame = self.source.read()
+        if frame is None:
+            self.done = True
+            return None
+        if self.resize:
+            frame = cv2.resize(frame, self.resize)
+
+        # Video time across loops, used by analytics that measure speed
+        t = (self.source.decoded + self.source.skipped) / self.source.fps
+
+        started = time.perf_counter()
+        detections = self.detector.detect(frame, index)
+        self.detect_time += time.perf_counter() - started
+
+        if self.floor_plan is not None:
+            self.floor_plan.update(self.stream_id, detections.tracked(0).boxes)
+
+        started = time.perf_counter()
+        for analytic in self.analytics:
+            analytic.process(frame, detections, t)
+
+        # Overlays are only drawn when someone looks at them
+        if annotate or any(a.name == 'record' for a in self.analytics):
+            for analytic in self.analytics:
+                frame = analytic.draw(frame)
+        self.analytics_time += time.perf_counter() - started
+
+        self.frames += 1
+        return frame
+
+    def stats(self):
+        stats = {
+            'frames': self.frames,
+            'detect_ms': round(1000 * self.detect_time / self.frames, 2) if self.frames else 0.0,
+            'analytics_ms': round(1000 * self.analytics_time / self.frames, 2) if self.frames else 0.0,
+            **self.source.stats(),
+        }
+        if self.detector.cache is not None:
+            stats.update({f'detection_{k}': v for k, v in self.detector.cache.stats().items()})
+        for analytic in self.analytics:
+            stats.update({f'{analytic.name}_{k}': v for k, v in analytic.stats().items()})
+        return stats
+
+    def close(self):
+        for analytic in self.analytics:
+            analytic.close()
+        self.detector.close()
+        self.source.release()
+
+
+def load_config(path):
+    with open(path) as f:
+        config = json.load(f)
+    return config, os.path.dirname(os.path.abspath(path))
+
+
+def run(config, base_dir, display=False, max_frames=None, only=None, report_every=10.0):
+    """Serve all streams round-robin until they end; returns a summary dict"""
+    detection_cache = None
+    if config.get('detection_cache'):
+        cache_config = config['detection_cache']
+        detection_cache = DetectionCache(os.path.join(base_dir, cache_config.get('path', 'cache')),
+                                         max_bytes=int(cache_config.get('max_gb', 2) * (1 << 30)))
+    floor_plan = FloorPlan.from_file(os.path.join(base_dir, config['floor_plan'])) if config.get('floor_plan') else None
+
+    streams = []
+    for stream_config in config['streams']:
+        if only is not None and stream_config['stream_id'] not in only:
+            continue
+        streams.append(Stream(stream_config, base_dir, config.get('model', 'yolov8n.pt'),
+                              config.get('conf', 0.5), tracker=config.get('tracker', 'ultralytics'),
+                              tracker_options=config.get('tracker_options'), detection_cache=detection_cache,
+                              floor_plan=floor_plan, only=only.get(stream_config['stream_id']) if only else None))
+
+    cpu_start = time.process_time()
+    wall_start = time.time()
+    last_report = wall_start
+
+    active = list(streams)
+    while active:
+        for stream in list(active):
+            frame = stream.step(annotate=display)
+            if frame is None or (max_frames and stream.frames >= max_frames):
+                active.remove(stream)
+                continue
+            if display:
+                cv2.namedWindow(stream.stream_id, cv2.WINDOW_NORMAL)
+                cv2.imshow(stream.stream_id, frame)
+        if display and floor_plan is not None:
+            cv2.namedWindow('floor plan', cv2.WINDOW_NORMAL)
+            cv2.imshow('floor plan', floor_plan.render())
+
+        if display and cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+        if time.time() - last_report >= report_every:
+            for stream in streams:
+                print(stream.stream_id, stream.stats())
+            if floor_plan is not None:
+                print('floor plan', floor_plan.stats())
+            last_report = time.time()
+
+    summary = {
+        'cpu_s': round(time.process_time() - cpu_start, 2),
+        'wall_s': round(time.time() - wall_start, 2),
+        'streams': {stream.stream_id: stream.stats() for stream in streams},
+    }
+    if floor_plan is not None:
+        summary['floor_plan'] = floor_plan.stats()
+    for stream in streams:
+        stream.close()
+    if display:
+        cv2.destroyAllWindows()
+    return summary
+
+
+def run_child(config_path, max_frames, only=None):
+    """Run the pipeline in a child process and return its summary"""
+    fd, summary_path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    cmd = [sys.executable, os.path.abspath(__file__), config_path, '--summary-json', summary_path]
+    if max_frames:
+        cmd += ['--max-frames', str(max_frames)]
+    if only:
+        cmd += ['--only', only]
+
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    with open(summary_path) as f:
+        summary = json.load(f)
+    os.remove(summary_path)
+    return summary
+
+
+def baseline(config_path, config, max_frames):
+    """CPU of the shared pipeline versus one process per (stream, analytic)"""
+    print("Running shared pipeline...")
+    shared = run_child(config_path, max_frames)
+    shared_cpu = shared['process_cpu_s']
+
+    separate_cpu = 0.0
+    separate = {}
+    for stream_config in config['streams']:
+        for name in enabled_analytics(stream_config):
+            key = f"{stream_config['stream_id']}:{name}"
+            print(f"Running {key} alone...")
+            result = run_child(config_path, max_frames, only=key)
+            separate[key] = result['process_cpu_s']
+            separate_cpu += separate[key]
+
+    report = {
+        'max_frames': max_frames,
+        'shared_cpu_s': round(shared_cpu, 2),
+        'separate_cpu_s': round(separate_cpu, 2),
+        'separate': separate,
+        'saved_cpu_s': round(separate_cpu - shared_cpu, 2),
+        'saved_percent': round(100.0 * (separate_cpu - shared_cpu) / separate_cpu, 1) if separate_cpu else 0.0,
+        'shared_streams': shared['streams'],
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def parse_only(value):
+    """'stream' or 'stream:analytic[,stream:analytic]' -> {stream_id: [analytics] or None}"""
+    only = {}
+    for item in value.split(','):
+        stream_id, _, name = item.partition(':')
+        if name:
+            only.setdefault(stream_id, [])
+            if only[stream_id] is not None:
+                only[stream_id].append(name)
+        else:
+            only[stream_id] = None
+    return only
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('config', nargs='?', default=os.path.join(script_dir, 'pipeline.json'))
+    parser.add_argument('--display', action='store_true')
+    parser.add_argument('--max-frames', type=int, help='stop each stream after this many sampled frames')
+    parser.add_argument('--only', help="restrict to 'stream' or 'stream:analytic' (comma separated)")
+    parser.add_argument('--baseline', action='store_true', help='compare CPU against separate processes')
+    parser.add_argument('--summary-json', help='write the run summary to this file')
+    parser.add_argument('--report-every', type=float, default=10.0)
+    args = parser.parse_args()
+
+    config, base_dir = load_config(args.config)
+
+    if args.baseline:
+        baseline(os.path.abspath(args.config), config, args.max_frames)
+        return
+
+    only = parse_only(args.only) if args.only else None
+    summary = run(config, base_dir, display=args.display, max_frames=args.max_frames, only=only,
+                  report_every=args.report_every)
+    # cpu_s covers the frame loop; process_cpu_s also counts imports and model loading
+    times = os.times()
+    summary['process_cpu_s'] = round(times.user + times.system, 2)
+
+    print(json.dumps(summary, indent=2))
+    if args.summary_json:
+        with open(args.summary_json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Fall detection benchmark
+
+Runs YOLO tracking over a video once and replays the detections through
+- legacy: the old per-frame DataFrame / iterrows path, flagging any person box
+  wider than tall
+- tracked: FallDetector (per-track history with temporal confirmation)
+and reports the per-frame cost of each stage and how often each raises a fall.
+
+With a ground-truth file (JSON list of [start_s, end_s] intervals in video time
+where a real fall is visible) false positives are counted: flagged frames and
+alerts that fall outside every interval (plus --tolerance seconds).
+
+Detections can be saved with --save-detections and replayed with --detections,
+so thresholds can be tuned without running the model again.
+
+Usage:
+    python benchmark_fall.py fall.mp4
+    python benchmark_fall.py fall.mp4 --truth fall_truth.json --save-detections fall_dets.npz
+    python benchmark_fall.py --detections fall_dets.npz --truth fall_truth.json --drop-speed 0.6
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'computerVision', 'common'))
+
+from frame_source import FrameSource
+from fall_detector import FallDetector
+
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_class_list():
+    with open(os.path.join(script_dir, 'coco.txt'), 'r') as f:
+        return f.read().split("\n")
+
+
+def run_detection(video_path, stride, model_path):
+    """Track every stride-th frame; returns per-frame rows [x1, y1, x2, y2, track_id, conf, cls] and times"""
+    from ultralytics import YOLO
+    import cv2
+
+    model = YOLO(model_path)
+    source = FrameSource(video_path, stride=stride)
+    if not source.is_opened():
+        sys.exit(f"Could not open video: {video_path}")
+
+    frames, times, costs = [], [], []
+    for index, frame in source:
+        frame = cv2.resize(frame, (1020, 600))
+        started = time.perf_counter()
+        results = model.track(frame, persist=True, verbose=False)
+        costs.append(time.perf_counter() - started)
+
+        boxes = results[0].boxes
+        ids = boxes.id.cpu().numpy() if boxes.id is not None else np.full(len(boxes), -1)
+        frames.append(np.column_stack([boxes.xyxy.cpu().numpy(), ids,
+                                       boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy()]).astype(np.float32))
+        times.append(index / source.fps)
+    source.release()
+    return frames, np.array(times), np.array(costs)
+
+
+def save_detections(path, frames, times):
+    counts = np.array([len(f) for f in frames])
+    rows = np.concatenate(frames) if frames else np.zeros((0, 7), np.float32)
+    np.savez_compressed(path, rows=rows, counts=counts, times=times)
+
+
+def load_detections(path):
+    data = np.load(path)
+    bounds = np.cumsum(data['counts'])[:-1]
+    return np.split(data['rows'], bounds), data['times']
+
+
+def legacy_stage(rows, class_list):
+    """Per-frame work of the old main.py, without drawing; True when any person is flagged"""
+    # The old code passed the raw boxes.data (x1, y1, x2, y2, conf, cls) to pandas
+    px = pd.DataFrame(rows[:, [0, 1, 2, 3, 5, 6]]).astype("float")
+    flagged = False
+    for index, row in px.iterrows():
+        x1 = int(row[0])
+        y1 = int(row[1])
+        x2 = int(row[2])
+        y2 = int(row[3])
+        d = int(row[5])
+        c = class_list[d]
+        if 'person' in c:
+            if (y2 - y1) - (x2 - x1) < 0:
+                flagged = True
+    return flagged
+
+
+def tracked_stage(rows, t, detector, person_class):
+    person = (rows[:, 6] == person_class) & (rows[:, 4] >= 0)
+    fallen, events = detector.update(rows[person, 4].astype(int), rows[person, :4], t)
+    return bool(fallen.any()), events
+
+
+def outside(t, truth, tolerance):
+    return not any(start - tolerance <= t <= end + tolerance for start, end in truth)
+
+
+def percentile_ms(costs, q):
+    return round(float(np.percentile(costs, q)) * 1000, 3) if len(costs) else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('video', nargs='?', default=os.path.join(script_dir, 'fall.mp4'))
+    parser.add_argument('--stride', type=int, default=3)
+    parser.add_argument('--model', default='yolov8n.pt')
+    parser.add_argument('--detections', help='replay detections saved with --save-detections')
+    parser.add_argument('--save-detections')
+    parser.add_argument('--truth', help='JSON list of [start_s, end_s] fall intervals')
+    parser.add_argument('--tolerance', type=float, default=1.0)
+    parser.add_argument('--history', type=int, default=16)
+    parser.add_argument('--confirm-frames', type=int, default=3)
+    parser.add_argument('--drop-speed', type=float, default=0.8)
+    parser.add_argument('--repeat', type=int, default=5, help='replays used for stage timing')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    class_list = load_class_list()
+    person_class = class_list.index('person')
+
+    detect_costs = np.array([])
+    if args.detections:
+        frames, times = load_detections(args.detections)
+    else:
+        frames, times, detect_costs = run_detection(args.video, args.stride, args.model)
+        if args.save_detections:
+            save_detections(args.save_detections, frames, times)
+
+    truth = None
+    if args.truth:
+        with open(args.truth) as f:
+            truth = json.load(f)
+
+    legacy_costs, tracked_costs = [], []
+    legacy_flags, tracked_flags, alerts = [], [], []
+    for repeat in range(args.repeat):
+        detector = FallDetector(history=args.history, confirm_frames=args.confirm_frames,
+                                drop_speed=args.drop_speed)
+        for rows, t in zip(frames, times):
+            started = time.perf_counter()
+            legacy = legacy_stage(rows, class_list)
+            legacy_costs.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            tracked, events = tracked_stage(rows, t, detector, person_class)
+            tracked_costs.append(time.perf_counter() - started)
+
+            if repeat == 0:
+                legacy_flags.append(legacy)
+                tracked_flags.append(tracked)
+                alerts.extend(events)
+
+    legacy_flags = np.array(legacy_flags, bool)
+    tracked_flags = np.array(tracked_flags, bool)
+    # The old script had no notion of an episode; every flagged frame was an alert
+    legacy_alerts = int(legacy_flags.sum())
+
+    report = {
+        'frames': len(frames),
+        'detections_per_frame': round(float(np.mean([len(f) for f in frames])), 2) if frames else 0.0,
+        'detect_ms': {'p50': percentile_ms(detect_costs, 50), 'p95': percentile_ms(detect_costs, 95)},
+        'legacy': {
+            'stage_ms': {'p50': percentile_ms(legacy_costs, 50), 'p95': percentile_ms(legacy_costs, 95)},
+            'flagged_frames': int(legacy_flags.sum()),
+            'alerts': legacy_alerts,
+        },
+        'tracked': {
+            'stage_ms': {'p50': percentile_ms(tracked_costs, 50), 'p95': percentile_ms(tracked_costs, 95)},
+            'flagged_frames': int(tracked_flags.sum()),
+            'alerts': len(alerts),
+            'events': alerts,
+        },
+    }
+
+    if truth is not None:
+        negative = np.array([outside(t, truth, args.tolerance) for t in times], bool)
+        n_negative = max(int(negative.sum()), 1)
+        report['negative_frames'] = int(negative.sum())
+        report['legacy']['false_positive_rate'] = round(float((legacy_flags & negative).sum()) / n_negative, 4)
+        report['legacy']['false_alerts'] = int((legacy_flags & negative).sum())
+        report['tracked']['false_positive_rate'] = round(float((tracked_flags & negative).sum()) / n_negative, 4)
+        report['tracked']['false_alerts'] = sum(outside(e['t'], truth, args.tolerance) for e in alerts)
+        report['tracked']['missed_falls'] = sum(
+            not any(start - args.tolerance <= e['t'] <= end + args.tolerance for e in alerts)
+            for start, end in truth)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import queue
+import threading
+import time
+
+import requests
+
+
+EMERGENCY_URL = "http://localhost:5000/api/emergency/guest"
+
+
+class FallAlertPublisher:
+    """
+    Posts confirmed falls to the emergency API from a background thread
+    publish() never blocks the video loop; when the backend is down alerts are
+    retried with backoff, and if the queue fills up the oldest alert is dropped.
+    """
+
+    def __init__(self, camera_id='fall-cam-1', location='Camera fall-cam-1', url=EMERGENCY_URL,
+                 timeout=3, retries=3, max_queue=100):
+        self.camera_id = camera_id
+        self.location = location
+        self.url = url
+        self.timeout = timeout
+        self.retries = retries
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Give queued alerts a chance to go out, then stop the worker"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def publish(self, event):
+        event.setdefault('detectedAt', time.time())
+        while True:
+            try:
+                self._queue.put_nowait(event)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _payload(self, event):
+        detected_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event['detectedAt']))
+        return {
+            'type': 'medical',
+            'priority': 'critical',
+            'name': f'Fall detection ({self.camera_id})',
+            'phone': 'N/A',
+            'location': self.location,
+            'description': (f"Person fall detected at {detected_at}, track {event['trackId']}, "
+                            f"video time {event['t']:.1f}s, box {event['box']}"),
+        }
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            if event is None:
+                return
+
+            payload = self._payload(event)
+            backoff = 1.0
+            for attempt in range(self.retries):
+                try:
+                    response = requests.post(self.url, json=payload, timeout=self.timeout)
+                    if response.status_code == 201:
+                        self.sent += 1
+                        print(f"🚨 Fall alert sent for track {event['trackId']}")
+                        break
+                    print(f"⚠️  Emergency API returned {response.status_code}")
+                except requests.exceptions.RequestException as e:
+                    print(f"⚠️  Could not send fall alert: {e}")
+                if attempt < self.retries - 1:
+                    time.sleep(backoff)
+                    backoff *= 2
+            else:
+                self.failed += 1
+
+    def stats(self):
+        return {'sent': self.sent, 'failed': self.failed, 'dropped': self.dropped, 'queued': self._queue.qsize()}
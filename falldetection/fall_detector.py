@@ -0,0 +1,142 @@
+import numpy as np
+
+
+class FallDetector:
+    """
+    Track-aware fall detection
+    Every tracked person keeps a short ring buffer of box aspect ratio (w / h),
+    centroid y and height. A fall is confirmed when a track
+    - was upright (aspect < upright_ratio) earlier in the window,
+    - dropped fast: peak downward centroid speed >= drop_speed, in upright body
+      heights per second,
+    - and has been lying (aspect > lying_ratio) for the last confirm_frames samples.
+    A track alerts once per fall; it can alert again after standing up.
+    Histories live in one table (row per track) so a frame is evaluated with
+    array operations instead of per-detection Python code.
+    """
+
+    def __init__(self, history=16, confirm_frames=3, lying_ratio=1.0, upright_ratio=0.8,
+                 drop_speed=0.8, max_age=2.0, capacity=64):
+        self.history = history
+        self.confirm_frames = confirm_frames
+        self.lying_ratio = lying_ratio
+        self.upright_ratio = upright_ratio
+        self.drop_speed = drop_speed
+        self.max_age = max_age
+
+        self._rows = {}                      # track id -> row in the history table
+        self._free = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        """Create or grow the history table, keeping existing rows"""
+        n_old = len(self._head) if hasattr(self, '_head') else 0
+
+        def grow(name, fill, dtype, shape):
+            arr = np.full(shape, fill, dtype)
+            if n_old:
+                arr[:n_old] = getattr(self, name)
+            setattr(self, name, arr)
+
+        window = (capacity, self.history)
+        grow('_aspect', np.nan, np.float32, window)
+        grow('_cy', np.nan, np.float32, window)
+        grow('_height', np.nan, np.float32, window)
+        grow('_t', np.nan, np.float64, window)
+        grow('_head', 0, np.int64, (capacity,))
+        grow('_last_seen', -np.inf, np.float64, (capacity,))
+        grow('_fallen', False, bool, (capacity,))
+        self._free.extend(range(capacity - 1, n_old - 1, -1))
+
+    def _row(self, track_id):
+        row = self._rows.get(track_id)
+        if row is None:
+            if not self._free:
+                self._allocate(len(self._head) * 2)
+            row = self._free.pop()
+            self._rows[track_id] = row
+        return row
+
+    def _release(self, rows):
+        self._aspect[rows] = np.nan
+        self._cy[rows] = np.nan
+        self._height[rows] = np.nan
+        self._t[rows] = np.nan
+        self._head[rows] = 0
+        self._last_seen[rows] = -np.inf
+        self._fallen[rows] = False
+
+    def _expire(self, t):
+        stale = [tid for tid, row in self._rows.items() if t - self._last_seen[row] > self.max_age]
+        if stale:
+            rows = [self._rows.pop(tid) for tid in stale]
+            self._release(rows)
+            self._free.extend(rows)
+
+    def update(self, track_ids, boxes, t):
+        """
+        Add one frame of person tracks
+        track_ids: (n,) ints, boxes: (n, 4) xyxy, t: frame time in seconds
+        Returns (fallen, events): a bool per input track that is currently in
+        a confirmed fall, and one event dict per newly confirmed fall.
+        """
+        self._expire(t)
+
+        n = len(track_ids)
+        if n == 0:
+            return np.zeros(0, bool), []
+
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(n, 4)
+        w = boxes[:, 2] - boxes[:, 0]
+        h = np.maximum(boxes[:, 3] - boxes[:, 1], 1.0)
+
+        rows = np.array([self._row(int(tid)) for tid in track_ids])
+        col = self._head[rows]
+        self._aspect[rows, col] = w / h
+        self._cy[rows, col] = (boxes[:, 1] + boxes[:, 3]) / 2
+        self._height[rows, col] = h
+        self._t[rows, col] = t
+        self._head[rows] = (col + 1) % self.history
+        self._last_seen[rows] = t
+
+        # Chronological view of each updated track's window, oldest first
+        order = (self._head[rows, None] + np.arange(self.history)) % self.history
+        aspect = self._aspect[rows[:, None], order]
+        cy = self._cy[rows[:, None], order]
+        height = self._height[rows[:, None], order]
+        times = self._t[rows[:, None], order]
+
+        k = self.confirm_frames
+        recent = aspect[:, -k:]
+        lying = np.all(recent > self.lying_ratio, axis=1)     # NaN (short history) compares False
+        upright_samples = aspect[:, :-k] < self.upright_ratio
+        was_upright = upright_samples.any(axis=1)
+
+        # Downward speed normalised by the standing height, so it does not depend on distance
+        ref_height = np.where(upright_samples, height[:, :-k], 0).max(axis=1)
+        ref_height = np.where(ref_height > 0, ref_height, h)
+        dt = np.diff(times, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            speed = np.diff(cy, axis=1) / dt / ref_height[:, None]
+        peak_speed = np.where(np.isfinite(speed), speed, -np.inf).max(axis=1)
+
+        # Standing up again re-arms the track
+        stood_up = aspect[:, -1] < self.upright_ratio
+        self._fallen[rows[stood_up]] = False
+
+        confirmed = lying & was_upright & (peak_speed >= self.drop_speed) & ~self._fallen[rows]
+        self._fallen[rows[confirmed]] = True
+
+        events = [{
+            'trackId': int(track_ids[i]),
+            'box': [int(v) for v in boxes[i]],
+            't': float(t),
+            'aspect': round(float(aspect[i, -1]), 2),
+            'dropSpeed': round(float(peak_speed[i]), 2),
+        } for i in np.flatnonzero(confirmed)]
+
+        return self._fallen[rows].copy(), events
+
+    @property
+    def tracked(self):
+        return len(self._rows)
@@ -1,8 +1,15 @@
 import cv2
 from ultralytics import YOLO
-import pandas as pd
 import cvzone
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'computerVision', 'common'))
+
+from frame_source import FrameSource
+from frame_bus import BusSource
+from fall_detector import FallDetector
+from fall_alerts import FallAlertPublisher
 
 # Download YOLO model if not exists
 model_path = "yolov8n.pt"  # Using YOLOv8 nano for better compatibility
@@ -10,8 +17,8 @@ if not os.path.exists(model_path):
     print(f"Downloading {model_path}...")
     model = YOLO(model_path)  # Will auto-download
 else:
-    model = YOLO(model_path)  
- 
+    model = YOLO(model_path)
+
 def RGB(event, x, y, flags, param):
     if event == cv2.EVENT_MOUSEMOVE:
         point = [x, y]
@@ -21,65 +28,69 @@ cv2.namedWindow('RGB')
 cv2.setMouseCallback('RGB', RGB)
 
 
-cap=cv2.VideoCapture('fall.mp4')
+# Every 3rd frame is decoded; the others are skipped without decoding
+# With FRAME_BUS set, every 3rd frame is taken from a capture process (common/frame_bus.py);
+# this script draws on them, so it takes private copies
+if os.environ.get('FRAME_BUS'):
+    source = BusSource(os.environ['FRAME_BUS'], stride=3, copy=True)
+else:
+    source = FrameSource('fall.mp4', stride=3)
 my_file = open("coco.txt", "r")
 data = my_file.read()
 class_list = data.split("\n")
+PERSON_CLASS = class_list.index('person')
 
+# Falls are confirmed per track over a short history, then posted to the emergency API
+detector = FallDetector()
+alerts = FallAlertPublisher(camera_id='fall-cam-1', location='Fall detection camera 1')
+alerts.start()
 
-count=0
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        print("Video ended or cannot read frame")
-        break
-    
-    count += 1
-    if count % 3 != 0:
-        continue
+
+for count, frame in source:
     frame = cv2.resize(frame, (1020, 600))
 
-    results = model(frame)
-    a = results[0].boxes.data
-    px = pd.DataFrame(a).astype("float")
-    
-    for index, row in px.iterrows():
-        x1 = int(row[0])
-        y1 = int(row[1])
-        x2 = int(row[2])
-        y2 = int(row[3])
-        
-        d = int(row[5])
-        c = class_list[d]
-        
-        # Fall detection logic for person
-        if 'person' in c:
-            h = y2 - y1  # height
-            w = x2 - x1  # width
-            thresh = h - w
-            
-            # If width is greater than height, person is likely fallen
-            if thresh < 0:
-                cvzone.putTextRect(frame, 'PERSON FALL DETECTED', (x1, y1), 2, 2, colorR=(0, 0, 255))
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
-            else:
-                cvzone.putTextRect(frame, f'{c}', (x1, y1), 1, 1)
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    # Tracking keeps identities across frames so falls are judged per person
+    results = model.track(frame, persist=True, verbose=False)
+    boxes = results[0].boxes
+    xyxy = boxes.xyxy.cpu().numpy().astype(int)
+    classes = boxes.cls.cpu().numpy().astype(int)
+    track_ids = boxes.id.cpu().numpy().astype(int) if boxes.id is not None else None
+
+    person = classes == PERSON_CLASS
+    if track_ids is not None:
+        person_idx = person.nonzero()[0]
+        fallen, events = detector.update(track_ids[person_idx], xyxy[person_idx], count / source.fps)
+        for event in events:
+            alerts.publish(event)
+    else:
+        # No identities on this frame: people are drawn but not judged
+        person_idx = []
+        fallen = []
+
+    for i, is_fallen in zip(person_idx, fallen):
+        x1, y1, x2, y2 = xyxy[i]
+        if is_fallen:
+            cvzone.putTextRect(frame, 'PERSON FALL DETECTED', (x1, y1), 2, 2, colorR=(0, 0, 255))
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 3)
         else:
-            cvzone.putTextRect(frame, f'{c}', (x1, y1), 1, 1)
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)    
-
-                      
-                 
-                 
-    
-    
-   
+            cvzone.putTextRect(frame, f'person {track_ids[i]}', (x1, y1), 1, 1)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+    judged = set(int(i) for i in person_idx)
+    for i in range(len(xyxy)):
+        if i in judged:
+            continue
+        x1, y1, x2, y2 = xyxy[i]
+        cvzone.putTextRect(frame, f'{class_list[classes[i]]}', (x1, y1), 1, 1)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
     cv2.imshow("RGB", frame)
     # Break the loop if 'q' is pressed
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
-
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+print(source.stats())
+alerts.stop()
+print(alerts.stats())
+source.release()
+cv2.destroyAllWindows()
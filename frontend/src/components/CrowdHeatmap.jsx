@@ -4,6 +4,26 @@ import '../styles/CrowdHeatmap.css';
 
 const SOCKET_URL = 'http://localhost:5000';
 
+const RUSH_ORDER = ['normal', 'moderate', 'high', 'critical'];
+
+// Merge per-camera state into the single heatmap the view renders
+const combineCameras = (cameras) => {
+  const states = Object.values(cameras).map(c => c.state).filter(s => s.frameWidth);
+  if (states.length === 0) return null;
+  const newest = states.reduce((a, b) => (new Date(a.timestamp) >= new Date(b.timestamp) ? a : b));
+  return {
+    timestamp: newest.timestamp,
+    frameWidth: newest.frameWidth,
+    frameHeight: newest.frameHeight,
+    overallPeopleCount: states.reduce((sum, s) => sum + (s.overallPeopleCount || 0), 0),
+    overallRushStatus: states.reduce(
+      (worst, s) => (RUSH_ORDER.indexOf(s.overallRushStatus) > RUSH_ORDER.indexOf(worst) ? s.overallRushStatus : worst),
+      'normal'
+    ),
+    zones: states.flatMap(s => Object.entries(s.zones).map(([zoneId, zone]) => ({ zoneId, ...zone }))),
+  };
+};
+
 export default function CrowdHeatmap() {
   const canvasRef = useRef(null);
   const [socket, setSocket] = useState(null);
@@ -11,6 +31,9 @@ export default function CrowdHeatmap() {
   const [alerts, setAlerts] = useState([]);
   const [isConnected, setIsConnected] = useState(false);
 
+  // cameraId -> { version, state } as received from snapshots and deltas
+  const camerasRef = useRef({});
+
   useEffect(() => {
     // Initialize Socket.IO connection
     const newSocket = io(SOCKET_URL);
@@ -19,8 +42,7 @@ export default function CrowdHeatmap() {
     newSocket.on('connect', () => {
       console.log('Connected to crowd heatmap socket');
       setIsConnected(true);
-      newSocket.emit('crowd:join');
-      newSocket.emit('crowd:request-latest');
+      newSocket.emit('crowd:subscribe', {});
     });
 
     newSocket.on('disconnect', () => {
@@ -28,9 +50,55 @@ export default function CrowdHeatmap() {
       setIsConnected(false);
     });
 
-    newSocket.on('crowd:heatmap-update', (data) => {
-      console.log('Heatmap update received:', data);
-      setHeatmapData(data);
+    newSocket.on('crowd:heatmap-snapshot', (data) => {
+      camerasRef.current = {};
+      data.cameras.forEach(({ cameraId, version, zones, ...fields }) => {
+        const state = { ...fields, zones: {} };
+        zones.forEach(({ zoneId, ...zone }) => { state.zones[zoneId] = zone; });
+        camerasRef.current[cameraId] = { version, state };
+      });
+      setHeatmapData(combineCameras(camerasRef.current));
+    });
+
+    // Deltas only carry changed fields; a gap in versions means we missed one
+    newSocket.on('crowd:heatmap-delta', (delta) => {
+      const { cameraId, version, baseVersion, zones, removedZones, ...fields } = delta;
+      const current = camerasRef.current[cameraId];
+      const currentVersion = current ? current.version : 0;
+      if (version <= currentVersion) {
+        return;
+      }
+      if (currentVersion < baseVersion || (!current && baseVersion > 0)) {
+        newSocket.emit('crowd:resync', {});
+        return;
+      }
+
+      const state = current ? { ...current.state, zones: { ...current.state.zones } } : { zones: {} };
+      Object.assign(state, fields);
+      Object.entries(zones || {}).forEach(([zoneId, changed]) => {
+        state.zones[zoneId] = { ...state.zones[zoneId], ...changed };
+      });
+      (removedZones || []).forEach(zoneId => { delete state.zones[zoneId]; });
+      camerasRef.current = { ...camerasRef.current, [cameraId]: { version, state } };
+      setHeatmapData(combineCameras(camerasRef.current));
+    });
+
+    // Early warning: a zone is forecast to reach high/critical within 15 minutes
+    newSocket.on('crowd:rush-forecast', (data) => {
+      console.log('Rush forecast received:', data);
+      setAlerts(prev => [{ ...data, isForecast: true }, ...prev.slice(0, 4)]);
+    });
+
+    // A tight knot of people above the crush density, regardless of the zone average
+    newSocket.on('crowd:crush-risk', (data) => {
+      console.log('Crush risk received:', data);
+      setAlerts(prev => [{ ...data, isCrush: true }, ...prev.slice(0, 4)]);
+    });
+
+    // People moving against the usual direction, or suddenly much faster
+    newSocket.on('crowd:motion-alert', (data) => {
+      console.log('Motion alert received:', data);
+      setAlerts(prev => [{ ...data, isMotion: true }, ...prev.slice(0, 4)]);
     });
 
     newSocket.on('crowd:rush-alert', (data) => {
@@ -47,7 +115,7 @@ export default function CrowdHeatmap() {
     });
 
     return () => {
-      newSocket.emit('crowd:leave');
+      newSocket.emit('crowd:unsubscribe', {});
       newSocket.close();
     };
   }, []);
@@ -267,6 +335,23 @@ export default function CrowdHeatmap() {
                       {zone.alertLevel}
                     </span>
                   </div>
+                  {zone.predictedAlertLevel && zone.predictedAlertLevel !== zone.alertLevel && zone.forecast && (
+                    <div className="zone-forecast">
+                      📈 {zone.predictedAlertLevel} expected · {zone.forecast.map(f => `${f.horizonMinutes}m: ${Math.round(f.peopleCount)}`).join(' / ')}
+                    </div>
+                  )}
+                  {zone.crushRisk && (
+                    <div className="zone-crush">
+                      ⚠️ Crush risk · peak {zone.peakLocalDensity}/m² · {(zone.crushClusters || []).map(c => `${c.people} people`).join(' / ')}
+                    </div>
+                  )}
+                  {(zone.counterFlow || zone.surge) && (
+                    <div className="zone-motion">
+                      {zone.counterFlow && '↩️ Counter-flow '}
+                      {zone.surge && '⏩ Surge '}
+                      · {Math.round(zone.meanSpeed || 0)} px/s
+                    </div>
+                  )}
                 </div>
               ))}
             </div>
@@ -288,6 +373,9 @@ export default function CrowdHeatmap() {
                   </button>
                   <div className="alert-content">
                     <p className="alert-zones">
+                      {alert.isForecast && 'Forecast: '}
+                      {alert.isCrush && 'Crush risk: '}
+                      {alert.isMotion && 'Counter-flow / surge: '}
                       {alert.alerts.map(a => a.zone).join(', ')}
                     </p>
                     <p className="alert-time">